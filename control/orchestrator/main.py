@@ -1,7 +1,8 @@
 import logging
+from typing import Any
 import httpx
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -14,6 +15,36 @@ class TestConfig(BaseModel):
     host: str = "http://sut-gateway"
     class_name: str = "BasicUser"
     workers: int = 1
+    wait_for_ready: bool = True
+    ready_timeout: int = 60
+    priority: int = 0
+    stats_interval: float = 1.0
+    latency_precision: int = 3
+    sample_log: bool = False
+    arrival_rate: float = 0
+    arrival_distribution: str = "poisson"
+    arrival_trace: str | None = None
+    workload: dict[str, Any] | None = None  # Validated by the load generator
+    replay: str | None = None
+    replay_speed: float = 1.0
+    replay_rate: float = 0
+    replay_once: bool = False
+    load_profile: dict[str, Any] | None = None  # Validated by the load generator
+    autoscale: bool = False
+    max_workers: int | None = None
+    placement: dict[str, Any] | None = None  # Validated by the load generator
+
+class LoadChange(BaseModel):
+    users: int | None = None
+    spawn_rate: float | None = None
+    arrival_rate: float | None = None
+
+class CapacityConfig(BaseModel):
+    # Search settings (dimension, start, max, hold_s, ...) are passed through to the load generator
+    model_config = ConfigDict(extra="allow")
+
+    test: dict[str, Any]  # Probe test config, as for /load/test
+    slo: dict[str, Any]   # percentile, latency_ms and error_rate
 
 app = FastAPI(
     title="TestOrchestrator API",
@@ -80,7 +111,7 @@ async def get_load_status() -> dict[str, str | int]:
     summary="Start Load Test",
     description="Start a load test with the specified configuration."
 )
-async def post_load_test(config: TestConfig) -> dict[str, str | int]:
+async def post_load_test(config: TestConfig) -> dict[str, Any]:
     """Forward test config to load-generator"""
     try:
         response: httpx.Response = await http_client.post(
@@ -91,4 +122,85 @@ async def post_load_test(config: TestConfig) -> dict[str, str | int]:
         return response.json()
     except httpx.HTTPError as e:
         logger.error(f"Error forwarding /load/test request: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"/load/test request failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"/load/test request failed: {str(e)}")
+
+@app.patch(
+    "/load/test",
+    name="/load/test",
+    summary="Change Load Test",
+    description="Change users, spawn rate or arrival rate of the running load test in place."
+)
+async def patch_load_test(change: LoadChange, test_id: str | None = None) -> dict[str, Any]:
+    """Forward a load change to load-generator, for the given test or the only running one"""
+    try:
+        response: httpx.Response = await http_client.patch(
+            f"http://load-generator/test/{test_id}" if test_id else "http://load-generator/test",
+            json=change.model_dump(exclude_none=True)
+        )
+        if response.status_code in (400, 404, 409):
+            raise HTTPException(status_code=response.status_code, detail=response.json().get("detail"))
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPError as e:
+        logger.error(f"Error forwarding /load/test change: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"/load/test change failed: {str(e)}")
+
+@app.post(
+    "/load/capacity",
+    name="/load/capacity",
+    summary="Search Load Capacity",
+    description="Start a search for the highest load that meets a latency and error rate SLO."
+)
+async def post_load_capacity(config: CapacityConfig) -> dict[str, Any]:
+    """Forward a capacity search to load-generator"""
+    try:
+        response: httpx.Response = await http_client.post(
+            "http://load-generator/capacity",
+            json=config.model_dump()
+        )
+        if response.status_code in (400, 404, 409):
+            raise HTTPException(status_code=response.status_code, detail=response.json().get("detail"))
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPError as e:
+        logger.error(f"Error forwarding /load/capacity request: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"/load/capacity request failed: {str(e)}")
+
+@app.get(
+    "/load/capacity/{search_id}",
+    name="/load/capacity-by-id",
+    summary="Get Load Capacity",
+    description="Get a capacity search's probes and its maximum sustainable load so far."
+)
+async def get_load_capacity(search_id: str) -> dict[str, Any]:
+    """Fetch a capacity search from load-generator"""
+    try:
+        response: httpx.Response = await http_client.get(
+            f"http://load-generator/capacity/{search_id}"
+        )
+        if response.status_code == 404:
+            raise HTTPException(status_code=404, detail=response.json().get("detail"))
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPError as e:
+        logger.error(f"Error forwarding /load/capacity request: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"/load/capacity request failed: {str(e)}")
+
+@app.post(
+    "/control/reload", 
+    name="/control/reload",
+    summary="Reload SUT Workers",
+    description="Trigger a rolling reload of the SUT's gunicorn workers and report dropped requests."
+)
+async def post_control_reload() -> dict[str, Any]:
+    """Forward a reload request to the control agent"""
+    try:
+        response: httpx.Response = await http_client.post(
+            "http://secure-gateway/control/reload",
+            timeout=60.0
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPError as e:
+        logger.error(f"Error forwarding /control/reload request: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"/control/reload request failed: {str(e)}")
@@ -0,0 +1,255 @@
+"""
+Result files of test runs, served over HTTP.
+
+Locust and the load generator leave a run's artifacts in RESULTS_DIR, named
+after the test ID: <test_id>.html, <test_id>_stats.csv and the other CSVs,
+JSON files and, with sample_log, the <test_id>_samples/ directory. They are
+served under their names in RESULTS_DIR, and the bundle uses the same names,
+so extracting it into another generator's RESULTS_DIR restores the run.
+
+A single artifact is a FileResponse: Range and If-Range requests get partial
+content, and servers with the ASGI pathsend extension send the file
+themselves (sendfile), others get it in CHUNK_BYTES reads. Artifacts have an
+ETag from their mtime and size, If-None-Match gets 304 Not Modified.
+
+Text artifacts are compressed when the client accepts it, zstd before gzip.
+When a run's results are recorded, compressed copies of its text artifacts
+are written next to them (<name>.zst, <name>.gz) and served as they are, with
+ranges. A copy is only used while it has the mtime of its artifact, so files
+of a running test, or changed since, are compressed on the fly instead.
+
+The bundle is a tar of all of a run's artifacts, built while it is sent from
+headers and file contents, never staged on disk. File sizes are taken when
+the request starts, so the tar is consistent even while files still grow.
+"""
+
+import os
+import zlib
+import logging
+import tarfile
+import mimetypes
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+import zstandard
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = Path("/mnt/results")
+
+CHUNK_BYTES = 1024 * 1024
+COMPRESSIBLE_SUFFIXES = {".html", ".csv", ".json", ".jsonl", ".txt"}
+PRECOMPRESS_MIN_BYTES = 1024
+# Content codings in order of preference, with the suffix of their precompressed copies
+ENCODINGS = {"zstd": ".zst", "gzip": ".gz"}
+PRECOMPRESS_LEVELS = {"zstd": 12, "gzip": 9}
+ON_THE_FLY_LEVELS = {"zstd": 3, "gzip": 6}
+BUNDLE_TYPES = {"none": "application/x-tar", "zstd": "application/zstd", "gzip": "application/gzip"}
+BUNDLE_SUFFIXES = {"none": ".tar", "zstd": ".tar.zst", "gzip": ".tar.gz"}
+
+def compressor(encoding: str, level: int) -> Any:
+    """An object with compress(data) and flush(), like zlib's."""
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compressobj()
+    return zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+
+def is_compressible(name: str) -> bool:
+    return Path(name).suffix in COMPRESSIBLE_SUFFIXES
+
+def artifact_paths(test_id: str) -> Dict[str, Path]:
+    """A run's artifacts by name, without the compressed copies."""
+    paths: Dict[str, Path] = {}
+    for path in sorted(RESULTS_DIR.iterdir()):
+        if not path.name.startswith((f"{test_id}.", f"{test_id}_")):
+            continue
+        files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+        for file in files:
+            paths[file.relative_to(RESULTS_DIR).as_posix()] = file
+    for name in list(paths):
+        for suffix in ENCODINGS.values():
+            paths.pop(name + suffix, None)
+    return paths
+
+def list_artifacts(test_id: str) -> List[Dict[str, Any]]:
+    artifacts = []
+    for name, path in artifact_paths(test_id).items():
+        stat = path.stat()
+        artifacts.append({
+            "name": name,
+            "size": stat.st_size,
+            "modified": stat.st_mtime,
+            "encodings": [
+                encoding for encoding, suffix in ENCODINGS.items()
+                if precompressed(path, suffix, stat) is not None
+            ],
+        })
+    return artifacts
+
+def precompressed(path: Path, suffix: str, stat: os.stat_result) -> Path | None:
+    """The compressed copy of an artifact, if it was made from the artifact as it is now."""
+    encoded = path.with_name(path.name + suffix)
+    try:
+        return encoded if encoded.stat().st_mtime_ns == stat.st_mtime_ns else None
+    except FileNotFoundError:
+        return None
+
+def precompress(test_id: str) -> None:
+    """Write compressed copies of a run's text artifacts, called when its results are recorded."""
+    for name, path in artifact_paths(test_id).items():
+        stat = path.stat()
+        if not is_compressible(name) or stat.st_size < PRECOMPRESS_MIN_BYTES:
+            continue
+        for encoding, suffix in ENCODINGS.items():
+            if precompressed(path, suffix, stat) is not None:
+                continue
+            temp = path.with_name(f".{path.name}{suffix}.tmp")
+            with path.open("rb") as source, temp.open("wb") as target:
+                compress = compressor(encoding, PRECOMPRESS_LEVELS[encoding])
+                while chunk := source.read(CHUNK_BYTES):
+                    target.write(compress.compress(chunk))
+                target.write(compress.flush())
+            # The copy carries the artifact's mtime, which tells whether it is still current
+            os.utime(temp, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            os.replace(temp, path.with_name(path.name + suffix))
+
+def accepted_encoding(accept_encoding: str) -> str | None:
+    """The preferred content coding the client accepts, None for identity."""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        weight = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                weight = float(value)
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    accepted = [
+        (weights.get(encoding, weights.get("*", 0.0)), -index, encoding)
+        for index, encoding in enumerate(ENCODINGS)
+    ]
+    weight, _, encoding = max(accepted)
+    return encoding if weight > 0 else None
+
+def make_etag(stat: os.stat_result, encoding: str | None = None) -> str:
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}' + (f'-{encoding}"' if encoding else '"')
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    # If-None-Match uses the weak comparison
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+def compress_file(path: Path, size: int, encoding: str) -> Iterator[bytes]:
+    """The first size bytes of a file, compressed."""
+    compress = compressor(encoding, ON_THE_FLY_LEVELS[encoding])
+    with path.open("rb") as f:
+        while size > 0 and (chunk := f.read(min(CHUNK_BYTES, size))):
+            size -= len(chunk)
+            if data := compress.compress(chunk):
+                yield data
+    yield compress.flush()
+
+def file_response(request: Request, test_id: str, name: str) -> Response:
+    """One artifact, compressed if the client accepts it, raises FileNotFoundError if the run has no such artifact."""
+    path = artifact_paths(test_id).get(name)
+    if path is None:
+        raise FileNotFoundError(name)
+    stat = path.stat()
+    media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    disposition = "inline" if media_type.startswith("text/") or media_type == "application/json" else "attachment"
+    headers: Dict[str, str] = {}
+    encoding = None
+    source = path
+    if is_compressible(name):
+        headers["vary"] = "Accept-Encoding"
+        encoding = accepted_encoding(request.headers.get("accept-encoding", ""))
+
+    if encoding is not None:
+        encoded = precompressed(path, ENCODINGS[encoding], stat)
+        if encoded is not None:
+            source = encoded
+        elif "range" not in request.headers:
+            # Compressed on the fly, without ranges: its length is only known once it is sent
+            etag = "W/" + make_etag(stat, encoding)
+            headers["etag"] = etag
+            if is_not_modified(request, etag):
+                return Response(status_code=304, headers=headers)
+            headers["content-encoding"] = encoding
+            headers["content-disposition"] = f'{disposition}; filename="{Path(name).name}"'
+            return StreamingResponse(compress_file(path, stat.st_size, encoding), media_type=media_type, headers=headers)
+        else:
+            encoding = None  # Ranges of the identity representation
+
+    etag = make_etag(stat, encoding)
+    headers["etag"] = etag
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers["content-encoding"] = encoding
+    response = FileResponse(
+        source, media_type=media_type, headers=headers, filename=Path(name).name,
+        content_disposition_type=disposition,
+    )
+    response.chunk_size = CHUNK_BYTES
+    return response
+
+def tar_members(paths: Dict[str, Path]) -> List[Tuple[tarfile.TarInfo, Path]]:
+    members = []
+    for name, path in paths.items():
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        info = tarfile.TarInfo(name)
+        info.size, info.mtime, info.mode = stat.st_size, int(stat.st_mtime), 0o644
+        members.append((info, path))
+    return members
+
+def tar_stream(members: List[Tuple[tarfile.TarInfo, Path]], compression: str) -> Iterator[bytes]:
+    """A tar of the members as they were listed: files that grew are cut, files that shrank are padded."""
+    compress = compressor(compression, ON_THE_FLY_LEVELS[compression]) if compression != "none" else None
+
+    def blocks() -> Iterator[bytes]:
+        for info, path in members:
+            yield info.tobuf(format=tarfile.PAX_FORMAT)
+            remaining = info.size
+            try:
+                with path.open("rb") as f:
+                    while remaining > 0 and (chunk := f.read(min(CHUNK_BYTES, remaining))):
+                        remaining -= len(chunk)
+                        yield chunk
+            except FileNotFoundError:
+                logger.warning(f"Artifact {info.name} disappeared while it was bundled")
+            if remaining > 0:
+                yield bytes(remaining)
+            yield bytes(-info.size % tarfile.BLOCKSIZE)
+        yield bytes(2 * tarfile.BLOCKSIZE)  # End of archive
+
+    for block in blocks():
+        if compress is None:
+            yield block
+        elif data := compress.compress(block):
+            yield data
+    if compress is not None:
+        yield compress.flush()
+
+def bundle_response(test_id: str, compression: str) -> StreamingResponse:
+    """All of a run's artifacts as one tar, raises FileNotFoundError if the run has none."""
+    members = tar_members(artifact_paths(test_id))
+    if not members:
+        raise FileNotFoundError(test_id)
+    headers = {"content-disposition": f'attachment; filename="{test_id}{BUNDLE_SUFFIXES[compression]}"'}
+    if compression == "none":
+        # Sizes are fixed when the request starts, so the tar's length is known up front
+        length = sum(
+            len(info.tobuf(format=tarfile.PAX_FORMAT)) + info.size + (-info.size % tarfile.BLOCKSIZE)
+            for info, _ in members
+        ) + 2 * tarfile.BLOCKSIZE
+        headers["content-length"] = str(length)
+    return StreamingResponse(tar_stream(members, compression), media_type=BUNDLE_TYPES[compression], headers=headers)
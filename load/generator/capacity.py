@@ -0,0 +1,277 @@
+"""
+Capacity search.
+
+Finds the highest load the SUT sustains within an SLO (a latency percentile
+and an error rate) with a series of probe runs. Each probe is an ordinary
+test run at one load level, users or open-loop arrival rate, queued through
+the scheduler. Probes are watched through the live stats stream: once the
+probe has warmed up, every snapshot is checked against the SLO. A probe passes as soon
+as the SLO has held for hold_s and fails as soon as it has been broken for
+breach_s, and is stopped right away either way. A probe that does neither
+within probe_s passes if at least PASS_RATIO of its snapshots met the SLO.
+
+The load grows geometrically from start (times growth) until a probe fails,
+then the search bisects between the highest passing and the lowest failing
+load until they are within tolerance of each other. The result is the
+highest passing load, bracketed by the lowest failing one, with 95%
+confidence intervals of the throughput and latency measured at that load.
+
+Searches are kept in memory, a generator restart abandons them (their probe
+runs are recovered like any other run).
+"""
+
+import math
+import time
+import uuid
+import asyncio
+import logging
+import statistics
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Literal, Tuple
+
+from pydantic import BaseModel, model_validator
+
+import live_stats
+import scheduler
+from lifecycle import TestRun, utc_timestamp
+
+logger = logging.getLogger(__name__)
+
+PASS_RATIO = 0.9       # Share of steady snapshots that must meet the SLO when a probe runs out of time
+MAX_SEARCHES = 20      # Finished searches kept in memory
+Z_95 = 1.96
+
+class SLO(BaseModel):
+    percentile: Literal["p50", "p95", "p99"] = "p99"
+    latency_ms: float              # The percentile must stay at or below this
+    error_rate: float = 0.01       # Failed share of requests, at or below this
+
+class SearchConfig(BaseModel):
+    test: Dict[str, Any]           # Probe test config (POST /test body), the searched dimension and run_time are set per probe
+    slo: SLO
+    dimension: Literal["users", "arrival_rate"] = "users"
+    start: float = 10              # First load level
+    min: float = 1                 # Lowest level probed when the start level already fails
+    max: float = 10000             # Highest level probed
+    growth: float = 2.0            # Level multiplier until the first failing probe
+    tolerance: float = 0.05        # Stop when the failing level is within this fraction above the passing one
+    max_probes: int = 12
+    warmup_s: float = 15           # Ignored at the start of each probe, after the users are spawned
+    hold_s: float = 30             # SLO met this long: probe passes
+    breach_s: float = 10           # SLO broken this long: probe fails
+    probe_s: float = 120           # Longest steady time of a probe
+
+    @model_validator(mode="after")
+    def check_levels(self) -> "SearchConfig":
+        if not 0 < self.min <= self.start <= self.max:
+            raise ValueError("Levels need 0 < min <= start <= max")
+        if self.growth <= 1 or self.tolerance <= 0 or self.max_probes < 1:
+            raise ValueError("growth must be above 1, tolerance positive and max_probes at least 1")
+        if min(self.hold_s, self.breach_s, self.probe_s) <= 0 or self.warmup_s < 0:
+            raise ValueError("hold_s, breach_s and probe_s must be positive and warmup_s at least 0")
+        return self
+
+def interval(values: List[float]) -> Dict[str, float | None]:
+    """Mean with a normal 95% confidence interval. Snapshots overlap in time, so it is on the optimistic side."""
+    if not values:
+        return {"mean": None, "low": None, "high": None}
+    mean = statistics.fmean(values)
+    margin = Z_95 * statistics.stdev(values) / math.sqrt(len(values)) if len(values) > 1 else 0.0
+    return {"mean": round(mean, 2), "low": round(mean - margin, 2), "high": round(mean + margin, 2)}
+
+def probe_test(config: SearchConfig, level: float) -> Dict[str, Any]:
+    """The test config of a probe, its run_time covers the ramp, warm-up and probe_s."""
+    spawn_rate = config.test.get("spawn_rate") or 1
+    users = level if config.dimension == "users" else config.test.get("users", 1)
+    run_time = math.ceil(users / spawn_rate + config.warmup_s + config.probe_s) + 5
+    return {**config.test, config.dimension: level, "run_time": f"{run_time}s"}
+
+class Search:
+    """One capacity search and its probes."""
+
+    def __init__(self, config: SearchConfig, start_probe: Callable[[Dict[str, Any], str], TestRun]):
+        self.search_id = str(uuid.uuid4())
+        self.config = config
+        self.start_probe = start_probe
+        self.status = "running"
+        self.error: str | None = None
+        self.started_at = datetime.utcnow()
+        self.finished_at: datetime | None = None
+        self.probes: List[Dict[str, Any]] = []
+        self.passed: Dict[str, Any] | None = None  # Highest passing probe
+        self.failed: Dict[str, Any] | None = None  # Lowest failing probe
+        self.current: TestRun | None = None
+        self.task: "asyncio.Task[None] | None" = None
+
+    def level(self, value: float) -> float:
+        return max(1, round(value)) if self.config.dimension == "users" else round(value, 2)
+
+    def next_level(self) -> float | None:
+        """The next load to probe, None once the search has converged or run out of probes."""
+        config = self.config
+        if len(self.probes) >= config.max_probes:
+            return None
+        if not self.probes:
+            return self.level(config.start)
+        if self.failed is None:
+            # Still growing
+            low = self.passed["level"]  # type: ignore[index]
+            return None if low >= config.max else self.level(min(low * config.growth, config.max))
+        if self.passed is None:
+            # Even the start level failed, shrink
+            high = self.failed["level"]
+            return None if high <= config.min else self.level(max(high / config.growth, config.min))
+        low, high = self.passed["level"], self.failed["level"]
+        if high - low <= config.tolerance * low:
+            return None
+        level = self.level((low + high) / 2)
+        return level if low < level < high else None
+
+    async def run(self) -> None:
+        try:
+            while (level := self.next_level()) is not None:
+                probe = await self.probe(level)
+                self.probes.append(probe)
+                if probe["verdict"] == "pass" and (self.passed is None or level > self.passed["level"]):
+                    self.passed = probe
+                if probe["verdict"] == "fail" and (self.failed is None or level < self.failed["level"]):
+                    self.failed = probe
+                logger.info(f"Capacity search {self.search_id}: {self.config.dimension} {level:g} "
+                            f"{probe['verdict']} ({probe['reason']})")
+            self.status = "completed"
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+        except Exception as e:
+            logger.error(f"Capacity search {self.search_id} failed: {e}")
+            self.status, self.error = "failed", str(e)
+        finally:
+            if self.current is not None and not self.current.is_finished:
+                await scheduler.stop_run(self.current)
+            self.current = None
+            self.finished_at = datetime.utcnow()
+
+    async def probe(self, level: float) -> Dict[str, Any]:
+        """Run one probe until its verdict and stop it."""
+        run = self.current = self.start_probe(probe_test(self.config, level), self.search_id)
+        subscriber = live_stats.Subscriber()
+        live_stats.subscribers.setdefault(run.test_id, set()).add(subscriber)
+        try:
+            verdict, reason, steady = await self.watch(run, subscriber, level)
+        finally:
+            live_stats.subscribers.get(run.test_id, set()).discard(subscriber)
+            if not run.is_finished:
+                await scheduler.stop_run(run)
+
+        requests = steady[-1][1] - steady[0][1] if len(steady) > 1 else 0
+        failures = steady[-1][2] - steady[0][2] if len(steady) > 1 else 0
+        return {
+            "level": level,
+            "test_id": run.test_id,
+            "verdict": verdict,
+            "reason": reason,
+            "steady_s": round(steady[-1][0] - steady[0][0], 1) if steady else 0.0,
+            "requests": requests,
+            "error_rate": round(failures / requests, 6) if requests else None,
+            "rps": interval([snapshot[3] for snapshot in steady]),
+            "latency_ms": interval([snapshot[4] for snapshot in steady]),
+        }
+
+    async def watch(
+        self, run: TestRun, subscriber: live_stats.Subscriber, level: float
+    ) -> Tuple[str, str, List[Tuple[float, int, int, float, float]]]:
+        """Check the probe's live stats against the SLO until it clearly passes, fails or runs out of time."""
+        config, slo = self.config, self.config.slo
+        steady: List[Tuple[float, int, int, float, float]] = []  # (time, requests, failures, rps, latency)
+        window: Deque[Tuple[float, int, int]] = deque()            # Last breach_s of (time, requests, failures)
+        passes = 0
+        state, state_since = None, 0.0
+        steady_since: float | None = None
+        started: float | None = None
+
+        while not run.is_finished:
+            try:
+                await asyncio.wait_for(subscriber.updated.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+            snapshot, _ = subscriber.take()
+            now = time.monotonic()
+            if not run.load_started.is_set() or snapshot is None:
+                continue
+            started = started or now
+            if config.dimension == "users" and snapshot.get("users", 0) < level:
+                started = now  # Warm-up starts once every user is spawned
+            if now - started < config.warmup_s:
+                continue
+            steady_since = steady_since or now
+
+            total = snapshot["total"]
+            latency = total.get(slo.percentile) or 0
+            steady.append((now, total["requests"], total["failures"], total.get("rps", 0.0), latency))
+            window.append((now, total["requests"], total["failures"]))
+            while len(window) > 2 and now - window[1][0] >= config.breach_s:
+                window.popleft()
+            requests, failures = window[-1][1] - window[0][1], window[-1][2] - window[0][2]
+            error_rate = failures / requests if requests else 0.0
+
+            met = latency <= slo.latency_ms and error_rate <= slo.error_rate
+            passes += met
+            if met != state:
+                state, state_since = met, now
+            if met and now - state_since >= config.hold_s:
+                return "pass", f"SLO held for {config.hold_s:g}s", steady
+            if not met and now - state_since >= config.breach_s:
+                return "fail", (f"SLO broken for {config.breach_s:g}s ({slo.percentile} {latency} ms, "
+                                f"error rate {error_rate:.2%})"), steady
+            if now - steady_since >= config.probe_s:
+                break
+
+        if not steady:
+            raise RuntimeError(f"Probe {run.test_id} at {level:g} ended ({run.status}) before reaching steady state"
+                               + (f": {run.error}" if run.error else ""))
+        verdict = "pass" if passes >= PASS_RATIO * len(steady) else "fail"
+        return verdict, f"{passes} of {len(steady)} snapshots met the SLO", steady
+
+    def to_dict(self) -> Dict[str, Any]:
+        config = self.config
+        best = self.passed
+        return {
+            "search_id": self.search_id,
+            "status": self.status,
+            "error": self.error,
+            "dimension": config.dimension,
+            "slo": config.slo.model_dump(),
+            "started_at": utc_timestamp(self.started_at),
+            "finished_at": utc_timestamp(self.finished_at),
+            "current_test_id": self.current.test_id if self.current else None,
+            "result": {
+                "max_sustainable": best["level"] if best else None,
+                # The capacity lies between the highest passing and the lowest failing level
+                "bounds": {"low": best["level"] if best else None,
+                           "high": self.failed["level"] if self.failed else None},
+                "limited_by_max": bool(best and self.failed is None and best["level"] >= config.max),
+                "rps": best["rps"] if best else None,
+                "latency_ms": best["latency_ms"] if best else None,
+            },
+            "probes": self.probes,
+        }
+
+searches: Dict[str, Search] = {}
+
+def start(config: SearchConfig, start_probe: Callable[[Dict[str, Any], str], TestRun]) -> Search:
+    """Start a search in the background, start_probe(test config, search_id) submits a probe run."""
+    finished = sorted((s for s in searches.values() if s.status != "running"), key=lambda s: s.started_at)
+    for search in finished[:max(0, len(finished) - MAX_SEARCHES + 1)]:
+        del searches[search.search_id]
+    search = Search(config, start_probe)
+    searches[search.search_id] = search
+    search.task = asyncio.create_task(search.run())
+    logger.info(f"Started capacity search {search.search_id} over {config.dimension} from {config.start:g}")
+    return search
+
+async def cancel(search: Search) -> bool:
+    if search.task is None or search.task.done():
+        return False
+    search.task.cancel()
+    await asyncio.gather(search.task, return_exceptions=True)
+    return True
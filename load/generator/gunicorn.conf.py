@@ -12,6 +12,7 @@ errorlog = "-"  # Log to stderr
 
 # Worker configuration
 worker_class = "uvicorn.workers.UvicornWorker"
+# Test state is held in memory by the worker (see lifecycle.py), keep a single worker
 workers = int(os.getenv("GUNICORN_WORKERS") or "1")  # Rule of thumb 
                                                      # (2 x CPU cores) + 1 for I/O bound work 
                                                      # (1 x CPU cores) + 1 for CPU-bound work
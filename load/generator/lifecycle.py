@@ -0,0 +1,594 @@
+"""
+Load test lifecycle tracking.
+
+Each test run lives in memory as a TestRun while its Locust processes are
+watched with asyncio: a task awaits the exit of the master (or single)
+process, so completion, failure and the exit code are known the moment
+Locust stops, and leftover workers are stopped right away.
+
+Startup is event driven too. Locust reports its lifecycle through marker
+lines on stdout (see load/scripts/lifecycle_events.py): the master and all
+workers are started at once, since workers retry until the master is bound,
+and a run moves from starting to running when Locust fires test_start.
+While the test runs, the master reports stats snapshots the same way, they
+are kept on the run and streamed to subscribers by live_stats.py.
+
+The master (or single) process also listens on a control socket,
+CONTROL_DIR/<test_id>.sock (see load/scripts/control.py), through which
+change_load() adjusts users and rates of the running test in place. Changes
+and load profile stages are recorded on the run's timeline.
+
+Snapshots also carry the load of the run's own Locust processes (see
+load/scripts/saturation.py). The run adds up how long they were saturated:
+past SATURATION_TOLERANCE of the load phase, the generator itself was the
+bottleneck and the run's results are flagged invalid.
+
+STATE_DIR/jobs/<test_id>.json is only a journal. It is rewritten on every
+status change and read once at startup, so a restarted generator can requeue
+tests that were waiting and clean up processes a crashed instance left
+behind. It is never polled.
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Set
+
+import httpx
+import psutil
+
+import live_stats
+import placement
+import process_output
+import worker_pool
+from load_profile import timespan_s
+from worker_pool import LOCUSTFILE, worker_command
+
+logger = logging.getLogger(__name__)
+
+STATE_DIR = Path("/mnt/state")
+STATE_DIR.mkdir(exist_ok=True)
+JOURNAL_DIR = STATE_DIR / "jobs"
+JOURNAL_DIR.mkdir(exist_ok=True)
+LEGACY_JOURNAL_FILE = STATE_DIR / "state.json"  # Single-test journal of earlier versions
+CONTROL_DIR = STATE_DIR / "control"
+CONTROL_DIR.mkdir(exist_ok=True)
+
+RESULTS_DIR = Path("/mnt/results")
+SHAPEFILE = str(Path(LOCUSTFILE).with_name("load_shapes.py"))  # Added as a second locustfile for load profiles
+
+RUN_TIME_GRACE_S = 30   # Time past run_time before a test that did not stop itself is terminated
+STOP_TIMEOUT_S = 10     # Time processes get to exit after SIGTERM before they are killed
+STARTUP_TIMEOUT_S = 30  # Time for Locust to start generating load, including workers connecting
+CONTROL_TIMEOUT_S = 5   # Time the master gets to answer a load change
+
+# Marker written by lifecycle_events.py in the locustfile directory, must match it
+EVENT_PREFIX = b"OBSERVASTACK_EVENT "
+
+# Share of the load phase the generator may be saturated before results are flagged invalid
+SATURATION_TOLERANCE = float(os.getenv("SATURATION_TOLERANCE") or "0.1")
+
+FINISHED_STATUSES = ("completed", "failed", "stopped", "timed_out", "interrupted", "cancelled")
+
+def parse_run_time(run_time_str: str) -> int:
+    """Parse a run_time the way Locust does (e.g. '30s', '10m', '1h30m') to seconds, raises ValueError if invalid."""
+    # Parsed locally: importing locust would gevent-patch the generator's API process
+    return int(timespan_s(run_time_str))
+
+def utc_timestamp(moment: datetime | None) -> str | None:
+    return moment.isoformat() + "Z" if moment else None
+
+def parse_timestamp(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value.rstrip("Z")) if value else None
+
+def is_distributed(config: Dict[str, Any]) -> bool:
+    """Runs with a master, autoscaled runs start distributed so workers can be added."""
+    return config.get("workers", 1) > 1 or bool(config.get("autoscale"))
+
+class GeneratorLoad:
+    """How hard the run's Locust processes worked, from the generator section of its stats snapshots."""
+
+    def __init__(self):
+        self.observed_s = 0.0
+        self.saturated_s = 0.0
+        self.peak_cpu_percent: float | None = None
+        self.peak_lag_ms: float | None = None
+        self.workers_added = 0
+        self.saturated_since: float | None = None  # Monotonic start of the current saturated streak
+        self.last_seen: float | None = None
+
+    def observe(self, generator: Dict[str, Any]) -> None:
+        """Account the time since the previous snapshot to the state this one reports."""
+        now = time.monotonic()
+        elapsed = now - self.last_seen if self.last_seen is not None else 0.0
+        self.last_seen = now
+        if not generator:
+            return
+        self.observed_s += elapsed
+        if generator.get("saturated"):
+            self.saturated_s += elapsed
+            if self.saturated_since is None:
+                self.saturated_since = now
+        else:
+            self.saturated_since = None
+        for process in generator.get("processes", []):
+            self.peak_cpu_percent = max(self.peak_cpu_percent or 0.0, process.get("cpu_percent") or 0.0)
+            self.peak_lag_ms = max(self.peak_lag_ms or 0.0, process.get("lag_ms") or 0.0)
+
+    @property
+    def valid(self) -> bool:
+        return self.saturated_s <= SATURATION_TOLERANCE * self.observed_s
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "valid": self.valid,
+            "observed_s": round(self.observed_s, 1),
+            "saturated_s": round(self.saturated_s, 1),
+            "peak_cpu_percent": self.peak_cpu_percent,
+            "peak_lag_ms": self.peak_lag_ms,
+            "workers_added": self.workers_added,
+        }
+
+    @classmethod
+    def from_dict(cls, journal: Dict[str, Any]) -> "GeneratorLoad":
+        load = cls()
+        load.observed_s = journal.get("observed_s", 0.0)
+        load.saturated_s = journal.get("saturated_s", 0.0)
+        load.peak_cpu_percent = journal.get("peak_cpu_percent")
+        load.peak_lag_ms = journal.get("peak_lag_ms")
+        load.workers_added = journal.get("workers_added", 0)
+        return load
+
+class TestRun:
+    """In-memory state of one load test job and its Locust processes."""
+
+    def __init__(self, test_id: str, config: Dict[str, Any], priority: int = 0):
+        self.test_id = test_id
+        self.config = config
+        self.priority = priority
+        # queued -> starting -> running -> completed | failed | stopped | timed_out | interrupted,
+        # or queued -> cancelled
+        self.status = "queued"
+        self.queued_at = datetime.utcnow()
+        self.started_at: datetime | None = None
+        self.finished_at: datetime | None = None
+        self.exit_code: int | None = None
+        self.error: str | None = None
+        self.cpus: List[int] = []       # CPUs reserved for this run by the scheduler
+        self.port: int | None = None    # Master bind port reserved for distributed runs
+        self.processes: Dict[str, asyncio.subprocess.Process] = {}
+        self.pids: Dict[str, int] = {}
+        self.placement: Dict[str, Dict[str, Any]] = {}  # CPUs and priority of each process, see placement.py
+        self.exit_codes: Dict[str, int | None] = {}
+        self.stop_reason: str | None = None
+        self.connected_workers: Set[str] = set()
+        self.pooled_workers = 0         # Workers adopted from the pre-forked pool
+        self.startup_ms: float | None = None
+        self.latest_stats: Dict[str, Any] | None = None  # Last live stats snapshot, not journaled
+        self.stage: str | None = None   # Current stage of the run's load profile
+        self.timeline: List[Dict[str, Any]] = []  # Load changes and stages while the run was running
+        self.generator_load = GeneratorLoad()
+        self.load_started = asyncio.Event()
+        self.done = asyncio.Event()
+        self.job_task: "asyncio.Task[None] | None" = None
+        # References to output readers so they are not garbage collected
+        self.tasks: List["asyncio.Task[None]"] = []
+
+    @property
+    def main_name(self) -> str:
+        return "master" if "master" in self.pids else "single"
+
+    @property
+    def pid(self) -> int | None:
+        return self.pids.get(self.main_name)
+
+    @property
+    def is_active(self) -> bool:
+        """Holds resources: being launched or running."""
+        return self.status in ("starting", "running")
+
+    @property
+    def workers_connected(self) -> int:
+        return len(self.connected_workers)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.done.is_set()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "test_id": self.test_id,
+            "pid": self.pid,  # Master or single process
+            "pids": list(self.pids.values()),  # All processes (master + workers or just single)
+            "config": self.config,
+            "priority": self.priority,
+            "status": self.status,
+            "queued_at": utc_timestamp(self.queued_at),
+            "timestamp": utc_timestamp(self.started_at),
+            "finished_at": utc_timestamp(self.finished_at),
+            "exit_code": self.exit_code,
+            "exit_codes": self.exit_codes,
+            "error": self.error,
+            "cpus": self.cpus,
+            "placement": self.placement,
+            "port": self.port,
+            "workers_connected": self.workers_connected,
+            "pooled_workers": self.pooled_workers,
+            "startup_ms": self.startup_ms,
+            "stage": self.stage,
+            "timeline": self.timeline,
+            "generator": self.generator_load.to_dict(),
+        }
+
+    def finish(self, status: str) -> None:
+        if not self.generator_load.valid:
+            logger.warning(f"Load generator was saturated for {self.generator_load.saturated_s:.0f}s of "
+                           f"{self.generator_load.observed_s:.0f}s of test {self.test_id}, its results are invalid")
+        self.status = status
+        self.finished_at = datetime.utcnow()
+        self.exit_codes = {name: proc.returncode for name, proc in self.processes.items()}
+        main = self.processes.get(self.main_name)
+        self.exit_code = main.returncode if main else None
+        write_journal(self)
+        self.done.set()
+        live_stats.close(self.test_id)
+        process_output.close(self.test_id)
+        control_path(self.test_id).unlink(missing_ok=True)
+
+def control_path(test_id: str) -> Path:
+    return CONTROL_DIR / f"{test_id}.sock"
+
+def journal_path(test_id: str) -> Path:
+    return JOURNAL_DIR / f"{test_id}.json"
+
+def write_journal(run: TestRun) -> None:
+    """Atomically record the run's state so a restarted generator can recover from it."""
+    path = journal_path(run.test_id)
+    tmp_file = path.with_suffix(".tmp")
+    tmp_file.write_text(json.dumps(run.to_dict()))
+    os.replace(tmp_file, path)
+
+def delete_journal(test_id: str) -> None:
+    journal_path(test_id).unlink(missing_ok=True)
+
+async def wait_for_sut_ready(host: str, timeout: int) -> None:
+    """Poll the SUT's readiness endpoint through the gateway until it reports ready."""
+    ready_url = f"{host.rstrip('/')}/api/ready"
+    deadline = time.monotonic() + timeout
+    last_error = "no response"
+    async with httpx.AsyncClient(timeout=2.0) as client:
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get(ready_url)
+                if response.status_code == 200:
+                    logger.info(f"SUT is ready at {ready_url}")
+                    return
+                last_error = f"status {response.status_code}: {response.text[:200]}"
+            except httpx.HTTPError as e:
+                last_error = str(e)
+            await asyncio.sleep(1)
+    raise RuntimeError(f"SUT not ready after {timeout}s ({last_error})")
+
+def handle_event(run: TestRun, name: str, event: Dict[str, Any]) -> None:
+    """Apply a lifecycle event reported by a Locust process."""
+    if event.get("event") == "worker_connected":
+        # Fired again when a worker re-sends client_ready, count each worker once
+        if event.get("worker") in run.connected_workers:
+            return
+        run.connected_workers.add(event.get("worker", ""))
+    elif event.get("event") == "test_start":
+        run.load_started.set()
+    elif event.get("event") == "stage":
+        run.stage = event.get("name")
+        run.timeline.append({"at": utc_timestamp(datetime.utcnow()), "event": "stage", "name": run.stage})
+    elif event.get("event") == "stats":
+        # Reported every stats interval, too frequent for the info log
+        run.latest_stats = {key: value for key, value in event.items() if key != "event"}
+        run.generator_load.observe(run.latest_stats.get("generator") or {})
+        live_stats.publish(run.test_id, run.latest_stats)
+        return
+    logger.info(f"[Locust {run.test_id} {name}] event {event}")
+
+def output_handler(run: TestRun, name: str) -> Callable[[bytes], None]:
+    """Returns a callback that applies the event a line of Locust output carries, or buffers and logs the line."""
+    output = process_output.output_for(run.test_id)
+
+    def handle_line(line: bytes) -> None:
+        if line.startswith(EVENT_PREFIX):
+            try:
+                handle_event(run, name, json.loads(line[len(EVENT_PREFIX):]))
+                return
+            except json.JSONDecodeError:
+                pass
+        output.append(name, line.decode(errors="replace").rstrip())
+    return handle_line
+
+async def log_output(run: TestRun, name: str, proc: asyncio.subprocess.Process) -> None:
+    """Handle a Locust process's output until it exits."""
+    assert proc.stdout is not None
+    try:
+        await process_output.read_lines(proc.stdout, output_handler(run, name))
+    except Exception as e:
+        logger.error(f"Error reading subprocess output from {name}: {e}")
+
+async def start_process(run: TestRun, name: str, cmd: List[str]) -> asyncio.subprocess.Process:
+    """Start a Locust process as part of the run and stream its output."""
+    logger.info(f"Starting Locust {name.upper()}: {' '.join(cmd)}")
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT
+    )
+    run.processes[name] = proc
+    run.pids[name] = proc.pid
+    run.placement[name] = placement.apply(proc.pid, name, run.cpus, run.config)
+    run.tasks.append(asyncio.create_task(log_output(run, name, proc)))
+    return proc
+
+def adopt_worker(run: TestRun, name: str, worker: worker_pool.PooledWorker) -> None:
+    """Make an idle pool worker part of the run, its output now goes to the run's log."""
+    run.processes[name] = worker.proc
+    run.pids[name] = worker.proc.pid
+    run.placement[name] = placement.apply(worker.proc.pid, name, run.cpus, run.config)
+    worker.on_line = output_handler(run, name)
+    logger.info(f"Adopted pool worker PID {worker.proc.pid} as Locust {name.upper()}")
+
+async def wait_until_started(run: TestRun) -> None:
+    """Wait for Locust's test_start event, failing fast if the main process exits first."""
+    main = run.processes[run.main_name]
+    started = asyncio.create_task(run.load_started.wait())
+    exited = asyncio.create_task(main.wait())
+    try:
+        await asyncio.wait({started, exited}, timeout=STARTUP_TIMEOUT_S, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        started.cancel()
+        exited.cancel()
+    if not run.load_started.is_set():
+        if main.returncode is not None:
+            raise RuntimeError(f"Locust exited during startup (exit code {main.returncode})")
+        raise RuntimeError(f"Locust did not start within {STARTUP_TIMEOUT_S}s "
+                           f"({run.workers_connected} of {run.config.get('workers', 1)} workers connected)")
+
+async def launch_test(run: TestRun) -> None:
+    """Wait for the SUT if configured, start the run's Locust processes and wait until load starts."""
+    config = run.config
+    test_id = run.test_id
+
+    # Validate and ensure host is set
+    host = config.get("host") or "http://sut-gateway/"
+
+    # Don't measure cold workers, wait until the SUT reports warmed up
+    if config.get("wait_for_ready", True):
+        await wait_for_sut_ready(host, config.get("ready_timeout", 60))
+
+    run.started_at = datetime.utcnow()
+    launch_start = time.perf_counter()
+
+    # Build Locust command
+    locust_cmd = [
+        sys.executable, "-m", "locust",
+        "-f", LOCUSTFILE,
+        "--headless",
+        "-H", host,
+        "--csv", f"{RESULTS_DIR}/{test_id}",
+        "--html", f"{RESULTS_DIR}/{test_id}.html",
+        "--test-run-id", test_id,
+        "--live-stats-interval", str(config.get("stats_interval", 1.0)),
+        "--latency-precision", str(config.get("latency_precision", 3)),
+        "--control-socket", str(control_path(test_id))
+    ]
+    if config.get("arrival_rate") or config.get("arrival_trace"):
+        # Open loop, users only split the arrival schedule between them (see load/scripts/open_loop.py)
+        locust_cmd += ["--arrival-rate", str(config.get("arrival_rate") or 0),
+                       "--arrival-distribution", config.get("arrival_distribution", "poisson")]
+        if config.get("arrival_trace"):
+            locust_cmd += ["--arrival-trace", config["arrival_trace"]]
+    if config.get("sample_log"):
+        locust_cmd += ["--sample-log", f"{RESULTS_DIR}/{test_id}_samples"]
+    if config.get("load_profile"):
+        # The shape drives users and duration, it only runs on the master (see load/scripts/load_shapes.py)
+        profile_file = RESULTS_DIR / f"{test_id}_profile.json"
+        profile_file.write_text(json.dumps(config["load_profile"], indent=2))
+        locust_cmd[locust_cmd.index(LOCUSTFILE)] = f"{LOCUSTFILE},{SHAPEFILE}"
+        locust_cmd += ["--load-profile", str(profile_file)]
+    else:
+        locust_cmd += ["--users", str(config["users"]), "--spawn-rate", str(config["spawn_rate"]),
+                       "--run-time", config["run_time"]]
+    if config.get("workload"):
+        # Kept next to the results, so the run's request mix can be reproduced
+        workload_file = RESULTS_DIR / f"{test_id}_workload.json"
+        workload_file.write_text(json.dumps(config["workload"], indent=2))
+        locust_cmd += ["--workload", str(workload_file)]
+    if config.get("replay"):
+        locust_cmd += ["--replay", config["replay"],
+                       "--replay-speed", str(config.get("replay_speed", 1.0)),
+                       "--replay-rate", str(config.get("replay_rate", 0))]
+        if config.get("replay_once"):
+            locust_cmd.append("--replay-once")
+    # Only the master picks user classes, workers run whatever it dispatches
+    locust_cmd.append(config.get("class_name") or "BasicUser")
+
+    # Handle distributed mode if workers > 1 or the run may add workers
+    workers = config.get("workers", 1)
+    if is_distributed(config):
+        # Adopt pre-forked idle workers if the pool fits, the run then takes over the pool's port
+        run.port, pooled = worker_pool.claim(run.port, workers)  # type: ignore[arg-type]
+        for i, worker in enumerate(pooled):
+            adopt_worker(run, f"worker-{i+1}", worker)
+        run.pooled_workers = len(pooled)
+
+        # Master on the port reserved for this run, so concurrent masters don't collide
+        master_cmd = locust_cmd + [
+            "--master",
+            "--expect-workers", str(workers),
+            "--expect-workers-max-wait", str(STARTUP_TIMEOUT_S),
+            "--master-bind-port", str(run.port)
+        ]
+
+        # Workers retry until the master is bound, so everything starts at once
+        await asyncio.gather(
+            start_process(run, "master", master_cmd),
+            *(start_process(run, f"worker-{i+1}", worker_command(run.port)) for i in range(len(pooled), workers))  # type: ignore[arg-type]
+        )
+    else:
+        # Single process mode
+        await start_process(run, "single", locust_cmd)
+
+    write_journal(run)
+    await wait_until_started(run)
+
+    run.status = "running"
+    run.startup_ms = round((time.perf_counter() - launch_start) * 1000, 1)
+    write_journal(run)
+    logger.info(f"Started test {test_id} with PIDs {list(run.pids.values())} on CPUs {run.cpus} "
+                f"in {run.startup_ms} ms ({run.pooled_workers} pooled workers)")
+
+async def change_load(run: TestRun, changes: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Change users, spawn rate or arrival rate of a running test through its control socket.
+
+    Raises ValueError if Locust refuses the change and RuntimeError if it
+    cannot be reached. Accepted changes are recorded on the run's timeline.
+    """
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_unix_connection(str(control_path(run.test_id))), CONTROL_TIMEOUT_S
+        )
+    except (OSError, asyncio.TimeoutError) as e:
+        raise RuntimeError(f"Cannot reach the test's control socket: {e}")
+    try:
+        writer.write(json.dumps(changes).encode() + b"\n")
+        await writer.drain()
+        reply = json.loads(await asyncio.wait_for(reader.readline(), CONTROL_TIMEOUT_S) or b"{}")
+    except (OSError, asyncio.TimeoutError, json.JSONDecodeError) as e:
+        raise RuntimeError(f"No answer on the test's control socket: {e}")
+    finally:
+        writer.close()
+    if not reply.get("ok"):
+        raise ValueError(reply.get("error") or "Load change refused")
+    applied = {key: reply[key] for key in ("users", "spawn_rate", "arrival_rate")}
+    run.timeline.append({"at": utc_timestamp(datetime.utcnow()), "event": "load_changed", **applied})
+    write_journal(run)
+    logger.info(f"Changed load of test {run.test_id}: {applied}")
+    return applied
+
+async def add_worker(run: TestRun) -> None:
+    """Start one more worker for a running distributed test, the master rebalances users onto it."""
+    name = f"worker-{sum(1 for process in run.pids if process.startswith('worker-')) + 1}"
+    await start_process(run, name, worker_command(run.port))  # type: ignore[arg-type]
+    run.generator_load.workers_added += 1
+    write_journal(run)
+
+async def terminate_processes(run: TestRun) -> None:
+    """SIGTERM every process of the run that is still alive, then SIGKILL those that do not exit."""
+    alive = [proc for proc in run.processes.values() if proc.returncode is None]
+    for proc in alive:
+        try:
+            proc.send_signal(signal.SIGTERM)
+            logger.info(f"Sent SIGTERM to test process PID {proc.pid}")
+        except ProcessLookupError:
+            pass
+    try:
+        await asyncio.wait_for(asyncio.gather(*(proc.wait() for proc in alive)), STOP_TIMEOUT_S)
+    except asyncio.TimeoutError:
+        for proc in alive:
+            if proc.returncode is None:
+                logger.warning(f"Test process PID {proc.pid} ignored SIGTERM, killing it")
+                proc.kill()
+        await asyncio.gather(*(proc.wait() for proc in alive))
+
+async def watch_test(run: TestRun) -> None:
+    """Wait for the run's main process to exit and record the outcome immediately."""
+    main = run.processes[run.main_name]
+    timeout = parse_run_time(run.config.get("run_time", "5m")) + RUN_TIME_GRACE_S
+    try:
+        await asyncio.wait_for(asyncio.shield(main.wait()), timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Test {run.test_id} exceeded its run time ({run.config.get('run_time')}), stopping it")
+        run.stop_reason = "timed_out"
+        await terminate_processes(run)
+
+    await main.wait()
+    # Workers quit with the master, stop any that are left over
+    await terminate_processes(run)
+
+    run.finish(run.stop_reason or ("completed" if main.returncode == 0 else "failed"))
+    logger.info(f"Test {run.test_id} {run.status} (exit code {run.exit_code}) after "
+                f"{(run.finished_at - run.started_at).total_seconds():.1f}s")  # type: ignore[operator]
+
+def terminate_orphans(pids: List[int]) -> int:
+    """Terminate Locust processes a previous generator instance left behind."""
+    orphans: List[psutil.Process] = []
+    for pid in pids:
+        try:
+            proc = psutil.Process(pid)
+            # The PID may have been reused since the journal was written
+            if "locust" in " ".join(proc.cmdline()).lower():
+                proc.terminate()
+                orphans.append(proc)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    _, still_alive = psutil.wait_procs(orphans, timeout=STOP_TIMEOUT_S)
+    for proc in still_alive:
+        proc.kill()
+    return len(orphans)
+
+def recover_journal(path: Path) -> TestRun | None:
+    """
+    Rebuild a run from its journal after a restart.
+
+    Queued runs come back queued. The Locust processes of a run that was
+    running cannot be adopted: they are not our children, so their exit codes
+    are lost, and their output pipes went away with the old process. They are
+    terminated and the run is marked interrupted.
+    """
+    try:
+        journal = json.loads(path.read_text())
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Failed to read state journal {path}: {e}")
+        return None
+
+    run = TestRun(journal.get("test_id", path.stem), journal.get("config", {}), journal.get("priority", 0))
+    run.status = journal.get("status", "interrupted")
+    run.queued_at = parse_timestamp(journal.get("queued_at") or journal.get("timestamp")) or run.queued_at
+    run.started_at = parse_timestamp(journal.get("timestamp"))
+    run.finished_at = parse_timestamp(journal.get("finished_at"))
+    run.exit_code = journal.get("exit_code")
+    run.exit_codes = journal.get("exit_codes") or {}
+    run.error = journal.get("error")
+    run.cpus = journal.get("cpus") or []
+    run.placement = journal.get("placement") or {}
+    run.timeline = journal.get("timeline") or []
+    run.port = journal.get("port")
+    run.generator_load = GeneratorLoad.from_dict(journal.get("generator") or {})
+    # Support both old (single pid) and new (pids array) format
+    pids = journal.get("pids") or ([journal["pid"]] if journal.get("pid") else [])
+    names = (["master"] + [f"worker-{i}" for i in range(1, len(pids))]) if len(pids) > 1 else ["single"]
+    run.pids = dict(zip(names, pids))
+
+    if run.status == "queued":
+        return run
+    if run.status not in FINISHED_STATUSES:
+        terminated = terminate_orphans(pids)
+        logger.warning(f"Recovered interrupted test {run.test_id}, terminated {terminated} orphaned process(es)")
+        run.finish("interrupted")
+    run.done.set()
+    return run
+
+def recover_journals() -> List[TestRun]:
+    """Recover every journaled run, migrating the single-test journal of earlier versions."""
+    if LEGACY_JOURNAL_FILE.exists():
+        try:
+            legacy_id = json.loads(LEGACY_JOURNAL_FILE.read_text()).get("test_id", "legacy")
+            os.replace(LEGACY_JOURNAL_FILE, journal_path(legacy_id))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Failed to migrate legacy state journal: {e}")
+
+    runs = [recover_journal(path) for path in JOURNAL_DIR.glob("*.json")]
+    return [run for run in runs if run is not None]
@@ -0,0 +1,121 @@
+"""
+Live stats streaming for running tests.
+
+The master (or single) Locust process of a run reports a stats snapshot every
+stats_interval seconds (see load/scripts/live_stats.py). Snapshots are fanned
+out to the run's subscribers and streamed as Server-Sent Events.
+
+Each subscriber holds at most one pending snapshot. A consumer that reads
+slower than snapshots arrive gets the latest one and a count of the snapshots
+it skipped, so a slow client costs neither memory nor a stalled run. Deltas
+are computed per subscriber against the last snapshot it was sent: the first
+event carries every endpoint, later events only the endpoints that changed,
+with the requests and failures added since the previous event.
+"""
+
+import json
+import time
+import asyncio
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Set, Tuple
+
+if TYPE_CHECKING:
+    from lifecycle import TestRun
+
+HEARTBEAT_S = 15.0  # Comment line sent while no stats arrive, keeps proxies from closing the stream
+
+class Subscriber:
+    """One stream consumer, keeps only the latest snapshot it has not been sent yet."""
+
+    def __init__(self):
+        self.pending: Dict[str, Any] | None = None
+        self.skipped = 0
+        self.updated = asyncio.Event()
+
+    def offer(self, snapshot: Dict[str, Any]) -> None:
+        if self.pending is not None:
+            self.skipped += 1
+        self.pending = snapshot
+        self.updated.set()
+
+    def take(self) -> Tuple[Dict[str, Any] | None, int]:
+        snapshot, skipped = self.pending, self.skipped
+        self.pending, self.skipped = None, 0
+        self.updated.clear()
+        return snapshot, skipped
+
+subscribers: Dict[str, Set[Subscriber]] = {}
+
+def publish(test_id: str, snapshot: Dict[str, Any]) -> None:
+    for subscriber in subscribers.get(test_id, ()):
+        subscriber.offer(snapshot)
+
+def close(test_id: str) -> None:
+    """Wake the run's subscribers so their streams see that the run finished."""
+    for subscriber in subscribers.get(test_id, ()):
+        subscriber.updated.set()
+
+def with_deltas(entry: Dict[str, Any], previous: Dict[str, Any] | None) -> Dict[str, Any]:
+    return {
+        **entry,
+        "new_requests": entry.get("requests", 0) - (previous or {}).get("requests", 0),
+        "new_failures": entry.get("failures", 0) - (previous or {}).get("failures", 0),
+    }
+
+def diff(snapshot: Dict[str, Any], previous: Dict[str, Any] | None) -> Dict[str, Any]:
+    """The snapshot as a delta against the previous one sent to the same subscriber."""
+    last_endpoints = {(e["name"], e["method"]): e for e in (previous or {}).get("endpoints", [])}
+    endpoints: List[Dict[str, Any]] = []
+    for entry in snapshot.get("endpoints", []):
+        last = last_endpoints.get((entry["name"], entry["method"]))
+        if entry != last:
+            endpoints.append(with_deltas(entry, last))
+    return {
+        **snapshot,
+        "total": with_deltas(snapshot.get("total", {}), (previous or {}).get("total")),
+        "endpoints": endpoints,
+    }
+
+def sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream(run: "TestRun") -> AsyncIterator[str]:
+    """
+    Server-Sent Events for a run: "stats" while it runs, then one "end" event.
+
+    Writes block while the client's socket buffer is full, snapshots arriving
+    meanwhile replace each other in the subscriber instead of queueing.
+    """
+    subscriber = Subscriber()
+    subscribers.setdefault(run.test_id, set()).add(subscriber)
+    if run.latest_stats is not None:
+        subscriber.offer(run.latest_stats)
+    previous: Dict[str, Any] | None = None
+    sent_at = time.monotonic()
+    try:
+        while True:
+            if not subscriber.updated.is_set() and not run.is_finished:
+                try:
+                    await asyncio.wait_for(subscriber.updated.wait(), HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+            snapshot, skipped = subscriber.take()
+            if snapshot is not None:
+                now = time.monotonic()
+                data = diff(snapshot, previous)
+                data.update(test_id=run.test_id, status=run.status, skipped=skipped,
+                            since_last_s=round(now - sent_at, 3) if previous else None)
+                previous, sent_at = snapshot, now
+                yield sse("stats", data)
+            if run.is_finished:
+                break
+        yield sse("end", {
+            "test_id": run.test_id,
+            "status": run.status,
+            "exit_code": run.exit_code,
+            "error": run.error,
+        })
+    finally:
+        subscribers[run.test_id].discard(subscriber)
+        if not subscribers[run.test_id]:
+            del subscribers[run.test_id]
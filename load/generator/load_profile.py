@@ -0,0 +1,73 @@
+"""
+Load profile models.
+
+A test's "load_profile" config replaces the single ramp of users, spawn_rate
+and run_time with stages: steps and soaks that hold a user count, linear
+ramps, spikes and sine waves. The profile is validated here when the test is
+submitted, written next to the results as <test_id>_profile.json and run by
+ProfileShape (load/scripts/load_shapes.py), which records per-stage
+statistics in <test_id>_stages.json.
+"""
+
+import re
+from typing import Dict, List, Literal
+
+from pydantic import BaseModel, model_validator
+
+TIMESPAN = re.compile(r"^((?P<hours>\d+?)h)?((?P<minutes>\d+?)m)?((?P<seconds>\d+?)s)?$")
+
+def timespan_s(value: float | str) -> float:
+    """Seconds of a duration given as a number or a Locust timespan such as "90s", "5m" or "1h30m"."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if value.isdigit():
+        return float(value)
+    match = TIMESPAN.match(value)
+    if not value or match is None:
+        raise ValueError(f"Invalid duration {value}, use seconds or e.g. 90s, 5m, 1h30m")
+    return float(sum(int(match[unit] or 0) * scale for unit, scale in (("hours", 3600), ("minutes", 60), ("seconds", 1))))
+
+class Stage(BaseModel):
+    type: Literal["step", "ramp", "spike", "sine", "soak"] = "step"
+    duration: float | str
+    name: str | None = None
+    users: int | None = None        # Target users (all but sine)
+    spawn_rate: float | None = None # step, soak and spike, defaults to the profile's spawn_rate
+    min_users: int | None = None    # sine
+    max_users: int | None = None    # sine
+    period: float | str | None = None  # sine
+
+    @model_validator(mode="after")
+    def check_fields(self) -> "Stage":
+        if timespan_s(self.duration) <= 0:
+            raise ValueError("Stage duration must be positive")
+        if self.type == "sine":
+            if self.min_users is None or self.max_users is None or self.period is None:
+                raise ValueError("sine stages need min_users, max_users and period")
+            if not 0 <= self.min_users <= self.max_users or timespan_s(self.period) <= 0:
+                raise ValueError("sine stages need 0 <= min_users <= max_users and a positive period")
+        elif self.users is None or self.users < 0:
+            raise ValueError(f"{self.type} stages need users (at least 0)")
+        if self.spawn_rate is not None and self.spawn_rate <= 0:
+            raise ValueError("spawn_rate must be positive")
+        return self
+
+class LoadProfile(BaseModel):
+    stages: List[Stage]
+    spawn_rate: float | None = None  # Default for step and soak stages, the test's spawn_rate if not given
+
+    @model_validator(mode="after")
+    def check_stages(self) -> "LoadProfile":
+        if not self.stages:
+            raise ValueError("A load profile needs at least one stage")
+        return self
+
+    @property
+    def duration_s(self) -> float:
+        return sum(timespan_s(stage.duration) for stage in self.stages)
+
+    def to_spec(self, default_spawn_rate: float) -> Dict[str, object]:
+        """The profile as ProfileShape reads it."""
+        spec = self.model_dump(exclude_none=True)
+        spec["spawn_rate"] = self.spawn_rate or default_spawn_rate
+        return spec
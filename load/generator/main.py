@@ -1,28 +1,36 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Literal
 
-import asyncio
 import json
+import math
 import logging
-import os
-import signal
-import subprocess
-import sys
-import time
 import uuid
-from datetime import datetime, timedelta
 from pathlib import Path
-import threading
 
-import psutil
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST
+from pydantic import BaseModel, ValidationError
+
+import artifacts
+import capacity
+import live_stats
+import metrics
+import process_output
+import process_sampler
+import results_index
+import run_comparison
+import sample_analysis
+import scheduler
+from lifecycle import TestRun, change_load, parse_run_time
+from load_profile import LoadProfile
+from placement import Placement
+from worker_pool import LOCUSTFILE
+from workload_spec import Workload
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Directories
-STATE_DIR = Path("/mnt/state")
-STATE_DIR.mkdir(exist_ok=True)
+# Directories (test state is journaled to /mnt/state, see lifecycle.py, results are indexed there too)
 RESULTS_DIR = Path("/mnt/results")
 RESULTS_DIR.mkdir(exist_ok=True)
 
@@ -43,105 +51,39 @@ class TestConfig(BaseModel):
     host: str = "http://sut-gateway"
     class_name: str = "BasicUser"
     workers: int = 1
+    wait_for_ready: bool = True  # Wait for the SUT's /ready endpoint before starting Locust
+    ready_timeout: int = 60      # Seconds to wait for the SUT to become ready
+    priority: int = 0            # Higher priority tests start first when the generator is busy
+    stats_interval: float = 1.0  # Seconds between live stats snapshots streamed by /test/{test_id}/stream
+    latency_precision: int = 3   # Significant digits of the latency histograms (1 to 5)
+    sample_log: bool = False     # Record every request for /results/{test_id}/samples analysis
+    arrival_rate: float = 0      # Open loop: target requests/s for the whole test, 0 keeps users closed-loop
+    arrival_distribution: str = "poisson"  # Open loop inter-arrival times: fixed, poisson or trace
+    arrival_trace: str | None = None       # Inter-arrival times file for the trace distribution (in /mnt/locust)
+    workload: Workload | None = None       # Declarative request mix, run by WorkloadUser instead of class_name
+    replay: str | None = None    # Capture file replayed by ReplayUser instead of class_name (relative to /mnt/locust)
+    replay_speed: float = 1.0    # Replay: speed-up of the recorded timing
+    replay_rate: float = 0       # Replay: fixed requests/s for the whole test instead of the recorded timing
+    replay_once: bool = False    # Replay: one pass through the capture instead of looping it
+    load_profile: LoadProfile | None = None  # Stages replacing users/spawn_rate/run_time, run by ProfileShape
+    autoscale: bool = False      # Add workers on free CPUs while the generator itself is saturated
+    max_workers: int | None = None  # Autoscale: at most this many workers (default: every generator CPU)
+    placement: Placement | None = None  # CPU pinning (on by default) and nice/I/O priority of master and workers
 
-# Helper functions
-def parse_run_time(run_time_str: str) -> int:
-    """Parse run_time string (e.g., '10m', '5h', '30s') to seconds."""
-    try:
-        unit = run_time_str[-1].lower()
-        value = int(run_time_str[:-1])
-        
-        if unit == 's':
-            return value
-        elif unit == 'm':
-            return value * 60
-        elif unit == 'h':
-            return value * 3600
-        else:
-            logger.warning(f"Unknown time unit: {unit}, defaulting to seconds")
-            return int(run_time_str)
-    except (ValueError, IndexError) as e:
-        logger.error(f"Failed to parse run_time '{run_time_str}': {e}")
-        return 300  # Default to 5 minutes
-
-def delete_active_test() -> dict[str, bool]:
-    """Delete the active test process if one is running."""
-    result = {"found": False, "deleted": False}
-    state_file = STATE_DIR / "state.json"
-    if state_file.exists():
-        try:
-            old_state = json.loads(state_file.read_text())
-            old_pids = old_state.get("pids", [old_state.get("pid")]) if old_state.get("pid") else []
-            
-            if old_pids:
-                result["found"] = True
-                for pid in old_pids:
-                    if pid:
-                        try:
-                            os.kill(pid, signal.SIGTERM)
-                            logger.info(f"Killed test process PID {pid}")
-                        except ProcessLookupError:
-                            logger.info(f"Test process PID {pid} already dead")
-                
-                state_file.unlink()
-                logger.info("Removed state file.")
-                result["deleted"] = True
-        except Exception as e:
-            logger.warning(f"Error cleaning up old test: {str(e)}")
-    return result
-
-async def check_test_state():
-    """Background task that monitors active tests and cleans up expired ones."""
-    wait_time = 5  # seconds
-    while True:
-        try:
-            await asyncio.sleep(wait_time)
-            
-            state_file = STATE_DIR / "state.json"
-            if not state_file.exists():
-                continue
-            
-            try:
-                state = json.loads(state_file.read_text())
-                test_id = state.get("test_id")
-                pid = state.get("pid")
-                timestamp_str = state.get("timestamp")
-                config = state.get("config", {})
-                run_time_str = config.get("run_time", "5m")
-                
-                if not timestamp_str:
-                    logger.warning(f"Test {test_id} has no timestamp, skipping validation")
-                    continue
-                
-                # Parse timestamp and run_time
-                start_time = datetime.fromisoformat(timestamp_str.rstrip('Z'))
-                run_time_seconds = parse_run_time(run_time_str)
-                expected_end_time = start_time + timedelta(seconds=run_time_seconds)
-                current_time = datetime.utcnow()
-                
-                # Add 60 second grace period for cleanup
-                grace_period = timedelta(seconds=60)
-                
-                if current_time > (expected_end_time + grace_period):
-                    logger.info(f"Test {test_id} exceeded runtime ({run_time_str}), cleaning up")
-                    logger.info(f"  Start: {start_time}, Expected End: {expected_end_time}, Current: {current_time}")
-                    
-                    # Use the shared delete function
-                    delete_active_test()
-                    
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse state file: {e}")
-            except Exception as e:
-                logger.error(f"Error checking test state: {e}")
-                
-        except Exception as e:
-            logger.error(f"Error in state checker background task: {e}")
+class LoadChange(BaseModel):
+    users: int | None = None
+    spawn_rate: float | None = None
+    arrival_rate: float | None = None  # Open-loop tests only
 
 @app.on_event("startup")
 async def startup_event():
-    """Start background tasks on application startup."""
-    asyncio.create_task(check_test_state())
-    logger.info("Started background state checker task")
+    """Recover journaled tests and pre-fork the idle worker pool."""
+    await scheduler.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop running tests, their output can no longer be read once this process exits."""
+    await scheduler.shutdown()
 
 # Asynchronous handlers
 
@@ -154,262 +96,316 @@ async def startup_event():
 async def get_status():
     return {"message": "The server is up and running."}
 
+@app.get(
+    "/metrics",
+    name="/metrics",
+    summary="Prometheus Metrics",
+    description="Client-side requests, failures, latency histograms, users and workers of running tests, aggregated across workers."
+)
+async def get_metrics() -> Response:
+    """Prometheus exposition of the running tests' live stats."""
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE_LATEST)
+
 @app.get(
     "/processes",
     name="/processes",
     summary="List Locust Processes",
-    description="List all running Locust processes to detect zombies or orphaned tests."
+    description="Locust processes with their CPU, memory, threads and connections from the latest background sample, "
+                "to detect zombies or orphaned tests, and per running test the minimum and maximum of each value."
 )
 async def get_processes() -> Dict[str, Any]:
     """List all running Locust processes."""
-    try:
-        processes: List[Dict[str, Any]] = []
-        
-        # Iterate through all processes and find Locust ones
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline', 'status', 'cpu_percent', 'memory_percent', 'create_time']):
-            try:
-                cmdline = proc.info.get('cmdline') or []
-                cmdline_str = ' '.join(cmdline)
-                
-                # Check if this is a Locust process
-                if 'locust' in cmdline_str.lower():
-                    # Get process status
-                    status = proc.info.get('status', 'unknown')
-                    is_zombie = (status == psutil.STATUS_ZOMBIE)
-                    
-                    # Calculate runtime
-                    create_time = proc.info.get('create_time', 0)
-                    runtime_seconds = time.time() - create_time if create_time else 0
-                    
-                    processes.append({
-                        "pid": proc.info['pid'],
-                        "name": proc.info.get('name', 'unknown'),
-                        "status": status,
-                        "cpu_percent": round(proc.info.get('cpu_percent', 0.0), 2),
-                        "memory_percent": round(proc.info.get('memory_percent', 0.0), 2),
-                        "runtime_seconds": int(runtime_seconds),
-                        "command": cmdline_str[:200],  # Truncate long commands
-                        "is_zombie": is_zombie
-                    })
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                # Process disappeared or we don't have access
-                continue
-        
-        # Get state file info for comparison
-        state_file = STATE_DIR / "state.json"
-        state_pids = []
-        state_test_id = None
-        
-        if state_file.exists():
-            try:
-                state = json.loads(state_file.read_text())
-                # Support both old (single pid) and new (pids array) format
-                state_pids = state.get("pids", [state.get("pid")]) if state.get("pid") else []
-                state_test_id = state.get("test_id")
-            except Exception:
-                pass
-        
-        # Mark processes as orphaned if they don't match state
-        for proc in processes:
-            proc["is_tracked"] = (proc["pid"] in state_pids)
-        
-        return {
-            "total_processes": len(processes),
-            "tracked_pids": state_pids,
-            "tracked_test_id": state_test_id,
-            "processes": processes
-        }
-        
-    except Exception as e:
-        logger.error(f"Error querying processes: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
-
-# Synchronous handlers
+    # Compare against the PIDs of the tests the scheduler is running
+    tracked = scheduler.tracked_processes()
+    
+    processes: List[Dict[str, Any]] = []
+    for row in process_sampler.table:
+        owner = tracked.get(row["pid"])
+        processes.append({
+            **row,
+            "is_tracked": owner is not None,
+            "test_id": owner[0] if owner else None,
+            "process": owner[1] if owner else None,
+        })
+    
+    return {
+        "sampled_at": process_sampler.sampled_at,
+        "sample_interval_s": process_sampler.SAMPLE_INTERVAL_S,
+        "total_processes": len(processes),
+        "tracked_pids": list(tracked),
+        "tracked_test_ids": sorted({test_id for test_id, _ in tracked.values()}),
+        "processes": processes,
+        "ranges": process_sampler.ranges,
+    }
 
 @app.post(
     "/test", 
     name="/test",
     summary="Run Load Test",
-    description="Run a load test with the specified configuration."
+    description="Queue a load test with the specified configuration, it starts as soon as resources are free."
 )
-def post_test(config: TestConfig) -> dict[str, str | int]:
-    """Spawn Locust and store state to volume"""
-    test_id = str(uuid.uuid4())
-    state_file = STATE_DIR / f"state.json"
-    
-    # Validate and ensure host is set
-    host = config.host or "http://sut-gateway/"
-    
-    # There's a race condition here between deleting the old state, 
-    # spawning a worker, and writing the new state. It's minimal, 
-    # accept it that for now. The state checker function will clean it up.
+async def post_test(config: TestConfig) -> dict[str, Any]:
+    """Submit a test to the scheduler"""
+    run = prepare_run(config)
     try:
-        # Delete any active test before starting new one
-        _ = delete_active_test()
-        
-        # Build Locust command
-        locust_cmd = [
-            sys.executable, "-m", "locust",
-            "-f", "/mnt/locust/loadtest.py",
-            "--headless",
-            "-H", host,
-            "--users", str(config.users),
-            "--spawn-rate", str(config.spawn_rate),
-            "--run-time", config.run_time,
-            "--csv", f"/mnt/results/{test_id}",
-            "--html", f"/mnt/results/{test_id}.html"
-        ]
-        
-        processes = []
-        
-        # Handle distributed mode if workers > 1
-        if config.workers > 1:
-            # Start master process
-            master_cmd = locust_cmd + ["--master", "--expect-workers", str(config.workers)]
-            logger.info(f"Starting Locust MASTER: {' '.join(master_cmd)}")
-            
-            master_process = subprocess.Popen(
-                master_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1
-            )
-            processes.append(("master", master_process))
-            
-            # Give master time to start
-            time.sleep(2)
-            
-            # Start worker processes
-            for i in range(config.workers):
-                worker_cmd = [
-                    sys.executable, "-m", "locust",
-                    "-f", "/mnt/locust/loadtest.py",
-                    "--worker",
-                    "--master-host", "localhost"
-                ]
-                logger.info(f"Starting Locust WORKER {i+1}: {' '.join(worker_cmd)}")
-                
-                worker_process = subprocess.Popen(
-                    worker_cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    text=True,
-                    bufsize=1
-                )
-                processes.append((f"worker-{i+1}", worker_process))
-            
-            # Use master as the main process for tracking
-            process = master_process
-        else:
-            # Single process mode
-            logger.info(f"Starting Locust SINGLE: {' '.join(locust_cmd)}")
-            process = subprocess.Popen(
-                locust_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1
-            )
-            processes.append(("single", process))
-        
-        # Log subprocess output in background (non-blocking) for all processes
-        def log_subprocess_output(proc_name, proc):
-            try:
-                for line in iter(proc.stdout.readline, ''):
-                    if line:
-                        logger.info(f"[Locust {test_id} {proc_name}] {line.rstrip()}")
-            except Exception as e:
-                logger.error(f"Error reading subprocess output from {proc_name}: {e}")
-        
-        for proc_name, proc in processes:
-            output_thread = threading.Thread(
-                target=log_subprocess_output, 
-                args=(proc_name, proc),
-                daemon=True
-            )
-            output_thread.start()
-
-        # Write state (config + PIDs) to volume
-        all_pids = [p.pid for _, p in processes]
-        state_file.write_text(json.dumps({
-            "test_id": test_id,
-            "pid": process.pid,  # Master or single process
-            "pids": all_pids,  # All processes (master + workers or just single)
-            "config": config.model_dump(),
-            "status": "running",
-            "timestamp": datetime.utcnow().isoformat() + "Z"
-        }))
-        
-        logger.info(f"Started test {test_id} with PIDs {all_pids}")
-        
-        return {
-            "test_id": test_id,
-            "pid": process.pid,
-            "status": "success"
-        }
-        
+        scheduler.submit(run)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error starting test: {str(e)}")
+        logger.error(f"Error submitting test: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    logger.info(f"Submitted test {run.test_id} (priority {run.priority}), status {run.status}")
+    return {
+        "test_id": run.test_id,
+        "status": run.status,
+        "cpus": run.cpus,
+        "port": run.port
+    }
+
+def prepare_run(config: TestConfig) -> TestRun:
+    """Validate a test config and build its run, not yet submitted."""
+    if not 1 <= config.latency_precision <= 5:
+        raise HTTPException(status_code=400, detail="latency_precision must be between 1 and 5")
+    try:
+        parse_run_time(config.run_time)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid run_time {config.run_time}, use e.g. 90s, 5m or 1h30m")
+    if config.arrival_distribution not in ("fixed", "poisson", "trace"):
+        raise HTTPException(status_code=400, detail="arrival_distribution must be fixed, poisson or trace")
+    if config.arrival_rate < 0:
+        raise HTTPException(status_code=400, detail="arrival_rate must be at least 0")
+    if (config.arrival_distribution == "trace") != bool(config.arrival_trace):
+        raise HTTPException(status_code=400, detail="arrival_trace is required with, and only with, the trace distribution")
+    if config.arrival_rate > 0 and config.load_profile is not None:
+        # The shape sets the users, open-loop users split the rate by a total they do not know
+        raise HTTPException(status_code=400, detail="arrival_rate and load_profile cannot be combined")
+    if config.workload is not None and config.replay:
+        raise HTTPException(status_code=400, detail="workload and replay cannot be combined")
+    if config.autoscale and config.replay:
+        # Workers split the capture by the worker count they start with
+        raise HTTPException(status_code=400, detail="replay cannot be autoscaled")
+    if config.max_workers is not None and config.max_workers < config.workers:
+        raise HTTPException(status_code=400, detail="max_workers must be at least workers")
+    run_config = config.model_dump()
+    if config.workload is not None:
+        run_config.update(class_name="WorkloadUser", workload=config.workload.to_spec())
+    if config.load_profile is not None:
+        # The run ends after the last stage, run_time only bounds how long the generator waits for it
+        run_config.update(load_profile=config.load_profile.to_spec(config.spawn_rate),
+                          run_time=f"{math.ceil(config.load_profile.duration_s)}s")
+    if config.replay:
+        if config.replay_speed <= 0 or config.replay_rate < 0:
+            raise HTTPException(status_code=400, detail="replay_speed must be positive and replay_rate at least 0")
+        if config.users < config.workers:
+            # Each worker replays its share of the capture with its own users
+            raise HTTPException(status_code=400, detail="replay needs at least one user per worker")
+        replay_file = Path(LOCUSTFILE).parent / config.replay
+        if not replay_file.is_file():
+            raise HTTPException(status_code=400, detail=f"Capture {replay_file} not found")
+        run_config.update(class_name="ReplayUser", replay=str(replay_file))
+    return TestRun(str(uuid.uuid4()), run_config, config.priority)
 
 @app.get("/test", name="/test")
-def get_test() -> dict[str, Any]:
-    """Get active test config from volume."""
-    state_file = STATE_DIR / f"state.json"
+async def get_tests() -> dict[str, Any]:
+    """List running, queued and finished tests with the generator's free capacity."""
+    return scheduler.list_runs()
+
+def run_logs(run: TestRun, process: str | None, tail: int, follow: bool) -> StreamingResponse:
+    if not 0 <= tail <= process_output.RING_LINES * max(1, len(run.pids)):
+        raise HTTPException(status_code=400, detail=f"tail must be between 0 and {process_output.RING_LINES} per process")
+    if process is not None and process not in run.pids:
+        raise HTTPException(status_code=404, detail=f"Test {run.test_id} has no process {process}")
+    output = process_output.output_for(run.test_id)
+    if follow and not run.is_finished:
+        return StreamingResponse(process_output.follow(output, tail, process), media_type="text/plain")
+    return StreamingResponse(iter([process_output.format_line(line) for line in output.tail(tail, process)]),
+                             media_type="text/plain")
+
+@app.get("/test/logs", name="/test-logs")
+async def get_test_logs(process: str | None = None, tail: int = 100, follow: bool = False) -> StreamingResponse:
+    """Output of the most recently started test, see /test/{test_id}/logs."""
+    started = [run for run in scheduler.runs.values() if run.started_at is not None]
+    if not started:
+        raise HTTPException(status_code=404, detail="No test has started")
+    return run_logs(max(started, key=lambda run: run.started_at), process, tail, follow)
+
+@app.get(
+    "/test/{test_id}/logs",
+    name="/test-logs-by-id",
+    summary="Test Output",
+    description="Last lines of a test's Locust output (all processes or one), and with follow, new lines until it finishes."
+)
+async def get_test_logs_by_id(
+    test_id: str, process: str | None = None, tail: int = 100, follow: bool = False
+) -> StreamingResponse:
+    """Tail and follow a test's Locust output from the generator's ring buffers."""
+    run = scheduler.get_run(test_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Test not found")
+    return run_logs(run, process, tail, follow)
+
+@app.get("/test/{test_id}", name="/test-by-id")
+async def get_test(test_id: str) -> dict[str, Any]:
+    """Get a test's config and lifecycle state."""
+    run = scheduler.get_run(test_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Test not found")
     
-    if not state_file.exists():
+    return run.to_dict()
+
+@app.get(
+    "/test/{test_id}/stream",
+    name="/test-stream",
+    summary="Stream Live Stats",
+    description="Server-Sent Events with live per-endpoint RPS, latency percentiles, failures and user count of a test."
+)
+async def stream_test(test_id: str) -> StreamingResponse:
+    """Stream a test's live stats until it finishes."""
+    run = scheduler.get_run(test_id)
+    if run is None:
         raise HTTPException(status_code=404, detail="Test not found")
     
-    return json.loads(state_file.read_text())
+    return StreamingResponse(
+        live_stats.stream(run),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.delete("/test", name="/test")
-def delete_test():
-    """Delete the active test and its state if it exists."""
-    result = {"found": False, "deleted": False}
+async def delete_tests():
+    """Stop every running test and cancel every queued one."""
+    pending = [run for run in scheduler.runs.values() if not run.is_finished]
+    result = {"found": bool(pending), "deleted": False, "stopped": [], "cancelled": []}
     try:
-        result = delete_active_test()
+        for run in pending:
+            was_queued = run.status == "queued"
+            if await scheduler.stop_run(run):
+                result["cancelled" if was_queued else "stopped"].append(run.test_id)
+        result["deleted"] = bool(result["stopped"] or result["cancelled"])
     except Exception as e:
-        logger.error(f"Error deleting test: {str(e)}")
+        logger.error(f"Error deleting tests: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     return {"result": result}
 
+@app.delete("/test/{test_id}", name="/test-by-id")
+async def delete_test(test_id: str):
+    """Stop a running test or cancel a queued one."""
+    run = scheduler.get_run(test_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Test not found")
+    
+    result = {"found": True, "deleted": False}
+    try:
+        result["deleted"] = await scheduler.stop_run(run)
+    except Exception as e:
+        logger.error(f"Error deleting test {test_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"result": result, "status": run.status}
+
+async def change_run_load(run: TestRun, change: LoadChange) -> dict[str, Any]:
+    changes = change.model_dump(exclude_none=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="Give users, spawn_rate or arrival_rate")
+    if run.status != "running":
+        raise HTTPException(status_code=409, detail=f"Test {run.test_id} is {run.status}, not running")
+    if run.config.get("capacity_search"):
+        raise HTTPException(status_code=409, detail="The test is a capacity search probe, its load is set by the search")
+    try:
+        applied = await change_load(run, changes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"test_id": run.test_id, **applied, "timeline": run.timeline}
+
+@app.patch("/test", name="/test")
+async def patch_tests(change: LoadChange) -> dict[str, Any]:
+    """Change users, spawn rate or arrival rate of the running test, if exactly one is running."""
+    running = [run for run in scheduler.runs.values() if run.status == "running"]
+    if len(running) != 1:
+        raise HTTPException(status_code=409, detail=f"{len(running)} tests are running, use PATCH /test/{{test_id}}")
+    return await change_run_load(running[0], change)
+
+@app.patch("/test/{test_id}", name="/test-by-id")
+async def patch_test(test_id: str, change: LoadChange) -> dict[str, Any]:
+    """Change users, spawn rate or arrival rate of a running test in place, without restarting it."""
+    run = scheduler.get_run(test_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Test not found")
+    return await change_run_load(run, change)
+
+def submit_probe(test: Dict[str, Any], search_id: str) -> TestRun:
+    """Submit one capacity search probe, tagged with its search."""
+    run = prepare_run(TestConfig(**test))
+    run.config["capacity_search"] = search_id
+    scheduler.submit(run)
+    logger.info(f"Submitted capacity probe {run.test_id} for search {search_id}")
+    return run
+
+@app.post(
+    "/capacity",
+    name="/capacity",
+    summary="Search Capacity",
+    description="Probe increasing load (users or arrival rate) to find the highest load that meets a latency and error rate SLO."
+)
+async def post_capacity(config: capacity.SearchConfig) -> dict[str, Any]:
+    """Start a capacity search, its probes queue like any other test."""
+    if config.test.get("load_profile") or config.test.get("replay"):
+        raise HTTPException(status_code=400, detail="Capacity probes cannot use a load_profile or replay")
+    try:
+        # Validate the probe config up front rather than in the first probe
+        TestConfig(**{"run_time": "1s", config.dimension: config.start, **config.test})
+        prepare_run(TestConfig(**capacity.probe_test(config, config.start)))
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    search = capacity.start(config, submit_probe)
+    return {"search_id": search.search_id, "status": search.status}
+
+@app.get("/capacity", name="/capacity")
+async def get_capacity_searches() -> dict[str, Any]:
+    """List capacity searches with their results so far."""
+    return {"searches": [search.to_dict() for search in capacity.searches.values()]}
+
+@app.get("/capacity/{search_id}", name="/capacity-by-id")
+async def get_capacity_search(search_id: str) -> dict[str, Any]:
+    """Get a capacity search's probes and result."""
+    search = capacity.searches.get(search_id)
+    if search is None:
+        raise HTTPException(status_code=404, detail="Capacity search not found")
+    return search.to_dict()
+
+@app.delete("/capacity/{search_id}", name="/capacity-by-id")
+async def delete_capacity_search(search_id: str) -> dict[str, Any]:
+    """Cancel a capacity search and stop its current probe, the probes so far are kept."""
+    search = capacity.searches.get(search_id)
+    if search is None:
+        raise HTTPException(status_code=404, detail="Capacity search not found")
+    return {"result": {"found": True, "deleted": await capacity.cancel(search)}, "status": search.status}
+
+# Synchronous handlers (results index queries, run in the thread pool)
+
+def result_response(result: dict[str, Any]) -> dict[str, Any]:
+    """A results index record in the shape of the results endpoints."""
+    file_path, html_path = result.pop("stats_file"), result.pop("html_file")
+    return {
+        **result,
+        "file_path": file_path,
+        "html_available": html_path is not None,
+        "html_path": html_path,
+        "artifacts_url": f"/results/{result['test_id']}/artifacts",
+    }
+
 @app.get("/results", name="/results")
 def get_results() -> dict[str, Any]:
     """Get the latest test results (CSV summary)."""
     try:
-        # Find the most recent stats CSV file (with underscore prefix)
-        csv_files = list(RESULTS_DIR.glob("*_stats.csv"))
-        
-        if not csv_files:
+        test_id = results_index.latest_test_id()
+        result = results_index.get_result(test_id) if test_id else None
+        if result is None:
             raise HTTPException(status_code=404, detail="No test results found")
         
-        # Get the most recent file
-        latest_csv = max(csv_files, key=lambda p: p.stat().st_mtime)
-        test_id = latest_csv.stem.replace("_stats", "")
-        
-        # Read the CSV file
-        stats_content = latest_csv.read_text()
-        lines = stats_content.strip().split('\n')
-        
-        # Parse CSV into list of dicts
-        if len(lines) < 2:
-            raise HTTPException(status_code=400, detail="Invalid results file")
-        
-        headers = lines[0].split(',')
-        results = []
-        
-        for line in lines[1:]:
-            values = line.split(',')
-            if len(values) == len(headers):
-                result_dict = dict(zip(headers, values))
-                results.append(result_dict)
-        
-        return {
-            "test_id": test_id,
-            "file_path": str(latest_csv),
-            "stats": results
-        }
+        return result_response(result)
         
     except HTTPException:
         raise
@@ -417,46 +413,206 @@ def get_results() -> dict[str, Any]:
         logger.error(f"Error reading results: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/results/runs", name="/results-runs")
+def list_results(
+    status: str | None = None,
+    class_name: str | None = None,
+    host: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    sort: str = "finished_at",
+    descending: bool = True,
+    limit: int = 50,
+    offset: int = 0,
+    tag: str | None = None,
+    valid: bool | None = None,
+) -> dict[str, Any]:
+    """List indexed test runs with their summary metrics, filtered and paginated."""
+    try:
+        total, runs = results_index.list_results(
+            status=status, class_name=class_name, host=host, since=since, until=until,
+            sort=sort, descending=descending, limit=limit, offset=offset, tag=tag, valid=valid
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error listing results: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "runs": runs
+    }
+
+@app.get("/results/compare", name="/results-compare")
+def compare_results(
+    candidate: List[str] = Query(...),
+    baseline: List[str] = Query([]),
+    baseline_tag: str | None = None,
+    latency_threshold: float = 0.1,
+    throughput_threshold: float = 0.05,
+    error_threshold: float = 0.01,
+    alpha: float = 0.05,
+    percentiles: str = "50,95,99",
+    min_requests: int = 100,
+    resamples: int = run_comparison.BOOTSTRAP_RESAMPLES,
+) -> dict[str, Any]:
+    """Compare candidate runs with baseline runs (IDs or a tag) per endpoint, with a pass/fail verdict."""
+    if bool(baseline) == bool(baseline_tag):
+        raise HTTPException(status_code=400, detail="Give either baseline test IDs or a baseline_tag")
+    baseline_ids = baseline or results_index.tagged_ids(baseline_tag)  # type: ignore[arg-type]
+    if not baseline_ids:
+        raise HTTPException(status_code=404, detail=f"No runs tagged {baseline_tag}")
+    if set(baseline_ids) & set(candidate):
+        raise HTTPException(status_code=400, detail="A run cannot be both baseline and candidate")
+    groups = []
+    for test_ids in (baseline_ids, candidate):
+        results = [results_index.get_result(test_id) for test_id in test_ids]
+        missing = [test_id for test_id, result in zip(test_ids, results) if result is None or not result["stats"]]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"No results found for test(s) {', '.join(missing)}")
+        groups.append(results)
+    try:
+        comparison = run_comparison.compare(
+            groups[0], groups[1],
+            latency_threshold=latency_threshold, throughput_threshold=throughput_threshold,
+            error_threshold=error_threshold, alpha=alpha,
+            percentiles=tuple(float(p) for p in percentiles.split(",")),
+            min_requests=min_requests, resamples=resamples
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Latencies of runs that saturated the load generator include its own delay, they settle nothing
+    invalid = [result["test_id"] for results in groups for result in results if result.get("valid") is False]
+    if invalid:
+        comparison["verdict"] = "inconclusive"
+    return {"baseline_tag": baseline_tag, **comparison, "invalid_runs": invalid}
+
+@app.put("/results/{test_id}/tags/{tag}", name="/results-tag")
+def put_result_tag(test_id: str, tag: str) -> dict[str, Any]:
+    """Tag a run, e.g. as a comparison baseline."""
+    if not results_index.tag_run(test_id, tag):
+        raise HTTPException(status_code=404, detail=f"No results found for test {test_id}")
+    return {"test_id": test_id, "tag": tag, "tagged": True}
+
+@app.delete("/results/{test_id}/tags/{tag}", name="/results-tag")
+def delete_result_tag(test_id: str, tag: str) -> dict[str, Any]:
+    """Remove a run's tag."""
+    return {"test_id": test_id, "tag": tag, "deleted": results_index.untag_run(test_id, tag)}
+
+@app.get("/results/{test_id}/stages", name="/results-stages")
+def get_result_stages(test_id: str) -> dict[str, Any]:
+    """Stage boundaries and per-stage statistics of a test run with a load profile."""
+    stages_file = RESULTS_DIR / f"{test_id}_stages.json"
+    if not stages_file.exists():
+        raise HTTPException(status_code=404, detail=f"No load profile stages for test {test_id}")
+    return {"test_id": test_id, **json.loads(stages_file.read_text())}
+
+@app.get("/results/{test_id}/artifacts", name="/results-artifacts")
+def list_result_artifacts(test_id: str) -> dict[str, Any]:
+    """Result files of a test run, with the encodings they are stored in compressed."""
+    listed = artifacts.list_artifacts(test_id)
+    if not listed:
+        raise HTTPException(status_code=404, detail=f"No artifacts for test {test_id}")
+    return {"test_id": test_id, "artifacts": listed}
+
+@app.api_route("/results/{test_id}/artifacts/{name:path}", methods=["GET", "HEAD"], name="/results-artifact")
+def get_result_artifact(request: Request, test_id: str, name: str) -> Response:
+    """Download one result file, with ETag, Range and zstd/gzip content encoding."""
+    try:
+        return artifacts.file_response(request, test_id, name)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Test {test_id} has no artifact {name}")
+
+@app.get("/results/{test_id}/bundle", name="/results-bundle")
+def get_result_bundle(test_id: str, compression: Literal["none", "zstd", "gzip"] = "none") -> StreamingResponse:
+    """Download all result files of a test run as one tar, streamed as it is built."""
+    try:
+        return artifacts.bundle_response(test_id, compression)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"No artifacts for test {test_id}")
+
+def load_samples(test_id: str) -> "sample_analysis.Samples":
+    try:
+        return sample_analysis.Samples(test_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"No sample log for test {test_id}")
+
+@app.get("/results/{test_id}/samples/summary", name="/results-samples-summary")
+def get_samples_summary(
+    test_id: str,
+    group_by: str = "endpoint",
+    name: str | None = None,
+    method: str | None = None,
+    status: int | None = None,
+    worker: str | None = None,
+    failed: bool | None = None,
+    start_s: float | None = None,
+    end_s: float | None = None,
+) -> dict[str, Any]:
+    """Latency percentiles, counts and failures from a test's raw samples, per endpoint, worker or status."""
+    samples = load_samples(test_id)
+    try:
+        mask = samples.select(name, method, status, worker, failed, start_s, end_s)
+        return {"test_id": test_id, "workers": samples.workers, **sample_analysis.summary(samples, mask, group_by)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/results/{test_id}/samples/histogram", name="/results-samples-histogram")
+def get_samples_histogram(
+    test_id: str,
+    bins: int = 50,
+    log_scale: bool = True,
+    name: str | None = None,
+    method: str | None = None,
+    status: int | None = None,
+    worker: str | None = None,
+    failed: bool | None = None,
+    start_s: float | None = None,
+    end_s: float | None = None,
+) -> dict[str, Any]:
+    """Latency histogram of a test's raw samples."""
+    samples = load_samples(test_id)
+    try:
+        mask = samples.select(name, method, status, worker, failed, start_s, end_s)
+        return {"test_id": test_id, **sample_analysis.histogram(samples, mask, bins, log_scale)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/results/{test_id}/samples/timeseries", name="/results-samples-timeseries")
+def get_samples_timeseries(
+    test_id: str,
+    bucket_s: float = 1.0,
+    name: str | None = None,
+    method: str | None = None,
+    status: int | None = None,
+    worker: str | None = None,
+    failed: bool | None = None,
+    start_s: float | None = None,
+    end_s: float | None = None,
+) -> dict[str, Any]:
+    """Requests, failures and latency percentiles per time bucket of a test's raw samples."""
+    samples = load_samples(test_id)
+    try:
+        mask = samples.select(name, method, status, worker, failed, start_s, end_s)
+        return {"test_id": test_id, **sample_analysis.timeseries(samples, mask, bucket_s)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/results/{test_id}", name="/results-by-id")
 def get_results_by_id(test_id: str) -> dict[str, Any]:
     """Get test results for a specific test ID."""
     try:
-        csv_file = RESULTS_DIR / f"{test_id}_stats.csv"
-        
-        if not csv_file.exists():
+        result = results_index.get_result(test_id)
+        if result is None or result["stats_file"] is None:
             raise HTTPException(status_code=404, detail=f"No results found for test {test_id}")
         
-        # Read the CSV file
-        stats_content = csv_file.read_text()
-        lines = stats_content.strip().split('\n')
-        
-        # Parse CSV into list of dicts
-        if len(lines) < 2:
-            raise HTTPException(status_code=400, detail="Invalid results file")
-        
-        headers = lines[0].split(',')
-        results = []
-        
-        for line in lines[1:]:
-            values = line.split(',')
-            if len(values) == len(headers):
-                result_dict = dict(zip(headers, values))
-                results.append(result_dict)
-        
-        # Check if HTML report exists
-        html_file = RESULTS_DIR / f"{test_id}.html"
-        html_available = html_file.exists()
-        
-        return {
-            "test_id": test_id,
-            "file_path": str(csv_file),
-            "html_available": html_available,
-            "html_path": str(html_file) if html_available else None,
-            "stats": results
-        }
+        return result_response(result)
         
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error reading results for {test_id}: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,105 @@
+"""
+Prometheus metrics of the load generator.
+
+GET /metrics exposes the client-side view of every running test, built at
+scrape time from the latest live stats snapshot of the test's master (or
+single) Locust process. The master has already aggregated its workers, so a
+distributed test is one set of series labelled with its test_id:
+
+- locust_requests_total and locust_request_failures_total per endpoint;
+- locust_request_duration_ms, a latency histogram per endpoint with the same
+  buckets as the SUT's http_request_duration_ms, from the high-resolution
+  histograms merged across workers;
+- locust_requests_per_second and locust_response_time_ms (p50/p95/p99) over
+  Locust's 10 s window;
+- locust_users and locust_workers;
+- locust_process_cpu_seconds_total per Locust process, next to the
+  generator's own process_* metrics and its scheduler capacity;
+- locust_scheduling_lag_ms per Locust process and locust_generator_saturated,
+  1 while a process of the test is saturated (see load/scripts/saturation.py).
+
+Series of a test disappear once it finishes.
+"""
+
+from typing import Any, Dict, Iterator, List
+
+import psutil
+from prometheus_client import CollectorRegistry, ProcessCollector, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily, Metric
+
+import scheduler
+
+ENDPOINT_LABELS = ["test_id", "method", "name"]
+QUANTILES = {"p50": "0.5", "p95": "0.95", "p99": "0.99"}
+
+class LoadCollector:
+    """Collects the running tests' live stats and Locust process CPU time."""
+
+    def collect(self) -> Iterator[Metric]:
+        requests = CounterMetricFamily("locust_requests", "Requests sent", labels=ENDPOINT_LABELS)
+        failures = CounterMetricFamily("locust_request_failures", "Failed requests", labels=ENDPOINT_LABELS)
+        rps = GaugeMetricFamily("locust_requests_per_second", "Requests per second over the last 10 s", labels=ENDPOINT_LABELS)
+        percentiles = GaugeMetricFamily("locust_response_time_ms", "Client-side response time percentiles over the last 10 s",
+                                        labels=[*ENDPOINT_LABELS, "quantile"])
+        latency = HistogramMetricFamily("locust_request_duration_ms", "Client-side request duration in milliseconds",
+                                        labels=ENDPOINT_LABELS)
+        users = GaugeMetricFamily("locust_users", "Running users", labels=["test_id"])
+        workers = GaugeMetricFamily("locust_workers", "Load-generating Locust processes (connected workers, 1 if single)",
+                                    labels=["test_id"])
+        cpu = CounterMetricFamily("locust_process_cpu_seconds", "CPU time of the test's Locust processes",
+                                  labels=["test_id", "process"])
+        lag = GaugeMetricFamily("locust_scheduling_lag_ms", "Mean greenlet scheduling lag of the test's Locust processes",
+                                labels=["test_id", "process"])
+        saturated = GaugeMetricFamily("locust_generator_saturated", "1 while a Locust process of the test is saturated",
+                                      labels=["test_id"])
+
+        for run in list(scheduler.runs.values()):
+            if run.is_finished:
+                continue
+            for process, pid in run.pids.items():
+                try:
+                    times = psutil.Process(pid).cpu_times()
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+                cpu.add_metric([run.test_id, process], times.user + times.system)
+            snapshot = run.latest_stats
+            if not snapshot:
+                continue
+            users.add_metric([run.test_id], snapshot.get("users", 0))
+            workers.add_metric([run.test_id], snapshot.get("workers", 1))
+            generator = snapshot.get("generator") or {}
+            if generator:
+                saturated.add_metric([run.test_id], int(generator["saturated"]))
+            for process in generator.get("processes", []):
+                if process.get("lag_ms") is not None:
+                    lag.add_metric([run.test_id, process["process"]], process["lag_ms"])
+            bounds: List[float] = snapshot.get("latency_bounds_ms", [])
+            for endpoint in snapshot.get("endpoints", []):
+                labels = [run.test_id, endpoint["method"], endpoint["name"]]
+                requests.add_metric(labels, endpoint["requests"])
+                failures.add_metric(labels, endpoint["failures"])
+                rps.add_metric(labels, endpoint["rps"])
+                for key, quantile in QUANTILES.items():
+                    if endpoint.get(key) is not None:
+                        percentiles.add_metric([*labels, quantile], endpoint[key])
+                if "latency_buckets" in endpoint and len(endpoint["latency_buckets"]) == len(bounds):
+                    latency.add_metric(labels, buckets(bounds, endpoint), endpoint["latency_sum_ms"])
+
+        yield from (requests, failures, rps, percentiles, latency, users, workers, cpu, lag, saturated)
+
+        capacity = scheduler.capacity()
+        yield GaugeMetricFamily("load_generator_cpus", "CPUs for load-generating processes", value=capacity["cpus_total"])
+        yield GaugeMetricFamily("load_generator_cpus_free", "CPUs not allocated to a test", value=capacity["cpus_free"])
+        yield GaugeMetricFamily("load_generator_tests_running", "Running tests", value=capacity["running"])
+        yield GaugeMetricFamily("load_generator_tests_queued", "Queued tests", value=capacity["queued"])
+
+def buckets(bounds: List[float], endpoint: Dict[str, Any]) -> List[List[Any]]:
+    return [[f"{bound:g}", count] for bound, count in zip(bounds, endpoint["latency_buckets"])] + \
+        [["+Inf", endpoint["latency_count"]]]
+
+registry = CollectorRegistry(auto_describe=False)
+registry.register(LoadCollector())
+ProcessCollector(registry=registry)
+
+def render() -> bytes:
+    return generate_latest(registry)
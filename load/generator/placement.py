@@ -0,0 +1,112 @@
+"""
+CPU placement and scheduling priority of Locust processes.
+
+The scheduler reserves a disjoint set of CPUs for every run. Each process is
+pinned as soon as it starts, with os.sched_setaffinity: a single process or
+worker-N to the run's Nth CPU, so no two workers share a core. The master
+only aggregates stats and may use any of the run's CPUs. LOAD_GENERATOR_CPUS
+(e.g. "2-7") limits the CPUs the scheduler hands out, to keep test processes
+off the cores the SUT containers run on.
+
+Per role, a test can also lower or raise the nice value and I/O scheduling
+class of its processes. A single process gets the workers' settings.
+Affinity and priority are per thread on Linux, so they are applied to every
+thread of a process, which matters for pool workers: their threads are
+already running when a test adopts them.
+
+Where each process ended up, read back from the kernel, is recorded in the
+run's "placement" with any setting that could not be applied (a negative nice
+value needs CAP_SYS_NICE, for example).
+"""
+
+import os
+import logging
+from typing import Any, Dict, List, Literal
+
+import psutil
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+
+IO_CLASSES = {
+    "realtime": psutil.IOPRIO_CLASS_RT,
+    "best-effort": psutil.IOPRIO_CLASS_BE,
+    "idle": psutil.IOPRIO_CLASS_IDLE,
+}
+IO_CLASS_NAMES = {value: name for name, value in IO_CLASSES.items()}
+
+class RolePriority(BaseModel):
+    nice: int = Field(0, ge=-20, le=19)  # Negative values need CAP_SYS_NICE
+    io_class: Literal["realtime", "best-effort", "idle"] | None = None
+    io_priority: int | None = Field(None, ge=0, le=7)  # Within realtime and best-effort, 0 is the highest
+
+class Placement(BaseModel):
+    pin_cpus: bool = True  # One reserved CPU per load-generating process
+    master: RolePriority = RolePriority()
+    workers: RolePriority = RolePriority()
+
+def parse_cpu_list(value: str) -> List[int]:
+    """CPUs from a list like "0-3,6", the format of taskset and cpuset."""
+    cpus: set[int] = set()
+    for part in value.split(","):
+        first, _, last = part.strip().partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return sorted(cpus)
+
+def process_cpus(name: str, run_cpus: List[int]) -> List[int]:
+    """The run's CPUs a process may use."""
+    if name == "single":
+        return run_cpus[:1]
+    if name.startswith("worker-"):
+        index = int(name.split("-")[1]) - 1
+        if index < len(run_cpus):
+            return [run_cpus[index]]
+    return list(run_cpus)
+
+def describe(pid: int) -> Dict[str, Any]:
+    process = psutil.Process(pid)
+    io_class, io_priority = process.ionice()
+    return {
+        "pid": pid,
+        "cpus": sorted(os.sched_getaffinity(pid)),
+        "nice": process.nice(),
+        "io_class": IO_CLASS_NAMES.get(io_class, "none"),
+        "io_priority": io_priority,
+    }
+
+def apply(pid: int, name: str, run_cpus: List[int], config: Dict[str, Any]) -> Dict[str, Any]:
+    """Pin and prioritize every thread of a run's process as its config says, returns where it ended up."""
+    settings = Placement(**(config.get("placement") or {}))
+    priority = settings.master if name == "master" else settings.workers
+    cpus = process_cpus(name, run_cpus) if settings.pin_cpus and run_cpus else None
+    errors: Dict[str, str] = {}
+    try:
+        threads = [thread.id for thread in psutil.Process(pid).threads()]
+    except psutil.Error as e:
+        return {"pid": pid, "errors": {"process": str(e)}}
+    for tid in threads:
+        if cpus:
+            try:
+                os.sched_setaffinity(tid, cpus)
+            except OSError as e:
+                errors["cpus"] = str(e)
+        if priority.nice:
+            try:
+                os.setpriority(os.PRIO_PROCESS, tid, priority.nice)
+            except OSError as e:
+                errors["nice"] = str(e)
+        if priority.io_class:
+            try:
+                value = None if priority.io_class == "idle" else priority.io_priority
+                psutil.Process(tid).ionice(IO_CLASSES[priority.io_class], value)
+            except (OSError, psutil.Error) as e:
+                errors["io_class"] = str(e)
+    try:
+        placed = describe(pid)
+    except (OSError, psutil.Error) as e:
+        placed = {"pid": pid}
+        errors["process"] = str(e)
+    if errors:
+        placed["errors"] = errors
+        logger.warning(f"Could not fully place Locust {name.upper()} (PID {pid}): {errors}")
+    return placed
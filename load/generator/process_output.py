@@ -0,0 +1,155 @@
+"""
+Output of the Locust processes.
+
+The stdout (with stderr) of every Locust process is read by one task on the
+generator's event loop, in chunks of up to READ_CHUNK_BYTES rather than line
+by line, so a chatty process costs a few reads per burst and no line is too
+long to read. Lifecycle events go to their handler (lifecycle.py). Other
+lines are kept in a ring buffer per process, the last RING_LINES of each,
+and forwarded to the service log at most LOG_LINES_PER_S per run on average
+(with bursts of up to LOG_BURST). Lines over the limit are only counted, the
+count is logged with the next line that gets through.
+
+GET /test/{test_id}/logs serves the buffers: the last lines of every process
+(or one) merged in arrival order, and with follow, new lines as they arrive
+until the run finishes. Buffers live as long as the run is kept in memory.
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import AsyncIterator, Callable, Deque, Dict, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_BYTES = 64 * 1024
+RING_LINES = 2000        # Lines kept per process
+MAX_LINE_CHARS = 4000    # Longer lines are truncated in the buffer and the log
+LOG_LINES_PER_S = 20.0   # Lines per run forwarded to the service log on average
+LOG_BURST = 200          # Lines per run forwarded at once before the rate applies
+
+Line = Tuple[int, str, str]  # (sequence number in the run, process, text)
+
+class RunOutput:
+    """Ring buffers of one run's processes and the rate limit of its log lines."""
+
+    def __init__(self, test_id: str):
+        self.test_id = test_id
+        self.buffers: Dict[str, Deque[Line]] = {}
+        self.sequence = 0
+        self.followers: Set[asyncio.Event] = set()
+        self.closed = False
+        self.tokens = float(LOG_BURST)
+        self.refilled_at = time.monotonic()
+        self.suppressed = 0
+
+    def append(self, process: str, text: str) -> None:
+        self.sequence += 1
+        text = text[:MAX_LINE_CHARS]
+        buffer = self.buffers.get(process)
+        if buffer is None:
+            buffer = self.buffers[process] = deque(maxlen=RING_LINES)
+        buffer.append((self.sequence, process, text))
+        for follower in self.followers:
+            follower.set()
+        self.log(process, text)
+
+    def log(self, process: str, text: str) -> None:
+        now = time.monotonic()
+        self.tokens = min(float(LOG_BURST), self.tokens + (now - self.refilled_at) * LOG_LINES_PER_S)
+        self.refilled_at = now
+        if self.tokens < 1:
+            self.suppressed += 1
+            return
+        self.tokens -= 1
+        if self.suppressed:
+            logger.info(f"[Locust {self.test_id}] {self.suppressed} line(s) not logged (rate limit), "
+                        f"see /test/{self.test_id}/logs")
+            self.suppressed = 0
+        logger.info(f"[Locust {self.test_id} {process}] {text}")
+
+    def tail(self, lines: int, process: str | None = None) -> List[Line]:
+        """The last lines of a process or of all processes, oldest first."""
+        buffers = [self.buffers.get(process, deque())] if process else list(self.buffers.values())
+        merged = sorted(line for buffer in buffers for line in list(buffer)[-lines:])
+        return merged[-lines:] if lines > 0 else []
+
+    def since(self, sequence: int, process: str | None = None) -> Tuple[List[Line], bool]:
+        """Lines after a sequence number, and whether some were already pushed out of their buffer."""
+        buffers = [self.buffers.get(process, deque())] if process else list(self.buffers.values())
+        new: List[Line] = []
+        lost = False
+        for buffer in buffers:
+            for line in reversed(buffer):
+                if line[0] <= sequence:
+                    break
+                new.append(line)
+            else:
+                lost = lost or (len(buffer) == buffer.maxlen and buffer[0][0] > sequence + 1)
+        return sorted(new), lost
+
+    def close(self) -> None:
+        self.closed = True
+        if self.suppressed:
+            logger.info(f"[Locust {self.test_id}] {self.suppressed} line(s) not logged (rate limit), "
+                        f"see /test/{self.test_id}/logs")
+            self.suppressed = 0
+        for follower in self.followers:
+            follower.set()
+
+outputs: Dict[str, RunOutput] = {}
+
+def output_for(test_id: str) -> RunOutput:
+    output = outputs.get(test_id)
+    if output is None:
+        output = outputs[test_id] = RunOutput(test_id)
+    return output
+
+def close(test_id: str) -> None:
+    """Mark a run's output complete, followers get the rest and stop."""
+    output = outputs.get(test_id)
+    if output is not None:
+        output.close()
+
+def discard(test_id: str) -> None:
+    outputs.pop(test_id, None)
+
+async def read_lines(stream: asyncio.StreamReader, on_line: Callable[[bytes], None]) -> None:
+    """Read a process's output in chunks until it closes, passing on each complete line."""
+    pending = b""
+    while chunk := await stream.read(READ_CHUNK_BYTES):
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            on_line(line + b"\n")
+    if pending:
+        on_line(pending)
+
+def format_line(line: Line) -> str:
+    return f"{line[1]} | {line[2]}\n"
+
+async def follow(output: RunOutput, lines: int, process: str | None = None) -> AsyncIterator[str]:
+    """The last lines, then new ones as they arrive until the run's output is closed."""
+    follower = asyncio.Event()
+    output.followers.add(follower)
+    try:
+        recent = output.tail(lines, process)
+        for line in recent:
+            yield format_line(line)
+        sequence = recent[-1][0] if recent else output.sequence
+        while True:
+            if not output.closed:
+                await follower.wait()
+            follower.clear()
+            new, lost = output.since(sequence, process)
+            if lost:
+                yield "... | (older lines were dropped from the buffer before they could be sent)\n"
+            for line in new:
+                yield format_line(line)
+            if new:
+                sequence = new[-1][0]
+            if output.closed:
+                break
+    finally:
+        output.followers.discard(follower)
@@ -0,0 +1,170 @@
+"""
+Resource usage of the Locust processes on this host.
+
+A background task samples the Locust processes every SAMPLE_INTERVAL_S and
+keeps the result as a table, which GET /processes serves without touching
+/proc. Processes are found incrementally: only PIDs not seen before have
+their command line read. PIDs that are not Locust are remembered until they
+exit, and PIDs of the scheduler's runs are always sampled, even if they were
+first seen before they exec'd Locust.
+
+Every Locust process keeps its psutil.Process between samples, so
+cpu_percent is the CPU used since the previous sample, in percent of one core
+(None in a process's first sample). A sample also reads RSS, threads and open
+TCP/UDP connections, with one oneshot() per process.
+
+For every running test, the minimum and maximum of these values are kept per
+process (single, master, worker-N) until the test is no longer running.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL_S = float(os.getenv("PROCESS_SAMPLE_INTERVAL_S") or "2")
+MAX_COMMAND_CHARS = 200
+RANGE_VALUES = ("cpu_percent", "memory_rss_mb", "num_threads", "connections")
+
+# PIDs of the running tests' processes: {pid: (test_id, process name)}
+Tracked = Dict[int, Tuple[str, str]]
+
+class SampledProcess:
+    """A Locust process, its psutil.Process keeps the CPU times of the previous sample."""
+
+    def __init__(self, process: psutil.Process, command: str):
+        self.process = process
+        self.command = command
+        self.name = process.name()
+        self.create_time = process.create_time()
+        self.sampled = False
+        process.cpu_percent()  # The first call only sets the reference point
+
+    def read(self) -> Dict[str, Any]:
+        """Usage since the previous sample, raises psutil.NoSuchProcess if the process exited."""
+        process = self.process
+        with process.oneshot():
+            status = process.status()
+            row: Dict[str, Any] = {
+                "pid": process.pid,
+                "name": self.name,
+                "status": status,
+                "runtime_seconds": int(time.time() - self.create_time),
+                "command": self.command,
+                "is_zombie": status == psutil.STATUS_ZOMBIE,
+            }
+            if row["is_zombie"]:
+                row.update(cpu_percent=None, memory_rss_mb=0.0, memory_percent=0.0, num_threads=0, connections=0)
+                return row
+            cpu_percent = process.cpu_percent()
+            memory = process.memory_info()
+            row.update(
+                cpu_percent=round(cpu_percent, 2) if self.sampled else None,
+                memory_rss_mb=round(memory.rss / 2**20, 1),
+                memory_percent=round(process.memory_percent(memtype="rss"), 2),
+                num_threads=process.num_threads(),
+            )
+        try:
+            row["connections"] = len(process.net_connections(kind="inet"))
+        except psutil.AccessDenied:
+            row["connections"] = None
+        self.sampled = True
+        return row
+
+# Locust processes by PID, and PIDs known not to be Locust, only touched by sample()
+processes: Dict[int, SampledProcess] = {}
+ignored: Set[int] = set()
+
+# Latest sample, served by GET /processes
+table: List[Dict[str, Any]] = []
+sampled_at: float | None = None
+# Minimum and maximum per running test and process: {test_id: {process: {value: {"min", "max"}}}}
+ranges: Dict[str, Dict[str, Dict[str, Dict[str, float]]]] = {}
+
+task: "asyncio.Task[None] | None" = None
+
+def discover(pid: int, tracked: Set[int]) -> None:
+    try:
+        process = psutil.Process(pid)
+        command = " ".join(process.cmdline())
+        if pid in tracked or "locust" in command.lower():
+            processes[pid] = SampledProcess(process, command[:MAX_COMMAND_CHARS])
+        else:
+            ignored.add(pid)
+    except psutil.NoSuchProcess:
+        pass
+    except psutil.AccessDenied:
+        ignored.add(pid)
+
+def sample(tracked: Set[int]) -> List[Dict[str, Any]]:
+    """Find new Locust processes, forget exited ones and read the usage of the rest."""
+    pids = set(psutil.pids())
+    ignored.intersection_update(pids)
+    ignored.difference_update(tracked)  # Seen before exec, or a reused PID
+    for pid in [pid for pid, entry in processes.items() if pid not in pids or not entry.process.is_running()]:
+        del processes[pid]
+    for pid in pids - processes.keys() - ignored:
+        discover(pid, tracked)
+
+    rows: List[Dict[str, Any]] = []
+    for pid, entry in list(processes.items()):
+        try:
+            rows.append(entry.read())
+        except psutil.NoSuchProcess:
+            del processes[pid]
+        except psutil.AccessDenied as e:
+            logger.debug(f"Cannot sample PID {pid}: {e}")
+    return rows
+
+def record_ranges(rows: List[Dict[str, Any]], tracked: Tracked) -> None:
+    running = {test_id for test_id, _ in tracked.values()}
+    for test_id in list(ranges):
+        if test_id not in running:
+            del ranges[test_id]
+    for row in rows:
+        if row["pid"] not in tracked:
+            continue
+        test_id, name = tracked[row["pid"]]
+        process_ranges = ranges.setdefault(test_id, {}).setdefault(name, {})
+        for value in RANGE_VALUES:
+            if row[value] is None:
+                continue
+            current = process_ranges.get(value)
+            if current is None:
+                process_ranges[value] = {"min": row[value], "max": row[value]}
+            else:
+                current["min"] = min(current["min"], row[value])
+                current["max"] = max(current["max"], row[value])
+
+async def refresh(tracked_processes: Callable[[], Tracked]) -> None:
+    global table, sampled_at
+    tracked = tracked_processes()
+    rows = await asyncio.to_thread(sample, set(tracked))
+    record_ranges(rows, tracked)
+    table, sampled_at = rows, time.time()
+
+async def sample_forever(tracked_processes: Callable[[], Tracked]) -> None:
+    while True:
+        await asyncio.sleep(SAMPLE_INTERVAL_S)
+        try:
+            await refresh(tracked_processes)
+        except Exception as e:
+            logger.error(f"Error sampling processes: {str(e)}")
+
+async def start(tracked_processes: Callable[[], Tracked]) -> None:
+    """Take a first sample, then keep sampling in the background."""
+    global task
+    await refresh(tracked_processes)
+    task = asyncio.create_task(sample_forever(tracked_processes))
+
+async def shutdown() -> None:
+    global task
+    if task is not None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        task = None
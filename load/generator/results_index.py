@@ -0,0 +1,357 @@
+"""
+Indexed results store.
+
+Every test is recorded once, when it finishes, in an SQLite database next to
+the state journals: its config, timing, status and the summary metrics of the
+Aggregated row, plus the parsed rows of its stats CSV. Latency percentiles come
+from the test's high-resolution histograms (<test_id>_latency.json, see
+load/scripts/latency_histograms.py) when it has them. Result lookups are
+primary key reads, and listing runs is an indexed query, so neither depends
+on how many results have piled up in RESULTS_DIR.
+
+The index outlives the in-memory runs the scheduler prunes. Results written
+before the index existed are backfilled from RESULTS_DIR at startup.
+
+Runs whose load generator was saturated (see GeneratorLoad in lifecycle.py)
+are recorded with valid = 0: their latencies include the generator's own
+scheduling delay.
+
+Runs can be tagged, e.g. as the baseline that later runs are compared
+against (see run_comparison.py).
+"""
+
+import csv
+import json
+import sqlite3
+import logging
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATE_DIR = Path("/mnt/state")
+INDEX_FILE = STATE_DIR / "results.db"
+RESULTS_DIR = Path("/mnt/results")
+
+MAX_PAGE_SIZE = 500
+SORT_COLUMNS = ("finished_at", "started_at", "users", "rps", "failure_rate", "p95_ms", "p99_ms", "p999_ms")
+
+# Summary metrics taken from the Aggregated row of the stats CSV
+SUMMARY_COLUMNS = {
+    "request_count": "Request Count",
+    "failure_count": "Failure Count",
+    "rps": "Requests/s",
+    "avg_ms": "Average Response Time",
+    "p50_ms": "50%",
+    "p95_ms": "95%",
+    "p99_ms": "99%",
+    "max_ms": "Max Response Time",
+}
+
+# Summary metrics taken from the Aggregated row of the latency histograms, overriding the CSV's
+LATENCY_COLUMNS = {
+    "avg_ms": "mean_ms",
+    "p50_ms": "50",
+    "p95_ms": "95",
+    "p99_ms": "99",
+    "p999_ms": "99.9",
+    "max_ms": "max_ms",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    test_id TEXT PRIMARY KEY,
+    status TEXT,
+    priority INTEGER,
+    class_name TEXT,
+    host TEXT,
+    users INTEGER,
+    workers INTEGER,
+    queued_at TEXT,
+    started_at TEXT,
+    finished_at TEXT,
+    duration_s REAL,
+    exit_code INTEGER,
+    error TEXT,
+    request_count INTEGER,
+    failure_count INTEGER,
+    failure_rate REAL,
+    rps REAL,
+    avg_ms REAL,
+    p50_ms REAL,
+    p95_ms REAL,
+    p99_ms REAL,
+    max_ms REAL,
+    config TEXT,
+    stats_file TEXT,
+    html_file TEXT,
+    p999_ms REAL,
+    latency_file TEXT,
+    valid INTEGER,
+    generator_saturated_s REAL,
+    generator_peak_cpu_percent REAL,
+    generator_peak_lag_ms REAL
+);
+CREATE INDEX IF NOT EXISTS runs_finished_at ON runs (finished_at);
+CREATE INDEX IF NOT EXISTS runs_status ON runs (status, finished_at);
+CREATE TABLE IF NOT EXISTS run_stats (
+    test_id TEXT PRIMARY KEY REFERENCES runs (test_id) ON DELETE CASCADE,
+    stats TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS run_tags (
+    tag TEXT NOT NULL,
+    test_id TEXT NOT NULL,
+    tagged_at TEXT NOT NULL,
+    PRIMARY KEY (tag, test_id)
+);
+CREATE INDEX IF NOT EXISTS run_tags_test_id ON run_tags (test_id);
+"""
+
+# Columns added after the first release of the index, added to existing databases by init()
+ADDED_COLUMNS = {
+    "p999_ms": "REAL", "latency_file": "TEXT", "valid": "INTEGER",
+    "generator_saturated_s": "REAL", "generator_peak_cpu_percent": "REAL", "generator_peak_lag_ms": "REAL",
+}
+
+def connect() -> sqlite3.Connection:
+    """A connection per call, handlers run in a thread pool and sqlite3 connections are per thread."""
+    conn = sqlite3.connect(INDEX_FILE, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+def init() -> None:
+    with closing(connect()) as conn, conn:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(SCHEMA)
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(runs)")}
+        for column, column_type in ADDED_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE runs ADD COLUMN {column} {column_type}")
+
+def read_stats(csv_file: Path) -> List[Dict[str, str]]:
+    """Rows of a Locust stats CSV (quoted names with commas survive)."""
+    with csv_file.open(newline="") as f:
+        return list(csv.DictReader(f))
+
+def to_number(value: str | None) -> float | None:
+    try:
+        return float(value) if value not in (None, "", "N/A") else None
+    except ValueError:
+        return None
+
+def summarize(stats: List[Dict[str, str]]) -> Dict[str, Any]:
+    aggregated = next((row for row in stats if row.get("Name") in ("Aggregated", "Total")), None)
+    if aggregated is None:
+        return {}
+    summary: Dict[str, Any] = {column: to_number(aggregated.get(field)) for column, field in SUMMARY_COLUMNS.items()}
+    requests, failures = summary["request_count"], summary["failure_count"]
+    summary["request_count"] = int(requests) if requests is not None else None
+    summary["failure_count"] = int(failures) if failures is not None else None
+    summary["failure_rate"] = round(failures / requests, 6) if requests and failures is not None else None
+    return summary
+
+def read_latency(latency_file: Path) -> Dict[str, Any]:
+    """Percentiles of the Aggregated latency histogram."""
+    entries = json.loads(latency_file.read_text()).get("entries", [])
+    aggregated = next((entry for entry in entries if entry.get("name") == "Aggregated"), None)
+    if not aggregated or not aggregated.get("count"):
+        return {}
+    percentiles = aggregated.get("percentiles_ms", {})
+    return {
+        column: aggregated.get(field) if field.endswith("_ms") else percentiles.get(field)
+        for column, field in LATENCY_COLUMNS.items()
+    }
+
+def duration_s(run: Dict[str, Any]) -> float | None:
+    if not run.get("timestamp") or not run.get("finished_at"):
+        return None
+    started = datetime.fromisoformat(run["timestamp"].rstrip("Z"))
+    finished = datetime.fromisoformat(run["finished_at"].rstrip("Z"))
+    return round((finished - started).total_seconds(), 3)
+
+def index_run(run: Dict[str, Any]) -> None:
+    """Record a finished run (TestRun.to_dict()) and its stats CSV, replacing an earlier record."""
+    test_id = run["test_id"]
+    config = run.get("config") or {}
+    generator = run.get("generator") or {}
+    stats_file = RESULTS_DIR / f"{test_id}_stats.csv"
+    html_file = RESULTS_DIR / f"{test_id}.html"
+    latency_file = RESULTS_DIR / f"{test_id}_latency.json"
+    stats: List[Dict[str, str]] = []
+    latency: Dict[str, Any] = {}
+    if stats_file.exists():
+        try:
+            stats = read_stats(stats_file)
+        except (OSError, csv.Error, UnicodeDecodeError) as e:
+            logger.error(f"Failed to read results of test {test_id}: {e}")
+    if latency_file.exists():
+        try:
+            latency = read_latency(latency_file)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read latency histograms of test {test_id}: {e}")
+
+    record: Dict[str, Any] = {
+        "test_id": test_id,
+        "status": run.get("status"),
+        "priority": run.get("priority", 0),
+        "class_name": config.get("class_name"),
+        "host": config.get("host"),
+        "users": config.get("users"),
+        "workers": config.get("workers", 1) + generator.get("workers_added", 0) if config else None,
+        "queued_at": run.get("queued_at"),
+        "started_at": run.get("timestamp"),
+        "finished_at": run.get("finished_at"),
+        "duration_s": duration_s(run),
+        "exit_code": run.get("exit_code"),
+        "error": run.get("error"),
+        "valid": generator.get("valid"),
+        "generator_saturated_s": generator.get("saturated_s"),
+        "generator_peak_cpu_percent": generator.get("peak_cpu_percent"),
+        "generator_peak_lag_ms": generator.get("peak_lag_ms"),
+        **{column: None for column in (*SUMMARY_COLUMNS, "failure_rate", "p999_ms")},
+        **summarize(stats),
+        **latency,
+        "config": json.dumps(config),
+        "stats_file": str(stats_file) if stats else None,
+        "html_file": str(html_file) if html_file.exists() else None,
+        "latency_file": str(latency_file) if latency else None,
+    }
+    columns = ", ".join(record)
+    placeholders = ", ".join(f":{column}" for column in record)
+    with closing(connect()) as conn, conn:
+        conn.execute(f"INSERT OR REPLACE INTO runs ({columns}) VALUES ({placeholders})", record)
+        if stats:
+            conn.execute("INSERT OR REPLACE INTO run_stats (test_id, stats) VALUES (?, ?)", (test_id, json.dumps(stats)))
+    logger.info(f"Indexed results of test {test_id} ({record['status']}, {len(stats)} stats rows)")
+
+def indexed_ids() -> set[str]:
+    with closing(connect()) as conn:
+        return {row["test_id"] for row in conn.execute("SELECT test_id FROM runs")}
+
+def backfill(runs: Iterable[Dict[str, Any]]) -> int:
+    """
+    Index finished runs and result files that are not indexed yet.
+
+    Runs known to the scheduler are indexed with their metadata. Stats files
+    without a run (pruned or from before the index existed) are indexed from
+    the CSV alone, with the file's modification time as finish time.
+    """
+    init()
+    known = indexed_ids()
+    count = 0
+    for run in runs:
+        if run["test_id"] not in known:
+            index_run(run)
+            known.add(run["test_id"])
+            count += 1
+    for stats_file in RESULTS_DIR.glob("*_stats.csv"):
+        test_id = stats_file.name[:-len("_stats.csv")]
+        if test_id in known:
+            continue
+        finished_at = datetime.utcfromtimestamp(stats_file.stat().st_mtime).isoformat() + "Z"
+        index_run({"test_id": test_id, "status": None, "finished_at": finished_at})
+        known.add(test_id)
+        count += 1
+    if count:
+        logger.info(f"Backfilled the results index with {count} test(s)")
+    return count
+
+def to_result(row: sqlite3.Row) -> Dict[str, Any]:
+    result = dict(row)
+    result["config"] = json.loads(result["config"] or "{}")
+    result["valid"] = bool(result["valid"]) if result.get("valid") is not None else None
+    return result
+
+def get_result(test_id: str) -> Dict[str, Any] | None:
+    """A run's record with its stats rows."""
+    with closing(connect()) as conn:
+        row = conn.execute("SELECT * FROM runs WHERE test_id = ?", (test_id,)).fetchone()
+        if row is None:
+            return None
+        stats = conn.execute("SELECT stats FROM run_stats WHERE test_id = ?", (test_id,)).fetchone()
+        tags = [tag["tag"] for tag in conn.execute("SELECT tag FROM run_tags WHERE test_id = ? ORDER BY tag", (test_id,))]
+    result = to_result(row)
+    result["tags"] = tags
+    result["stats"] = json.loads(stats["stats"]) if stats else []
+    return result
+
+def tag_run(test_id: str, tag: str) -> bool:
+    """Tag an indexed run, e.g. as a comparison baseline. False if the run is not indexed."""
+    with closing(connect()) as conn, conn:
+        if conn.execute("SELECT 1 FROM runs WHERE test_id = ?", (test_id,)).fetchone() is None:
+            return False
+        conn.execute(
+            "INSERT OR IGNORE INTO run_tags (tag, test_id, tagged_at) VALUES (?, ?, ?)",
+            (tag, test_id, datetime.utcnow().isoformat() + "Z")
+        )
+    return True
+
+def untag_run(test_id: str, tag: str) -> bool:
+    with closing(connect()) as conn, conn:
+        return conn.execute("DELETE FROM run_tags WHERE tag = ? AND test_id = ?", (tag, test_id)).rowcount > 0
+
+def tagged_ids(tag: str) -> List[str]:
+    """Runs with a tag, most recently finished first."""
+    with closing(connect()) as conn:
+        rows = conn.execute(
+            "SELECT runs.test_id FROM run_tags JOIN runs USING (test_id) WHERE tag = ? ORDER BY finished_at DESC",
+            (tag,)
+        ).fetchall()
+    return [row["test_id"] for row in rows]
+
+def latest_test_id() -> str | None:
+    """The most recently finished run that has results."""
+    with closing(connect()) as conn:
+        row = conn.execute(
+            "SELECT test_id FROM runs WHERE stats_file IS NOT NULL ORDER BY finished_at DESC LIMIT 1"
+        ).fetchone()
+    return row["test_id"] if row else None
+
+def list_results(
+    status: str | None = None,
+    class_name: str | None = None,
+    host: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    sort: str = "finished_at",
+    descending: bool = True,
+    limit: int = 50,
+    offset: int = 0,
+    tag: str | None = None,
+    valid: bool | None = None,
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """Total matching runs and one page of their records (without stats rows)."""
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Cannot sort by {sort}, use one of {', '.join(SORT_COLUMNS)}")
+    if not 1 <= limit <= MAX_PAGE_SIZE or offset < 0:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE} and offset at least 0")
+
+    conditions: List[str] = []
+    params: List[Any] = []
+    for column, value in (("status", status), ("class_name", class_name), ("host", host)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    if since is not None:
+        conditions.append("finished_at >= ?")
+        params.append(since)
+    if until is not None:
+        conditions.append("finished_at < ?")
+        params.append(until)
+    if valid is not None:
+        # Runs indexed before saturation was measured count as valid
+        conditions.append("COALESCE(valid, 1) = ?")
+        params.append(int(valid))
+    if tag is not None:
+        conditions.append("test_id IN (SELECT test_id FROM run_tags WHERE tag = ?)")
+        params.append(tag)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    order = f"ORDER BY {sort} {'DESC' if descending else 'ASC'}, test_id"
+
+    with closing(connect()) as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM runs {where}", params).fetchone()[0]
+        rows = conn.execute(f"SELECT * FROM runs {where} {order} LIMIT ? OFFSET ?", [*params, limit, offset]).fetchall()
+    return total, [to_result(row) for row in rows]
@@ -0,0 +1,322 @@
+"""
+Statistical comparison of test runs.
+
+Compares a candidate group of runs with a baseline group (test IDs or runs
+tagged in the results index). Each group is pooled: its stats rows are
+added, its latency histograms (<test_id>_latency.json) are merged, and its
+per-interval throughput is taken from <test_id>_stats_history.csv while all
+users were running.
+
+For every endpoint and the Aggregated row:
+- latency percentiles are compared with a bootstrap confidence interval of
+  their difference, resampled from the histograms, and the distributions as
+  a whole with a Mann-Whitney U test on the histogram buckets;
+- error rates with a two-proportion z-test;
+- throughput with a Mann-Whitney test of the per-interval throughput (Aggregated)
+  or a Poisson rate test (endpoints).
+
+A change is a regression only if it is both larger than its threshold and
+statistically significant, so that noise alone does not fail a comparison
+and irrelevant but significant shifts of long runs do not either. The
+verdict fails if any regression is found, and is inconclusive if no
+endpoint had enough requests to be judged. Resampling is seeded, so the same
+runs always give the same verdict.
+"""
+
+import csv
+import json
+import math
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+RESULTS_DIR = Path("/mnt/results")
+
+PERCENTILES = (50.0, 95.0, 99.0)
+BOOTSTRAP_RESAMPLES = 1000
+BOOTSTRAP_CHUNK = 200   # Resamples drawn at once, bounds memory to chunk x buckets
+MIN_INTERVALS = 3       # Per-interval throughput samples needed per group for the Mann-Whitney test
+
+Key = Tuple[str, str]   # (method, name), the Aggregated row has method ""
+
+def bucket_values(indexes: np.ndarray, precision: int) -> np.ndarray:
+    """Highest value (µs) of each bucket of a latency histogram, as LatencyHistogram.value_range."""
+    sub_bucket_bits = math.ceil(math.log2(2 * 10 ** precision))
+    sub_bucket_count = 1 << sub_bucket_bits
+    sub_bucket_half = sub_bucket_count // 2
+    offset = np.maximum(indexes - sub_bucket_count, 0)
+    shift = offset // sub_bucket_half + 1
+    lowest = (offset % sub_bucket_half + sub_bucket_half) << shift
+    return np.where(indexes < sub_bucket_count, indexes, lowest + (1 << shift) - 1)
+
+class Histogram:
+    """Latency distribution as sorted bucket values (ms) and counts."""
+
+    def __init__(self, values: np.ndarray, counts: np.ndarray, max_ms: float):
+        self.values = values
+        self.counts = counts
+        self.count = int(counts.sum())
+        self.max_ms = max_ms
+
+    @classmethod
+    def decode(cls, data: Dict[str, Any]) -> "Histogram":
+        buckets = np.asarray(data["buckets"], dtype=np.int64)
+        indexes = np.cumsum(buckets[::2])
+        values = bucket_values(indexes, data["precision"]) / 1000
+        return cls(values, buckets[1::2], (data.get("max") or 0) / 1000)
+
+    def merge(self, other: "Histogram") -> "Histogram":
+        """Pooled distribution. Buckets of different precisions are kept side by side."""
+        values, inverse = np.unique(np.concatenate([self.values, other.values]), return_inverse=True)
+        counts = np.zeros(len(values), dtype=np.int64)
+        np.add.at(counts, inverse, np.concatenate([self.counts, other.counts]))
+        return Histogram(values, counts, max(self.max_ms, other.max_ms))
+
+    def percentile(self, percentile: float) -> float:
+        rank = max(1, math.ceil(percentile / 100 * self.count))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(float(self.values[index]), self.max_ms)
+
+    def bootstrap(self, percentiles: Tuple[float, ...], rng: np.random.Generator, resamples: int) -> np.ndarray:
+        """Percentiles of resampled histograms, one row per percentile."""
+        probabilities = self.counts / self.count
+        results = np.empty((len(percentiles), resamples))
+        for start in range(0, resamples, BOOTSTRAP_CHUNK):
+            size = min(BOOTSTRAP_CHUNK, resamples - start)
+            cumulative = np.cumsum(rng.multinomial(self.count, probabilities, size=size), axis=1)
+            for row, percentile in enumerate(percentiles):
+                rank = max(1, math.ceil(percentile / 100 * self.count))
+                results[row, start:start + size] = self.values[(cumulative >= rank).argmax(axis=1)]
+        return np.minimum(results, self.max_ms)
+
+def p_value(z: float) -> float:
+    """Two-sided p-value of a standard normal statistic."""
+    return math.erfc(abs(z) / math.sqrt(2))
+
+def mann_whitney(
+    baseline_values: np.ndarray, baseline_counts: np.ndarray, candidate_values: np.ndarray, candidate_counts: np.ndarray
+) -> Tuple[float, float]:
+    """
+    Two-sided p-value of a Mann-Whitney U test on counted values (normal
+    approximation with tie correction), and the probability that a candidate
+    value is above a baseline value, ties counted half.
+    """
+    values, inverse = np.unique(np.concatenate([baseline_values, candidate_values]), return_inverse=True)
+    baseline = np.zeros(len(values))
+    candidate = np.zeros(len(values))
+    np.add.at(baseline, inverse[:len(baseline_values)], baseline_counts)
+    np.add.at(candidate, inverse[len(baseline_values):], candidate_counts)
+    n1, n2 = baseline.sum(), candidate.sum()
+    total = n1 + n2
+    u = float((candidate * (np.cumsum(baseline) - baseline + 0.5 * baseline)).sum())
+    ties = baseline + candidate
+    variance = n1 * n2 / 12 * ((total + 1) - float((ties ** 3 - ties).sum()) / (total * (total - 1)))
+    z = (u - n1 * n2 / 2) / math.sqrt(variance) if variance > 0 else 0.0
+    return p_value(z), u / (n1 * n2)
+
+def proportion_test(failures1: int, requests1: int, failures2: int, requests2: int) -> float:
+    """Two-sided p-value of a two-proportion z-test."""
+    pooled = (failures1 + failures2) / (requests1 + requests2)
+    error = math.sqrt(pooled * (1 - pooled) * (1 / requests1 + 1 / requests2))
+    return p_value((failures2 / requests2 - failures1 / requests1) / error) if error else 1.0
+
+def rate_test(count1: int, seconds1: float, count2: int, seconds2: float) -> float:
+    """Two-sided p-value of the difference of two Poisson rates."""
+    error = math.sqrt(count1 / seconds1 ** 2 + count2 / seconds2 ** 2)
+    return p_value((count2 / seconds2 - count1 / seconds1) / error) if error else 1.0
+
+def steady_rates(history_file: Path) -> np.ndarray:
+    """Requests/s of each stats history interval while the run had its most users."""
+    if not history_file.exists():
+        return np.empty(0)
+    with history_file.open(newline="") as f:
+        rows = [row for row in csv.DictReader(f) if row.get("Name") == "Aggregated"]
+    if len(rows) < 2:
+        return np.empty(0)
+    times = np.array([float(row["Timestamp"]) for row in rows])
+    users = np.array([int(row["User Count"] or 0) for row in rows])
+    requests = np.array([int(row["Total Request Count"] or 0) for row in rows])
+    elapsed, added = np.diff(times), np.diff(requests)
+    # An interval counts once it starts at full load, the last one may be cut short by the stop
+    steady = (users[:-1] == users.max()) & (users[1:] == users.max()) & (elapsed > 0)
+    steady[-1] = False
+    return added[steady] / elapsed[steady]
+
+class Group:
+    """Pooled statistics of a group of runs."""
+
+    def __init__(self, results: List[Dict[str, Any]]):
+        self.test_ids = [result["test_id"] for result in results]
+        self.requests: Dict[Key, int] = {}
+        self.failures: Dict[Key, int] = {}
+        self.seconds: Dict[Key, float] = {}
+        self.histograms: Dict[Key, Histogram] = {}
+        rates = []
+        for result in results:
+            for row in result.get("stats", []):
+                key = ("", "Aggregated") if row.get("Name") in ("Aggregated", "Total") else (row.get("Type", ""), row["Name"])
+                requests, rps = int(row.get("Request Count") or 0), float(row.get("Requests/s") or 0)
+                self.requests[key] = self.requests.get(key, 0) + requests
+                self.failures[key] = self.failures.get(key, 0) + int(row.get("Failure Count") or 0)
+                if rps:
+                    self.seconds[key] = self.seconds.get(key, 0.0) + requests / rps
+            latency_file = RESULTS_DIR / f"{result['test_id']}_latency.json"
+            if latency_file.exists():
+                for entry in json.loads(latency_file.read_text()).get("entries", []):
+                    if not entry.get("count"):
+                        continue
+                    key = (entry.get("type", ""), entry["name"])
+                    histogram = Histogram.decode(entry["histogram"])
+                    self.histograms[key] = self.histograms[key].merge(histogram) if key in self.histograms else histogram
+            rates.append(steady_rates(RESULTS_DIR / f"{result['test_id']}_stats_history.csv"))
+        self.rates = np.concatenate(rates) if rates else np.empty(0)
+
+    def rps(self, key: Key) -> float | None:
+        seconds = self.seconds.get(key)
+        return self.requests[key] / seconds if seconds else None
+
+def relative(baseline: float | None, candidate: float | None) -> float | None:
+    if baseline is None or candidate is None or not baseline:
+        return None
+    return round((candidate - baseline) / baseline, 4)
+
+def classify(delta: float | None, threshold: float, significant: bool | None, worse_if_higher: bool = True) -> str:
+    if delta is None or significant is None:
+        return "insufficient data"
+    if not significant or abs(delta) <= threshold:
+        return "no change"
+    return "regression" if (delta > 0) == worse_if_higher else "improvement"
+
+def compare(
+    baseline_results: List[Dict[str, Any]],
+    candidate_results: List[Dict[str, Any]],
+    latency_threshold: float = 0.1,
+    throughput_threshold: float = 0.05,
+    error_threshold: float = 0.01,
+    alpha: float = 0.05,
+    percentiles: Tuple[float, ...] = PERCENTILES,
+    min_requests: int = 100,
+    resamples: int = BOOTSTRAP_RESAMPLES,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Compare two groups of indexed results (results_index.get_result).
+
+    latency_threshold and throughput_threshold are relative changes (0.1 is
+    10%), error_threshold an absolute change of the failed share. Endpoints
+    with fewer than min_requests in either group are reported but not judged.
+    """
+    if not baseline_results or not candidate_results:
+        raise ValueError("Both the baseline and the candidate need at least one run")
+    if not 0 < alpha < 1 or min(latency_threshold, throughput_threshold, error_threshold) < 0:
+        raise ValueError("alpha must be between 0 and 1 and the thresholds at least 0")
+    if not percentiles or not all(0 < p <= 100 for p in percentiles):
+        raise ValueError("percentiles must be between 0 and 100")
+    if not 100 <= resamples <= 100000:
+        raise ValueError("resamples must be between 100 and 100000")
+
+    rng = np.random.default_rng(seed)
+    baseline, candidate = Group(baseline_results), Group(candidate_results)
+    tail = 100 * alpha / 2
+    regressions: List[str] = []
+    endpoints: List[Dict[str, Any]] = []
+
+    keys = sorted(set(baseline.requests) | set(candidate.requests), key=lambda key: (key[1] != "Aggregated", key[1], key[0]))
+    for key in keys:
+        method, name = key
+        label = f"{method} {name}".strip()
+        requests1, requests2 = baseline.requests.get(key, 0), candidate.requests.get(key, 0)
+        endpoint: Dict[str, Any] = {"method": method, "name": name, "requests": {"baseline": requests1, "candidate": requests2}}
+        endpoints.append(endpoint)
+        if min(requests1, requests2) < min_requests:
+            endpoint["judged"] = False
+            continue
+        endpoint["judged"] = True
+
+        # Throughput
+        rps1, rps2 = baseline.rps(key), candidate.rps(key)
+        if name == "Aggregated" and min(len(baseline.rates), len(candidate.rates)) >= MIN_INTERVALS:
+            rps1, rps2 = float(baseline.rates.mean()), float(candidate.rates.mean())
+            ones1, ones2 = np.ones(len(baseline.rates)), np.ones(len(candidate.rates))
+            throughput_p, _ = mann_whitney(baseline.rates, ones1, candidate.rates, ones2)
+            test = "mann-whitney"
+        elif rps1 and rps2:
+            throughput_p = rate_test(requests1, baseline.seconds[key], requests2, candidate.seconds[key])
+            test = "poisson"
+        else:
+            throughput_p, test = None, None
+        delta = relative(rps1, rps2)
+        change = classify(delta, throughput_threshold, None if throughput_p is None else throughput_p < alpha, False)
+        if name != "Aggregated" and change in ("regression", "improvement"):
+            # Endpoint throughput follows the request mix, only the total is judged
+            change = "lower" if change == "regression" else "higher"
+        endpoint["throughput"] = {
+            "baseline_rps": round(rps1, 2) if rps1 else None,
+            "candidate_rps": round(rps2, 2) if rps2 else None,
+            "delta_pct": round(100 * delta, 2) if delta is not None else None,
+            "test": test,
+            "p_value": round(throughput_p, 6) if throughput_p is not None else None,
+            "change": change,
+        }
+        if change == "regression":
+            regressions.append(f"Throughput {rps1:.1f} -> {rps2:.1f} req/s ({100 * delta:+.1f}%)")
+
+        # Error rate
+        failures1, failures2 = baseline.failures.get(key, 0), candidate.failures.get(key, 0)
+        rate1, rate2 = failures1 / requests1, failures2 / requests2
+        error_p = proportion_test(failures1, requests1, failures2, requests2)
+        change = classify(rate2 - rate1, error_threshold, error_p < alpha)
+        endpoint["error_rate"] = {
+            "baseline": round(rate1, 6),
+            "candidate": round(rate2, 6),
+            "delta": round(rate2 - rate1, 6),
+            "p_value": round(error_p, 6),
+            "change": change,
+        }
+        if change == "regression":
+            regressions.append(f"{label} error rate {rate1:.2%} -> {rate2:.2%}")
+
+        # Latency
+        histogram1, histogram2 = baseline.histograms.get(key), candidate.histograms.get(key)
+        if histogram1 is None or histogram2 is None:
+            endpoint["latency"] = None
+            continue
+        latency_p, slower = mann_whitney(histogram1.values, histogram1.counts, histogram2.values, histogram2.counts)
+        differences = histogram2.bootstrap(percentiles, rng, resamples) - histogram1.bootstrap(percentiles, rng, resamples)
+        latency: Dict[str, Any] = {
+            "mann_whitney_p": round(latency_p, 6),
+            "prob_slower": round(slower, 4),
+            "percentiles": {},
+        }
+        for row, percentile in enumerate(percentiles):
+            value1, value2 = histogram1.percentile(percentile), histogram2.percentile(percentile)
+            low, high = np.percentile(differences[row], (tail, 100 - tail))
+            delta = relative(value1, value2)
+            change = classify(delta, latency_threshold, bool(low > 0 or high < 0))
+            latency["percentiles"][f"{percentile:g}"] = {
+                "baseline_ms": round(value1, 3),
+                "candidate_ms": round(value2, 3),
+                "delta_ms": round(value2 - value1, 3),
+                "delta_pct": round(100 * delta, 2) if delta is not None else None,
+                "ci_ms": [round(float(low), 3), round(float(high), 3)],
+                "change": change,
+            }
+            if change == "regression":
+                regressions.append(f"{label} p{percentile:g} {value1:.1f} -> {value2:.1f} ms ({100 * delta:+.1f}%)")
+        endpoint["latency"] = latency
+
+    return {
+        "baseline": baseline.test_ids,
+        "candidate": candidate.test_ids,
+        "thresholds": {
+            "latency": latency_threshold,
+            "throughput": throughput_threshold,
+            "error_rate": error_threshold,
+            "alpha": alpha,
+            "min_requests": min_requests,
+        },
+        "verdict": "fail" if regressions else "pass" if any(endpoint["judged"] for endpoint in endpoints) else "inconclusive",
+        "regressions": regressions,
+        "endpoints": endpoints,
+    }
@@ -0,0 +1,202 @@
+"""
+Analysis of raw per-request sample logs.
+
+Tests run with sample_log enabled leave RESULTS_DIR/<test_id>_samples/, one
+directory of raw column files per load-generating process (see
+load/scripts/sample_log.py). The columns are memory-mapped, concatenated and
+filtered with NumPy, and every query (percentiles, latency histograms, time
+buckets) is computed with array operations, never per sample in Python.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+RESULTS_DIR = Path("/mnt/results")
+
+COLUMNS = {
+    "timestamp": "<f8",
+    "latency": "<f4",
+    "status": "<u2",
+    "bytes": "<u4",
+    "endpoint": "<u2",
+    "failed": "u1",
+}
+PERCENTILES = (50, 90, 95, 99, 99.9)
+MAX_BUCKETS = 10000
+
+def samples_dir(test_id: str) -> Path:
+    return RESULTS_DIR / f"{test_id}_samples"
+
+def has_samples(test_id: str) -> bool:
+    return samples_dir(test_id).is_dir()
+
+def read_column(path: Path, dtype: str) -> np.ndarray:
+    if not path.exists() or path.stat().st_size == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+class Samples:
+    """All samples of a test as columns, with endpoint and worker codes into names and workers."""
+
+    def __init__(self, test_id: str):
+        directory = samples_dir(test_id)
+        if not directory.is_dir():
+            raise FileNotFoundError(f"No sample log for test {test_id}")
+
+        self.names: List[List[str]] = []   # [method, name] by global endpoint code
+        self.workers: List[str] = []
+        parts: Dict[str, List[np.ndarray]] = {column: [] for column in COLUMNS}
+        parts["worker"] = []
+        for process_dir in sorted(p for p in directory.iterdir() if p.is_dir()):
+            columns = {column: read_column(process_dir / f"{column}.{dtype[-2:]}", dtype) for column, dtype in COLUMNS.items()}
+            # A batch may be half written while the test runs, keep only complete samples
+            count = min(len(values) for values in columns.values())
+            if count == 0:
+                continue
+            endpoints_file = process_dir / "endpoints.json"
+            local_names = json.loads(endpoints_file.read_text()) if endpoints_file.exists() else []
+            codes = np.array([self.endpoint_code(method, name) for method, name in local_names] or [0], dtype=np.uint16)
+            for column, values in columns.items():
+                parts[column].append(values[:count])
+            parts["endpoint"][-1] = codes[np.minimum(parts["endpoint"][-1], len(codes) - 1)]
+            parts["worker"].append(np.full(count, len(self.workers), dtype=np.uint16))
+            self.workers.append(process_dir.name)
+
+        self.columns: Dict[str, np.ndarray] = {
+            column: np.concatenate(values) if values else np.empty(0, dtype=COLUMNS.get(column, "<u2"))
+            for column, values in parts.items()
+        }
+        timestamps = self.columns["timestamp"]
+        self.started = float(timestamps.min()) if len(timestamps) else 0.0
+
+    def endpoint_code(self, method: str, name: str) -> int:
+        if [method, name] not in self.names:
+            self.names.append([method, name])
+        return self.names.index([method, name])
+
+    def select(
+        self,
+        name: str | None = None,
+        method: str | None = None,
+        status: int | None = None,
+        worker: str | None = None,
+        failed: bool | None = None,
+        start_s: float | None = None,
+        end_s: float | None = None,
+    ) -> np.ndarray:
+        """Boolean mask of the samples matching every given filter. Times are seconds since the first sample."""
+        columns = self.columns
+        mask = np.ones(len(columns["timestamp"]), dtype=bool)
+        if name is not None or method is not None:
+            codes = [code for code, (m, n) in enumerate(self.names)
+                     if (name is None or n == name) and (method is None or m == method)]
+            mask &= np.isin(columns["endpoint"], codes)
+        if status is not None:
+            mask &= columns["status"] == status
+        if worker is not None:
+            if worker in self.workers:
+                mask &= columns["worker"] == self.workers.index(worker)
+            else:
+                mask[:] = False
+        if failed is not None:
+            mask &= columns["failed"].astype(bool) == failed
+        if start_s is not None:
+            mask &= columns["timestamp"] >= self.started + start_s
+        if end_s is not None:
+            mask &= columns["timestamp"] < self.started + end_s
+        return mask
+
+def latency_stats(latency: np.ndarray, failed: np.ndarray, size: np.ndarray) -> Dict[str, Any]:
+    if not len(latency):
+        return {"count": 0}
+    values = np.percentile(latency, PERCENTILES, method="inverted_cdf")
+    return {
+        "count": int(len(latency)),
+        "failures": int(failed.sum()),
+        "min_ms": round(float(latency.min()), 3),
+        "max_ms": round(float(latency.max()), 3),
+        "mean_ms": round(float(latency.mean(dtype=np.float64)), 3),
+        "percentiles_ms": {f"{p:g}": round(float(v), 3) for p, v in zip(PERCENTILES, values)},
+        "bytes": int(size.sum(dtype=np.uint64)),
+    }
+
+def summary(samples: Samples, mask: np.ndarray, group_by: str = "endpoint") -> Dict[str, Any]:
+    """Latency percentiles, counts and failures overall and per endpoint, worker or status."""
+    if group_by not in ("endpoint", "worker", "status"):
+        raise ValueError("group_by must be endpoint, worker or status")
+    columns = {column: values[mask] for column, values in samples.columns.items()}
+    timestamps = columns["timestamp"]
+    duration = float(timestamps.max() - timestamps.min()) if len(timestamps) > 1 else 0.0
+
+    groups: List[Dict[str, Any]] = []
+    keys = columns[group_by]
+    order = np.argsort(keys, kind="stable")
+    unique, starts = np.unique(keys[order], return_index=True)
+    for code, indexes in zip(unique, np.split(order, starts[1:])):
+        if group_by == "endpoint":
+            method, name = samples.names[code]
+            label: Dict[str, Any] = {"method": method, "name": name}
+        elif group_by == "worker":
+            label = {"worker": samples.workers[code]}
+        else:
+            label = {"status": int(code)}
+        groups.append({**label, **latency_stats(columns["latency"][indexes], columns["failed"][indexes], columns["bytes"][indexes])})
+
+    return {
+        "duration_s": round(duration, 3),
+        "rps": round(len(timestamps) / duration, 2) if duration else None,
+        "total": latency_stats(columns["latency"], columns["failed"], columns["bytes"]),
+        group_by: groups,
+    }
+
+def histogram(samples: Samples, mask: np.ndarray, bins: int = 50, log_scale: bool = True) -> Dict[str, Any]:
+    """Latency histogram, with logarithmic bins by default since latencies have a long tail."""
+    if not 1 <= bins <= MAX_BUCKETS:
+        raise ValueError(f"bins must be between 1 and {MAX_BUCKETS}")
+    latency = samples.columns["latency"][mask]
+    if not len(latency):
+        return {"count": 0, "edges_ms": [], "counts": []}
+    low, high = float(latency.min()), float(latency.max())
+    if log_scale:
+        edges = np.geomspace(max(low, 0.001), max(high, 0.001) * 1.000001, bins + 1)
+    else:
+        edges = np.linspace(low, high if high > low else low + 1, bins + 1)
+    counts, edges = np.histogram(np.clip(latency, edges[0], edges[-1]), bins=edges)
+    return {
+        "count": int(len(latency)),
+        "edges_ms": [round(float(edge), 3) for edge in edges],
+        "counts": counts.tolist(),
+    }
+
+def timeseries(samples: Samples, mask: np.ndarray, bucket_s: float = 1.0) -> Dict[str, Any]:
+    """Requests, failures and latency percentiles per time bucket since the first sample."""
+    if bucket_s <= 0:
+        raise ValueError("bucket_s must be positive")
+    timestamps = samples.columns["timestamp"][mask]
+    latency = samples.columns["latency"][mask]
+    failed = samples.columns["failed"][mask]
+    if not len(timestamps):
+        return {"bucket_s": bucket_s, "buckets": 0, "series": {}}
+    bucket = ((timestamps - samples.started) // bucket_s).astype(np.int64)
+    if bucket.max() >= MAX_BUCKETS:
+        raise ValueError(f"More than {MAX_BUCKETS} buckets, use a larger bucket_s")
+
+    # Sort by bucket, then latency, so each bucket's percentiles are direct index lookups
+    order = np.lexsort((latency, bucket))
+    bucket, latency, failed = bucket[order], latency[order], failed[order]
+    unique, starts, counts = np.unique(bucket, return_index=True, return_counts=True)
+    failures = np.add.reduceat(failed.astype(np.int64), starts)
+    series: Dict[str, Any] = {
+        "start_s": (unique * bucket_s).tolist(),
+        "requests": counts.tolist(),
+        "rps": np.round(counts / bucket_s, 2).tolist(),
+        "failures": failures.tolist(),
+    }
+    for p in PERCENTILES:
+        # Nearest rank, the same definition as the inverted_cdf percentiles of summary()
+        ranks = np.maximum(np.ceil(p / 100 * counts).astype(np.int64), 1) - 1
+        series[f"p{p:g}_ms"] = np.round(latency[starts + ranks].astype(np.float64), 3).tolist()
+    return {"bucket_s": bucket_s, "buckets": len(unique), "series": series}
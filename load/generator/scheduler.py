@@ -0,0 +1,280 @@
+"""
+Concurrent test scheduler.
+
+Submitted tests wait in a priority queue (higher priority first, FIFO within
+a priority) and start as soon as their resources are free. Every run gets a
+disjoint set of CPUs, one per Locust process generating load, and distributed
+runs also get their own master port, so several tests can run side by side
+on one generator host without competing for cores or colliding on ports.
+
+Processes are pinned to the run's CPUs when they start (see placement.py).
+
+Scheduling is strict: a queued test that does not fit blocks the tests
+behind it, so large runs are not starved by a stream of small ones. The
+queue is persistent through the per-run journals in lifecycle.py. Finished
+runs are recorded in the results index (results_index.py), which keeps them
+after they are pruned from memory.
+
+Autoscaled runs (autoscale in the config) start distributed and grow while
+they run: when the run's Locust processes stay saturated for AUTOSCALE_AFTER_S
+(see GeneratorLoad in lifecycle.py), one more worker is started on a free CPU,
+up to max_workers or every CPU of the generator.
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import logging
+from typing import Any, Dict, List, Set, Tuple
+
+import artifacts
+import live_stats
+import process_output
+import process_sampler
+import results_index
+import worker_pool
+from placement import parse_cpu_list
+from lifecycle import (
+    FINISHED_STATUSES, TestRun, add_worker, delete_journal, is_distributed, launch_test,
+    recover_journals, terminate_processes, watch_test, write_journal
+)
+
+logger = logging.getLogger(__name__)
+
+# CPUs the generator may hand out to test runs: LOAD_GENERATOR_CPUS (e.g. "2-7") or every CPU this process may use
+ALLOWED_CPUS = os.sched_getaffinity(0)
+AVAILABLE_CPUS: List[int] = sorted(
+    ALLOWED_CPUS & set(parse_cpu_list(os.environ["LOAD_GENERATOR_CPUS"])) if os.getenv("LOAD_GENERATOR_CPUS") else ALLOWED_CPUS
+)
+# Master bind ports handed out to distributed runs, one port per concurrent run
+MASTER_PORT_BASE = int(os.getenv("LOCUST_MASTER_PORT_BASE") or "5557")
+MAX_CONCURRENT_TESTS = int(os.getenv("MAX_CONCURRENT_TESTS") or str(len(AVAILABLE_CPUS)))
+# Extra port the idle worker pool waits on, it swaps ports with the run that adopts it
+POOL_PORT = MASTER_PORT_BASE + MAX_CONCURRENT_TESTS
+# Finished runs kept in memory and in the journal, oldest are dropped first
+MAX_FINISHED_RUNS = int(os.getenv("MAX_FINISHED_RUNS") or "100")
+# Autoscaled runs get a worker after staying saturated this long, then give it time to take over users
+AUTOSCALE_AFTER_S = float(os.getenv("AUTOSCALE_AFTER_S") or "5")
+AUTOSCALE_COOLDOWN_S = float(os.getenv("AUTOSCALE_COOLDOWN_S") or "15")
+
+runs: Dict[str, TestRun] = {}
+queue: List[Tuple[int, float, int, str]] = []  # (-priority, queued_at, sequence, test_id)
+free_cpus: Set[int] = set(AVAILABLE_CPUS)
+free_ports: Set[int] = set(range(MASTER_PORT_BASE, MASTER_PORT_BASE + MAX_CONCURRENT_TESTS))
+sequence = 0
+accepting = True  # Cleared on shutdown so stopping runs don't start queued ones
+
+def cpus_needed(config: Dict[str, Any]) -> int:
+    """One CPU per load-generating process. The master only aggregates stats and shares them."""
+    return max(1, config.get("workers", 1))
+
+def capacity() -> Dict[str, Any]:
+    return {
+        "cpus_total": len(AVAILABLE_CPUS),
+        "cpus_free": len(free_cpus),
+        "ports_free": len(free_ports),
+        "running": sum(1 for run in runs.values() if run.is_active),
+        "queued": sum(1 for run in runs.values() if run.status == "queued"),
+        "idle_pool_workers": len(worker_pool.idle),
+    }
+
+def enqueue(run: TestRun) -> None:
+    global sequence
+    sequence += 1
+    heapq.heappush(queue, (-run.priority, run.queued_at.timestamp(), sequence, run.test_id))
+
+def queued_runs() -> List[TestRun]:
+    """Queued runs in the order they will start."""
+    queued = (runs.get(test_id) for *_, test_id in sorted(queue))
+    return [run for run in queued if run is not None and run.status == "queued"]
+
+def allocate(run: TestRun) -> bool:
+    """Reserve CPUs and, for distributed runs, a master port. Returns False if they are not free."""
+    needs_port = is_distributed(run.config)
+    if len(free_cpus) < cpus_needed(run.config) or (needs_port and not free_ports):
+        return False
+    run.cpus = sorted(free_cpus)[:cpus_needed(run.config)]
+    free_cpus.difference_update(run.cpus)
+    if needs_port:
+        run.port = min(free_ports)
+        free_ports.remove(run.port)
+    return True
+
+def release(run: TestRun) -> None:
+    free_cpus.update(run.cpus)
+    if run.port is not None:
+        free_ports.add(run.port)
+
+def prune_finished() -> None:
+    """Drop the oldest finished runs beyond MAX_FINISHED_RUNS."""
+    finished = sorted(
+        (run for run in runs.values() if run.is_finished),
+        key=lambda run: run.finished_at or run.queued_at
+    )
+    for run in finished[:max(0, len(finished) - MAX_FINISHED_RUNS)]:
+        del runs[run.test_id]
+        delete_journal(run.test_id)
+        process_output.discard(run.test_id)
+
+async def record_results(run: TestRun) -> None:
+    """Add a finished run to the results index and compress its artifacts, off the event loop."""
+    try:
+        await asyncio.to_thread(results_index.index_run, run.to_dict())
+    except Exception as e:
+        logger.error(f"Failed to index results of test {run.test_id}: {e}")
+    try:
+        await asyncio.to_thread(artifacts.precompress, run.test_id)
+    except Exception as e:
+        logger.error(f"Failed to compress artifacts of test {run.test_id}: {e}")
+
+def max_workers(run: TestRun) -> int:
+    return min(run.config.get("max_workers") or len(AVAILABLE_CPUS), len(AVAILABLE_CPUS))
+
+async def autoscale(run: TestRun) -> None:
+    """Add a worker on a free CPU each time the run's generator stays saturated, until it finishes."""
+    subscriber = live_stats.Subscriber()
+    live_stats.subscribers.setdefault(run.test_id, set()).add(subscriber)
+    scaled_at = 0.0
+    try:
+        while not run.is_finished:
+            await subscriber.updated.wait()
+            subscriber.take()
+            since = run.generator_load.saturated_since
+            now = time.monotonic()
+            if since is None or now - since < AUTOSCALE_AFTER_S or now - scaled_at < AUTOSCALE_COOLDOWN_S:
+                continue
+            if len(run.cpus) >= max_workers(run) or not free_cpus or run.is_finished:
+                continue
+            cpu = min(free_cpus)
+            free_cpus.remove(cpu)
+            run.cpus.append(cpu)
+            await add_worker(run)
+            scaled_at = now
+            logger.info(f"Test {run.test_id} saturated its load generator for {now - since:.0f}s, "
+                        f"added a worker on CPU {cpu} ({len(run.cpus)} of at most {max_workers(run)})")
+    except Exception as e:
+        logger.error(f"Autoscaling test {run.test_id} failed: {e}")
+    finally:
+        live_stats.subscribers.get(run.test_id, set()).discard(subscriber)
+
+async def run_job(run: TestRun) -> None:
+    """Launch a run, watch it to completion, then hand its resources to the next queued run."""
+    try:
+        await launch_test(run)
+        if run.config.get("autoscale"):
+            run.tasks.append(asyncio.create_task(autoscale(run)))
+        await watch_test(run)
+    except asyncio.CancelledError:
+        # Stopped by stop_run() or generator shutdown
+        await terminate_processes(run)
+        run.finish(run.stop_reason or "stopped")
+    except Exception as e:
+        logger.error(f"Error running test {run.test_id}: {str(e)}")
+        run.error = str(e)
+        await terminate_processes(run)
+        run.finish("failed")
+    finally:
+        if not run.is_finished:
+            run.finish(run.stop_reason or "stopped")
+        release(run)
+        prune_finished()
+        schedule()
+        await record_results(run)
+
+def schedule() -> None:
+    """Start queued runs in priority order while their resources are free."""
+    while queue and accepting:
+        test_id = queue[0][-1]
+        run = runs.get(test_id)
+        if run is None or run.status != "queued":
+            heapq.heappop(queue)  # Cancelled while queued
+            continue
+        if not allocate(run):
+            break
+        heapq.heappop(queue)
+        run.status = "starting"
+        write_journal(run)
+        run.job_task = asyncio.create_task(run_job(run))
+
+def submit(run: TestRun) -> None:
+    """Queue a run and start it right away if resources allow."""
+    if cpus_needed(run.config) > len(AVAILABLE_CPUS):
+        raise ValueError(f"Test needs {cpus_needed(run.config)} CPUs, the generator has {len(AVAILABLE_CPUS)}")
+    runs[run.test_id] = run
+    write_journal(run)
+    enqueue(run)
+    schedule()
+
+async def stop_run(run: TestRun, reason: str = "stopped") -> bool:
+    """Cancel a queued run, or stop a running one and wait until its outcome is recorded."""
+    if run.is_finished:
+        return False
+    if run.status == "queued":
+        run.finish("cancelled")
+        schedule()
+        await record_results(run)
+        return True
+    run.stop_reason = reason
+    if run.job_task is not None:
+        run.job_task.cancel()
+    await run.done.wait()
+    return True
+
+def recover() -> None:
+    """Reload journaled runs after a restart and requeue the ones that never started."""
+    for run in recover_journals():
+        runs[run.test_id] = run
+        if run.status == "queued":
+            run.cpus, run.port = [], None
+            enqueue(run)
+    prune_finished()
+    logger.info(f"Recovered {len(runs)} test(s), {len(queue)} queued")
+    schedule()
+
+async def start() -> None:
+    """Recover journaled runs, index results not indexed yet and pre-fork the idle worker pool."""
+    spare_cpus = ALLOWED_CPUS - set(AVAILABLE_CPUS)
+    if spare_cpus:
+        # Keep the API, output handling and result processing off the CPUs that generate load
+        os.sched_setaffinity(0, spare_cpus)
+        logger.info(f"Generator API runs on CPUs {sorted(spare_cpus)}, tests on CPUs {AVAILABLE_CPUS}")
+    recover()
+    finished = [run.to_dict() for run in runs.values() if run.is_finished]
+    await asyncio.to_thread(results_index.backfill, finished)
+    await worker_pool.start(POOL_PORT)
+    await process_sampler.start(tracked_processes)
+
+async def shutdown() -> None:
+    """Stop running tests, queued tests stay journaled and resume after a restart."""
+    global accepting
+    accepting = False
+    active = [run for run in runs.values() if run.is_active]
+    await asyncio.gather(*(stop_run(run, reason="interrupted") for run in active))
+    await worker_pool.shutdown()
+    await process_sampler.shutdown()
+
+def get_run(test_id: str) -> TestRun | None:
+    return runs.get(test_id)
+
+def tracked_processes() -> Dict[int, Tuple[str, str]]:
+    """PIDs of the running tests' processes, with their test ID and process name."""
+    return {
+        pid: (run.test_id, name)
+        for run in runs.values() if run.is_active
+        for name, pid in run.pids.items()
+    }
+
+def list_runs() -> Dict[str, Any]:
+    """Running, queued (in start order) and finished (newest first) runs."""
+    finished = sorted(
+        (run for run in runs.values() if run.status in FINISHED_STATUSES),
+        key=lambda run: run.finished_at or run.queued_at,
+        reverse=True
+    )
+    return {
+        "capacity": capacity(),
+        "running": [run.to_dict() for run in runs.values() if run.is_active],
+        "queued": [run.to_dict() for run in queued_runs()],
+        "finished": [run.to_dict() for run in finished],
+    }
@@ -0,0 +1,127 @@
+"""
+Pool of pre-forked idle Locust workers.
+
+A Locust worker spends about a second importing before it can connect to a
+master. Idle workers are started ahead of time and pointed at a master port
+nobody listens on yet. Workers keep retrying the connection, so when a
+distributed test binds its master to that port they attach within
+milliseconds. The test adopts the whole pool and takes over its port, and
+the pool refills on the port the scheduler had reserved for the test.
+
+Idle workers give up after Locust's connection retry limit (about five
+minutes without a master) and are replaced.
+"""
+
+import os
+import sys
+import asyncio
+import logging
+from typing import Callable, List, Set, Tuple
+
+import process_output
+
+logger = logging.getLogger(__name__)
+
+LOCUSTFILE = "/mnt/locust/loadtest.py"
+POOL_SIZE = int(os.getenv("LOCUST_WORKER_POOL_SIZE") or "0")
+RESPAWN_DELAY_S = 1.0   # Back-off before replacing an idle worker that exited
+
+def worker_command(port: int) -> List[str]:
+    return [
+        sys.executable, "-m", "locust",
+        "-f", LOCUSTFILE,
+        "--worker",
+        "--master-host", "localhost",
+        "--master-port", str(port)
+    ]
+
+def discard_output(line: bytes) -> None:
+    logger.debug(f"[Locust pool worker] {line.decode(errors='replace').rstrip()}")
+
+class PooledWorker:
+    """An idle worker process. Its output goes to on_line, which the adopting test replaces."""
+
+    def __init__(self, proc: asyncio.subprocess.Process, port: int):
+        self.proc = proc
+        self.port = port
+        self.on_line: Callable[[bytes], None] = discard_output
+
+idle: List[PooledWorker] = []
+port: int | None = None
+running = False
+# References to output readers so they are not garbage collected
+tasks: Set["asyncio.Task[None]"] = set()
+
+async def spawn_worker() -> None:
+    if not running or port is None:
+        return
+    proc = await asyncio.create_subprocess_exec(
+        *worker_command(port),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT
+    )
+    worker = PooledWorker(proc, port)
+    idle.append(worker)
+    task = asyncio.create_task(read_output(worker))
+    tasks.add(task)
+    task.add_done_callback(tasks.discard)
+
+async def read_output(worker: PooledWorker) -> None:
+    """Read a worker's output for as long as it lives, replacing it if it exits while idle."""
+    assert worker.proc.stdout is not None
+    try:
+        # on_line changes when a test adopts the worker
+        await process_output.read_lines(worker.proc.stdout, lambda line: worker.on_line(line))
+    except Exception as e:
+        logger.error(f"Error reading pool worker output: {e}")
+    await worker.proc.wait()
+
+    if worker in idle:
+        idle.remove(worker)
+        logger.info(f"Idle pool worker PID {worker.proc.pid} exited ({worker.proc.returncode}), replacing it")
+        await asyncio.sleep(RESPAWN_DELAY_S)
+        if worker.port == port:
+            await spawn_worker()
+
+async def refill() -> None:
+    await asyncio.gather(*(spawn_worker() for _ in range(POOL_SIZE - len(idle))))
+
+async def start(initial_port: int) -> None:
+    """Pre-fork the pool on a master port no test uses."""
+    global port, running
+    if POOL_SIZE <= 0:
+        return
+    port, running = initial_port, True
+    await refill()
+    logger.info(f"Started {len(idle)} idle Locust worker(s) on port {port}")
+
+def claim(run_port: int, needed: int) -> Tuple[int, List[PooledWorker]]:
+    """
+    Hand the idle workers to a distributed test that needs at least as many.
+
+    Returns the master port the test must use and the adopted workers. When
+    the pool is adopted, the test gets the pool's port and the pool refills
+    on the test's reserved port, so ports stay disjoint. Partial adoption is
+    not possible: every idle worker would join the test's master.
+    """
+    global port
+    if not running or port is None or not idle or len(idle) > needed:
+        return run_port, []
+    claimed = list(idle)
+    idle.clear()
+    pool_port, port = port, run_port
+    task = asyncio.create_task(refill())
+    tasks.add(task)
+    task.add_done_callback(tasks.discard)
+    return pool_port, claimed
+
+async def shutdown() -> None:
+    """Stop idle workers."""
+    global running
+    running = False
+    workers = list(idle)
+    idle.clear()
+    for worker in workers:
+        if worker.proc.returncode is None:
+            worker.proc.terminate()
+    await asyncio.gather(*(worker.proc.wait() for worker in workers))
@@ -0,0 +1,97 @@
+"""
+Workload spec models.
+
+A test's "workload" config describes its request mix declaratively: the
+endpoints with their weights, the distributions of their path and query
+parameters, and the think time between requests. The spec is validated here
+when the test is submitted, written next to the results as
+<test_id>_workload.json and compiled into tasks by WorkloadUser
+(load/scripts/workload.py) when the test starts.
+"""
+
+from string import Formatter
+from typing import Any, Dict, List, Literal
+
+from pydantic import BaseModel, Field, model_validator
+
+# Fields each distribution needs, besides the optional min/max bounds of normal and lognormal
+REQUIRED_FIELDS = {
+    "constant": ("value",),
+    "uniform": ("min", "max"),
+    "randint": ("min", "max"),
+    "exponential": ("mean",),
+    "normal": ("mean", "stddev"),
+    "lognormal": ("median", "sigma"),
+    "choice": ("values",),
+}
+
+class Distribution(BaseModel):
+    distribution: Literal["constant", "uniform", "randint", "exponential", "normal", "lognormal", "choice"] = "constant"
+    value: Any = None
+    min: float | None = None
+    max: float | None = None
+    mean: float | None = None
+    stddev: float | None = None
+    median: float | None = None
+    sigma: float | None = None
+    values: List[Any] | None = None
+    weights: List[float] | None = None
+
+    @model_validator(mode="after")
+    def check_fields(self) -> "Distribution":
+        missing = [field for field in REQUIRED_FIELDS[self.distribution] if getattr(self, field) is None]
+        if missing:
+            raise ValueError(f"{self.distribution} distribution needs {', '.join(missing)}")
+        if self.min is not None and self.max is not None and self.min > self.max:
+            raise ValueError("min must not be greater than max")
+        if self.distribution == "exponential" and self.mean <= 0:  # type: ignore[operator]
+            raise ValueError("exponential distribution needs a positive mean")
+        if self.distribution == "lognormal" and self.median <= 0:  # type: ignore[operator]
+            raise ValueError("lognormal distribution needs a positive median")
+        if self.distribution == "choice" and (
+            not self.values or (self.weights is not None and len(self.weights) != len(self.values))
+        ):
+            raise ValueError("choice distribution needs values, and one weight per value if weights are given")
+        return self
+
+# A parameter is a distribution or a constant
+Parameter = Distribution | float | int | str
+
+class Endpoint(BaseModel):
+    path: str                          # Path template, {name} placeholders are filled from params
+    method: str = "GET"
+    name: str | None = None            # Stats name, defaults to the path template
+    weight: float = 1
+    params: Dict[str, Parameter] = {}  # Path placeholders
+    query: Dict[str, Parameter] = {}   # Query string parameters
+    body: Any = Field(None, alias="json")  # JSON request body
+    expect_status: List[int] = [200]
+
+    model_config = {"populate_by_name": True}
+
+    @model_validator(mode="after")
+    def check_path(self) -> "Endpoint":
+        if self.weight < 0:
+            raise ValueError(f"Negative weight for {self.path}")
+        try:
+            placeholders = {field for _, field, _, _ in Formatter().parse(self.path) if field}
+        except ValueError as e:
+            raise ValueError(f"Invalid path template {self.path}: {e}")
+        missing = placeholders - set(self.params)
+        if missing:
+            raise ValueError(f"No params for {', '.join(sorted(missing))} in {self.path}")
+        return self
+
+class Workload(BaseModel):
+    endpoints: List[Endpoint]
+    think_time: Parameter = 1.0  # Seconds between a user's requests (closed loop only)
+
+    @model_validator(mode="after")
+    def check_weights(self) -> "Workload":
+        if not self.endpoints or sum(endpoint.weight for endpoint in self.endpoints) <= 0:
+            raise ValueError("A workload needs at least one endpoint with a positive weight")
+        return self
+
+    def to_spec(self) -> Dict[str, Any]:
+        """The spec as WorkloadUser reads it."""
+        return self.model_dump(by_alias=True, exclude_none=True)
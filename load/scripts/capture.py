@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Build replayable traffic captures from access logs.
+
+Converts access logs into the capture format replayed by ReplayUser (see
+replay.py): JSON lines, one request per line with its offset from the first
+request, gzipped when the output name ends in .gz.
+
+Supported logs:
+    sut    The SUT's structured access log (JSON lines on the API server's
+           stdout, see sut/application/app/access_log.py). Lines may carry a
+           docker compose prefix ("sut-api-server-1  | {...}"). The SUT only
+           logs a sample of requests (ACCESS_LOG_SAMPLE_RATE), set it to 1.0
+           while capturing to keep the original rate.
+    nginx  Gateway access logs in the combined format. $time_local has one
+           second resolution, so requests logged in the same second are spread
+           evenly over it.
+
+Usage:
+    python capture.py sut-api.log -o captures/prod.jsonl.gz
+    docker compose logs --no-log-prefix sut-api-server | python capture.py - -o captures/prod.jsonl
+    python capture.py access.log --format nginx --since 2025-01-01T10:00:00 --until 2025-01-01T11:00:00 -o captures/peak.jsonl.gz
+"""
+
+import re
+import sys
+import gzip
+import json
+import argparse
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, TextIO
+
+NGINX_LINE = re.compile(
+    r'\[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<path>\S+) [^"]*" (?P<status>\d{3}) '
+)
+NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+def stats_name(path: str) -> str:
+    """Requests are grouped without their query and with numeric path segments collapsed, /api/delay/100 -> /api/delay/{n}."""
+    return NUMERIC_SEGMENT.sub("/{n}", path.split("?", 1)[0])
+
+def parse_sut(lines: Iterable[str], path_prefix: str) -> Iterator[Dict[str, Any]]:
+    for line in lines:
+        start = line.find("{")
+        if start < 0:
+            continue
+        try:
+            record = json.loads(line[start:])
+        except ValueError:
+            continue
+        if record.get("log_type") != "access" or "path" not in record:
+            continue
+        # Logged when the response was sent, the request started duration_ms earlier
+        timestamp = datetime.fromisoformat(record["ts"]).timestamp() - (record.get("duration_ms") or 0) / 1000
+        path = path_prefix + record["path"] + (f"?{record['query']}" if record.get("query") else "")
+        yield {"ts": timestamp, "method": record.get("method", "GET"), "path": path, "status": record.get("status")}
+
+def parse_nginx(lines: Iterable[str], path_prefix: str) -> Iterator[Dict[str, Any]]:
+    for line in lines:
+        match = NGINX_LINE.search(line)
+        if match is None:
+            continue
+        timestamp = datetime.strptime(match["time"], "%d/%b/%Y:%H:%M:%S %z").timestamp()
+        yield {"ts": timestamp, "method": match["method"], "path": path_prefix + match["path"],
+               "status": int(match["status"])}
+
+def spread_seconds(requests: List[Dict[str, Any]]) -> None:
+    """Spread requests with whole-second timestamps evenly over their second."""
+    per_second = Counter(int(request["ts"]) for request in requests)
+    seen: Counter[int] = Counter()
+    for request in requests:
+        second = int(request["ts"])
+        request["ts"] = second + seen[second] / per_second[second]
+        seen[second] += 1
+
+def build_capture(requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    requests.sort(key=lambda request: request["ts"])
+    first = requests[0]["ts"]
+    return [
+        {"t": round(request["ts"] - first, 6), "method": request["method"], "path": request["path"],
+         "name": stats_name(request["path"]), "status": request["status"]}
+        for request in requests
+    ]
+
+def write_capture(entries: List[Dict[str, Any]], output: str) -> None:
+    opener = gzip.open if output.endswith(".gz") else open
+    with opener(output, "wt") as f:  # type: ignore[operator]
+        for entry in entries:
+            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+def open_input(path: str) -> TextIO:
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt")  # type: ignore[return-value]
+    return open(path)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build a replayable traffic capture from access logs")
+    parser.add_argument("logs", nargs="+", help="Access log files (- for stdin, .gz is decompressed)")
+    parser.add_argument("-o", "--output", required=True, help="Capture file, gzipped if it ends in .gz")
+    parser.add_argument("--format", choices=["sut", "nginx"], default="sut", help="Access log format (default: sut)")
+    parser.add_argument("--path-prefix", default=None,
+                        help="Prefix added to logged paths (default: /api for sut logs, which the gateway strips)")
+    parser.add_argument("--since", help="Only requests at or after this ISO time")
+    parser.add_argument("--until", help="Only requests before this ISO time")
+    args = parser.parse_args()
+
+    path_prefix = args.path_prefix if args.path_prefix is not None else ("/api" if args.format == "sut" else "")
+    parse = parse_sut if args.format == "sut" else parse_nginx
+    since = datetime.fromisoformat(args.since).timestamp() if args.since else None
+    until = datetime.fromisoformat(args.until).timestamp() if args.until else None
+
+    requests: List[Dict[str, Any]] = []
+    for log in args.logs:
+        with open_input(log) as f:
+            for request in parse(f, path_prefix):
+                if (since is None or request["ts"] >= since) and (until is None or request["ts"] < until):
+                    requests.append(request)
+    if not requests:
+        print("Error: no requests found in the access logs")
+        sys.exit(1)
+    if args.format == "nginx":
+        spread_seconds(requests)
+
+    entries = build_capture(requests)
+    write_capture(entries, args.output)
+    duration = entries[-1]["t"]
+    rate = f", {len(entries) / duration:.1f} req/s" if duration else ""
+    print(f"Wrote {len(entries)} requests over {duration:.1f}s{rate} to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Client-side OpenTelemetry tracing for Locust users.
+
+Every request sent by a TracedHttpUser runs inside a CLIENT span. The W3C trace
+context (traceparent) and the test run ID are injected as headers so the SUT's
+server spans join the same trace, and end-to-end latency can be split into
+client, network/gateway and server time for individual slow requests.
+
+Spans go through a BatchSpanProcessor, so the request path only enqueues a
+finished span; serialization and export happen in batches in the background.
+Export is enabled when OTEL_EXPORTER_OTLP_ENDPOINT (OTLP/HTTP, e.g.
+http://tempo:4318) is set; batch sizes follow the standard OTEL_BSP_* variables.
+"""
+
+import os
+from typing import Any, Callable
+
+from locust import FastHttpUser, events
+from opentelemetry import trace
+from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+from opentelemetry.propagate import inject
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor
+from opentelemetry.sdk.trace.sampling import TraceIdRatioBased
+from opentelemetry.trace import SpanKind, Status, StatusCode, Tracer
+
+# Header used to tie SUT spans and logs back to a load test run
+TEST_RUN_ID_HEADER = "X-Test-Run-Id"
+
+def configure_tracing() -> tuple[TracerProvider, Tracer]:
+    """Configures the tracer provider used for client spans."""
+    # Same ratio as the SUT, TraceIdRatioBased makes the same decision for the same trace ID
+    sampling_rate = float(os.getenv("OTEL_TRACING_SAMPLING_RATE", 1.0))
+    resource = Resource.create({
+        "service.name": os.getenv("OTEL_SERVICE_NAME", "observastack-load-generator"),
+    })
+    provider = TracerProvider(resource=resource, sampler=TraceIdRatioBased(sampling_rate))
+
+    # Without an endpoint spans are still created, so traceparent is still propagated
+    if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT") or os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT"):
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+
+    return provider, provider.get_tracer(__name__)
+
+provider, tracer = configure_tracing()
+
+@events.quitting.add_listener
+def _on_quitting(**_: Any) -> None:
+    """Flush spans still queued in the batch processor before the process exits."""
+    provider.shutdown()
+
+def instrument_session(session: Any, test_run_id: str | None) -> None:
+    """Wraps a FastHttpSession so every request is sent inside a client span with trace headers."""
+    send: Callable[..., Any] = session.request
+    base_url = session.base_url
+
+    def traced_request(method: str, url: str, name: str | None = None, headers: dict | None = None, **kwargs: Any) -> Any:
+        with tracer.start_as_current_span(f"{method} {name or url}", kind=SpanKind.CLIENT) as span:
+            headers = dict(headers) if headers else {}
+            inject(headers)
+            if test_run_id:
+                headers[TEST_RUN_ID_HEADER] = test_run_id
+                span.set_attribute("test.run_id", test_run_id)
+            span.set_attribute("http.method", method)
+            span.set_attribute("http.url", f"{base_url}{url}")
+
+            response = send(method, url, name=name, headers=headers, **kwargs)
+
+            # Status 0 means the request never got a response (connection error, timeout)
+            status_code = getattr(response, "status_code", 0) or 0
+            span.set_attribute("http.status_code", status_code)
+            if status_code == 0 or status_code >= 500:
+                span.set_status(Status(StatusCode.ERROR))
+            return response
+
+    session.request = traced_request
+
+class TracedHttpUser(FastHttpUser):
+    """FastHttpUser that traces each request and propagates trace context and the test run ID."""
+    abstract = True
+
+    def __init__(self, environment: Any) -> None:
+        super().__init__(environment)
+        options = environment.parsed_options
+        instrument_session(self.client, getattr(options, "test_run_id", None) if options else None)
@@ -0,0 +1,102 @@
+"""
+Control channel for the load generator.
+
+With --control-socket set, the master (or single) process listens on that
+Unix socket while the test runs and changes its load in place, without
+restarting workers or resetting stats. One JSON command per connection, one
+JSON reply:
+
+    {"users": 200, "spawn_rate": 20, "arrival_rate": 500}   fields are optional
+    {"ok": true, "users": 200, "spawn_rate": 20, "arrival_rate": 500}
+    {"ok": false, "error": "..."}
+
+New user counts are dispatched like the initial ones, at spawn_rate, and the
+master forwards the changed options to its workers with the spawn messages.
+An open-loop test (open_loop.py) can change its arrival rate. A test driven
+by a load shape cannot be changed, the shape owns its user count.
+"""
+
+import os
+import json
+import socket
+from typing import Any, Dict
+
+import gevent
+from gevent.server import StreamServer
+from locust import events
+from locust.env import Environment
+from locust.runners import STATE_RUNNING, STATE_SPAWNING, WorkerRunner
+
+from lifecycle_events import emit
+
+MAX_COMMAND_BYTES = 4096
+
+server: StreamServer | None = None
+socket_path = ""
+
+def change_load(environment: Environment, command: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply a load change, raises ValueError if the test cannot take it."""
+    runner = environment.runner
+    options = environment.parsed_options
+    if runner is None or options is None or runner.state not in (STATE_SPAWNING, STATE_RUNNING):
+        raise ValueError("The test is not running")
+    if environment.shape_class is not None:
+        raise ValueError("The test's load profile controls its users")
+    users = command.get("users", runner.target_user_count)
+    spawn_rate = command.get("spawn_rate", options.spawn_rate)
+    arrival_rate = command.get("arrival_rate", options.arrival_rate)
+    if not isinstance(users, int) or users < 0:
+        raise ValueError("users must be a whole number, at least 0")
+    if not isinstance(spawn_rate, (int, float)) or spawn_rate <= 0:
+        raise ValueError("spawn_rate must be positive")
+    if not isinstance(arrival_rate, (int, float)) or arrival_rate < 0:
+        raise ValueError("arrival_rate must be at least 0")
+    if arrival_rate != options.arrival_rate and options.arrival_rate <= 0:
+        raise ValueError("arrival_rate can only be changed in an open-loop test")
+    if arrival_rate == 0 and options.arrival_rate > 0:
+        raise ValueError("arrival_rate cannot be 0 in an open-loop test")
+
+    # Workers take both with the next spawn messages, open-loop users pick them up at their next arrival
+    options.spawn_rate, options.arrival_rate, options.arrival_users = spawn_rate, arrival_rate, users
+    gevent.spawn(runner.start, users, spawn_rate)
+    emit("load_changed", users=users, spawn_rate=spawn_rate, arrival_rate=arrival_rate)
+    return {"users": users, "spawn_rate": spawn_rate, "arrival_rate": arrival_rate}
+
+def handle(environment: Environment, conn: socket.socket) -> None:
+    with conn, conn.makefile("rwb") as stream:
+        try:
+            command = json.loads(stream.readline(MAX_COMMAND_BYTES))
+            if not isinstance(command, dict):
+                raise ValueError("Expected a JSON object")
+            reply = {"ok": True, **change_load(environment, command)}
+        except ValueError as e:  # json.JSONDecodeError is a ValueError too
+            reply = {"ok": False, "error": str(e)}
+        stream.write(json.dumps(reply).encode() + b"\n")
+        stream.flush()
+
+@events.init_command_line_parser.add_listener
+def _(parser: Any) -> None:
+    parser.add_argument("--control-socket", type=str, env_var="LOCUST_CONTROL_SOCKET", default="",
+                        help="Unix socket on which the load generator changes users and rates of the running test")
+
+@events.test_start.add_listener
+def _on_test_start(environment: Environment, **_: Any) -> None:
+    global server, socket_path
+    path = getattr(environment.parsed_options, "control_socket", "") if environment.parsed_options else ""
+    if not path or server is not None or isinstance(environment.runner, WorkerRunner):
+        return
+    if os.path.exists(path):
+        os.unlink(path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen()
+    server = StreamServer(listener, lambda conn, _: handle(environment, conn))
+    server.start()
+    socket_path = path
+
+@events.quit.add_listener
+def _on_quit(**_: Any) -> None:
+    if server is not None:
+        server.stop(timeout=1)
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
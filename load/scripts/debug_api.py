@@ -5,8 +5,12 @@ Debug script for querying the Locust Manager API.
 Usage:
     python debug_api.py status
     python debug_api.py start --users 100 --spawn-rate 10 --run-time 5m
-    python debug_api.py get
-    python debug_api.py stop
+    python debug_api.py get [--test-id ID]
+    python debug_api.py watch --test-id ID
+    python debug_api.py logs [--test-id ID] [--process worker-1] [--tail 100] [--follow]
+    python debug_api.py stop [--test-id ID]
+    python debug_api.py tag --test-id ID --tag baseline
+    python debug_api.py compare --baseline-tag baseline --candidate ID
 """
 
 import argparse
@@ -57,10 +61,12 @@ def processes() -> None:
             data = response.json()
             total = data.get("total_processes", 0)
             tracked_pids = data.get("tracked_pids", [])
+            tracked_test_ids = data.get("tracked_test_ids", [])
             processes_list = data.get("processes", [])
             
             print(f"Total Locust processes: {total}")
-            print(f"Tracked PIDs: {tracked_pids or 'None'}\n")
+            print(f"Tracked PIDs: {tracked_pids or 'None'}")
+            print(f"Tracked tests: {tracked_test_ids or 'None'}\n")
             
             if processes_list:
                 print("Process Details:")
@@ -76,13 +82,21 @@ def processes() -> None:
                     status_str = " | ".join(status_flags)
                     runtime_min = proc.get('runtime_seconds', 0) // 60
                     
-                    print(f"  PID {proc['pid']}: [{status_str}]")
-                    print(f"    Status: {proc.get('status', 'unknown')} | CPU: {proc.get('cpu_percent', 0)}% | MEM: {proc.get('memory_percent', 0)}%")
+                    print(f"  PID {proc['pid']}: [{status_str}]" + (f" test {proc['test_id']} {proc['process']}" if proc.get("test_id") else ""))
+                    print(f"    Status: {proc.get('status', 'unknown')} | CPU: {proc.get('cpu_percent')}% | MEM: {proc.get('memory_percent', 0)}% "
+                          f"({proc.get('memory_rss_mb')} MB) | Threads: {proc.get('num_threads')} | Connections: {proc.get('connections')}")
                     print(f"    Runtime: {runtime_min} min | Name: {proc.get('name', 'unknown')}")
                     print(f"    Command: {proc.get('command', 'N/A')}")
                     print()
             else:
                 print("✓ No Locust processes found")
+            
+            for test_id, test_ranges in data.get("ranges", {}).items():
+                print(f"\nRange during test {test_id}:")
+                for name, values in sorted(test_ranges.items()):
+                    print(f"  {name:10} " + " | ".join(
+                        f"{value} {span['min']}-{span['max']}" for value, span in values.items()
+                    ))
                 
     except requests.exceptions.RequestException as e:
         print(f"Error: {e}")
@@ -96,8 +110,9 @@ def start(
     host: str = "http://sut-gateway/",
     class_name: str = "BasicUser",
     workers: int = 1,
+    priority: int = 0,
 ) -> None:
-    """Start a load test."""
+    """Submit a load test, it starts as soon as the generator has free resources."""
     payload = {
         "users": users,
         "spawn_rate": spawn_rate,
@@ -105,6 +120,7 @@ def start(
         "host": host,
         "class_name": class_name,
         "workers": workers,
+        "priority": priority,
     }
     
     print(f"Starting load test with config:")
@@ -116,14 +132,12 @@ def start(
             json=payload,
             timeout=10,
         )
-        print_response(response, "Test Started")
+        print_response(response, "Test Submitted")
         
         if response.status_code == 200:
             data = response.json()
-            test_id = data.get("test_id")
-            pid = data.get("pid")
-            print(f"✓ Test ID: {test_id}")
-            print(f"✓ PID: {pid}")
+            print(f"✓ Test ID: {data.get('test_id')}")
+            print(f"✓ Status: {data.get('status')}")
         else:
             sys.exit(1)
     except requests.exceptions.RequestException as e:
@@ -131,39 +145,123 @@ def start(
         sys.exit(1)
 
 
-def get() -> None:
-    """Get active test config."""
+def get(test_id: str | None = None) -> None:
+    """Get one test, or list running, queued and finished tests."""
     try:
-        response = requests.get(f"{API_BASE_URL}/test", timeout=5)
-        
-        if response.status_code == 404:
-            print("No active test running")
+        if test_id:
+            response = requests.get(f"{API_BASE_URL}/test/{test_id}", timeout=5)
+            if response.status_code == 404:
+                print(f"Test {test_id} not found")
+                return
+            print_response(response, f"Test {test_id}")
             return
         
-        print_response(response, "Active Test")
+        response = requests.get(f"{API_BASE_URL}/test", timeout=5)
+        if response.status_code != 200:
+            print_response(response, "Tests")
+            sys.exit(1)
+        
+        data = response.json()
+        capacity = data.get("capacity", {})
+        print(f"\nCapacity: {capacity.get('cpus_free')}/{capacity.get('cpus_total')} CPUs free, "
+              f"{capacity.get('running')} running, {capacity.get('queued')} queued\n")
+        for section in ("running", "queued", "finished"):
+            tests = data.get(section, [])
+            print(f"{section.capitalize()} ({len(tests)}):")
+            for test in tests[:10]:
+                config = test.get("config", {})
+                print(f"  {test['test_id']}  [{test['status']}]  priority {test.get('priority', 0)}  "
+                      f"{config.get('users')} users x {config.get('workers', 1)} workers  CPUs {test.get('cpus') or '-'}")
+            print()
     except requests.exceptions.RequestException as e:
         print(f"Error: {e}")
         sys.exit(1)
 
 
-def stop() -> None:
-    """Stop active test."""
-    print("Stopping active test...")
+def watch(test_id: str) -> None:
+    """Follow a test's live stats until it finishes."""
+    endpoints: dict[tuple[str, str], dict] = {}
+    try:
+        with requests.get(f"{API_BASE_URL}/test/{test_id}/stream", stream=True, timeout=(5, 60)) as response:
+            if response.status_code != 200:
+                print_response(response, f"Watch {test_id}")
+                sys.exit(1)
+            
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                    continue
+                if not line.startswith("data: "):
+                    continue  # Blank separator or keep-alive comment
+                data = json.loads(line[len("data: "):])
+                
+                if event == "end":
+                    print(f"\n✓ Test {test_id} {data.get('status')} (exit code {data.get('exit_code')})")
+                    if data.get("error"):
+                        print(f"  Error: {data['error']}")
+                    return
+                
+                # Events only carry the endpoints that changed
+                for entry in data.get("endpoints", []):
+                    endpoints[(entry["method"], entry["name"])] = entry
+                total = data.get("total", {})
+                skipped = f"  ({data['skipped']} updates skipped)" if data.get("skipped") else ""
+                print(f"\n[{data.get('status')}] {data.get('users')} users"
+                      + (f", {data['workers']} workers" if "workers" in data else "")
+                      + f" | {total.get('rps', 0)} req/s, {total.get('fail_rps', 0)} fail/s"
+                      + f" | p50 {total.get('p50')} ms, p95 {total.get('p95')} ms, p99 {total.get('p99')} ms"
+                      + f" | {total.get('requests', 0)} requests (+{total.get('new_requests', 0)}), "
+                      + f"{total.get('failures', 0)} failures{skipped}")
+                for (method, name), entry in sorted(endpoints.items()):
+                    print(f"  {method:6} {name:40} {entry.get('rps', 0):>8} req/s  "
+                          f"p95 {entry.get('p95')} ms  {entry.get('failures', 0)} failures")
+    except requests.exceptions.RequestException as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
+
+def logs(test_id: str | None, process: str | None, tail: int, follow: bool) -> None:
+    """Print a test's Locust output, the latest test if no ID is given."""
+    url = f"{API_BASE_URL}/test/{test_id}/logs" if test_id else f"{API_BASE_URL}/test/logs"
+    params = {"tail": tail, "follow": follow}
+    if process:
+        params["process"] = process
+    try:
+        with requests.get(url, params=params, stream=True, timeout=(5, None if follow else 10)) as response:
+            if response.status_code != 200:
+                print_response(response, "Logs")
+                sys.exit(1)
+            for line in response.iter_lines(decode_unicode=True):
+                print(line)
+    except requests.exceptions.RequestException as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
+
+def stop(test_id: str | None = None) -> None:
+    """Stop one test, or every running and queued test."""
+    print(f"Stopping test {test_id}..." if test_id else "Stopping all tests...")
     
     try:
-        response = requests.delete(f"{API_BASE_URL}/test", timeout=5)
+        url = f"{API_BASE_URL}/test/{test_id}" if test_id else f"{API_BASE_URL}/test"
+        response = requests.delete(url, timeout=30)
         print_response(response, "Test Stopped")
         
         if response.status_code == 200:
             data = response.json()
             result = data.get("result", {})
             
-            if result.get("found"):
-                print(f"✓ Found and killed test process")
             if result.get("deleted"):
-                print(f"✓ Removed state file")
-            if not result.get("found"):
-                print(f"ℹ No active test was running")
+                print(f"✓ Stopped: {result.get('stopped', [test_id] if test_id else [])}")
+                if result.get("cancelled"):
+                    print(f"✓ Cancelled: {result['cancelled']}")
+            if not result.get("deleted"):
+                print(f"ℹ No running or queued test to stop")
         else:
             sys.exit(1)
     except requests.exceptions.RequestException as e:
@@ -216,6 +314,77 @@ def results(test_id: str | None = None) -> None:
         sys.exit(1)
 
 
+def tag(test_id: str, tag_name: str, remove: bool = False) -> None:
+    """Tag a finished test, e.g. as a comparison baseline, or remove the tag."""
+    try:
+        url = f"{API_BASE_URL}/results/{test_id}/tags/{tag_name}"
+        response = requests.delete(url, timeout=5) if remove else requests.put(url, timeout=5)
+        if response.status_code != 200:
+            print_response(response, "Tag")
+            sys.exit(1)
+        print(f"✓ {'Removed tag' if remove else 'Tagged'} {test_id} {'from' if remove else 'as'} {tag_name}")
+    except requests.exceptions.RequestException as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+def compare(
+    candidates: list[str],
+    baselines: list[str],
+    baseline_tag: str | None = None,
+    latency_threshold: float = 0.1,
+    throughput_threshold: float = 0.05,
+    error_threshold: float = 0.01,
+    alpha: float = 0.05,
+    min_requests: int = 100,
+) -> None:
+    """Compare candidate tests with a baseline, exits with 1 unless the verdict is pass (for CI gates)."""
+    params: dict[str, object] = {
+        "candidate": candidates,
+        "latency_threshold": latency_threshold,
+        "throughput_threshold": throughput_threshold,
+        "error_threshold": error_threshold,
+        "alpha": alpha,
+        "min_requests": min_requests,
+    }
+    if baseline_tag:
+        params["baseline_tag"] = baseline_tag
+    else:
+        params["baseline"] = baselines
+    
+    try:
+        response = requests.get(f"{API_BASE_URL}/results/compare", params=params, timeout=60)
+        if response.status_code != 200:
+            print_response(response, "Comparison")
+            sys.exit(1)
+        
+        data = response.json()
+        print(f"\nBaseline:  {', '.join(data['baseline'])}" + (f" (tag {baseline_tag})" if baseline_tag else ""))
+        print(f"Candidate: {', '.join(data['candidate'])}\n")
+        for endpoint in data["endpoints"]:
+            label = f"{endpoint['method']} {endpoint['name']}".strip()
+            if not endpoint["judged"]:
+                print(f"  {label}: too few requests {endpoint['requests']}")
+                continue
+            throughput = endpoint["throughput"]
+            line = f"  {label}: {throughput['baseline_rps']} -> {throughput['candidate_rps']} req/s"
+            for percentile, values in ((endpoint.get("latency") or {}).get("percentiles") or {}).items():
+                line += f", p{percentile} {values['baseline_ms']} -> {values['candidate_ms']} ms [{values['change']}]"
+            print(line)
+        
+        print()
+        for regression in data["regressions"]:
+            print(f"✗ {regression}")
+        for test_id in data.get("invalid_runs", []):
+            print(f"✗ Load generator saturated during {test_id}, its results are invalid")
+        print(f"{'✓' if data['verdict'] == 'pass' else '✗'} Verdict: {data['verdict'].upper()}")
+        if data["verdict"] != "pass":
+            sys.exit(1)
+    except requests.exceptions.RequestException as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
 def main() -> None:
     """Main entry point."""
     parser = argparse.ArgumentParser(
@@ -227,10 +396,18 @@ Examples:
   python debug_api.py processes
   python debug_api.py start --users 100 --spawn-rate 10 --run-time 5m
   python debug_api.py start --users 500 --spawn-rate 20 --run-time 10m --workers 4
+  python debug_api.py start --users 100 --priority 10
   python debug_api.py get
+  python debug_api.py get --test-id 12345678-1234-1234-1234-123456789abc
+  python debug_api.py watch --test-id 12345678-1234-1234-1234-123456789abc
+  python debug_api.py logs --follow
+  python debug_api.py logs --test-id 12345678-1234-1234-1234-123456789abc --process worker-1 --tail 500
   python debug_api.py results
   python debug_api.py results --test-id 12345678-1234-1234-1234-123456789abc
   python debug_api.py stop
+  python debug_api.py stop --test-id 12345678-1234-1234-1234-123456789abc
+  python debug_api.py tag --test-id 12345678-1234-1234-1234-123456789abc --tag baseline
+  python debug_api.py compare --baseline-tag baseline --candidate 12345678-1234-1234-1234-123456789abc
         """,
     )
     
@@ -250,17 +427,49 @@ Examples:
     start_parser.add_argument("--host", type=str, default="http://sut-gateway", help="Target host")
     start_parser.add_argument("--class-name", type=str, default="BasicUser", help="Locust user class")
     start_parser.add_argument("--workers", type=int, default=1, help="Number of workers for distributed mode")
+    start_parser.add_argument("--priority", type=int, default=0, help="Queue priority, higher starts first (default: 0)")
     
     # Get command
-    subparsers.add_parser("get", help="Get active test config")
+    get_parser = subparsers.add_parser("get", help="List tests, or get one test")
+    get_parser.add_argument("--test-id", type=str, default=None, help="Specific test ID (optional, lists all if omitted)")
+    
+    # Watch command
+    watch_parser = subparsers.add_parser("watch", help="Follow a test's live stats until it finishes")
+    watch_parser.add_argument("--test-id", type=str, required=True, help="Test ID to watch")
+    
+    # Logs command
+    logs_parser = subparsers.add_parser("logs", help="Print a test's Locust output")
+    logs_parser.add_argument("--test-id", type=str, default=None, help="Specific test ID (optional, latest test if omitted)")
+    logs_parser.add_argument("--process", type=str, default=None, help="Only this process, e.g. master or worker-1")
+    logs_parser.add_argument("--tail", type=int, default=100, help="Last lines to print (default: 100)")
+    logs_parser.add_argument("--follow", action="store_true", help="Keep printing new lines until the test finishes")
     
     # Stop command
-    subparsers.add_parser("stop", help="Stop active test")
+    stop_parser = subparsers.add_parser("stop", help="Stop a test, or all running and queued tests")
+    stop_parser.add_argument("--test-id", type=str, default=None, help="Specific test ID (optional, stops all if omitted)")
     
     # Results command
     results_parser = subparsers.add_parser("results", help="Get test results")
     results_parser.add_argument("--test-id", type=str, default=None, help="Specific test ID (optional, shows latest if omitted)")
     
+    # Tag command
+    tag_parser = subparsers.add_parser("tag", help="Tag a finished test, e.g. as a comparison baseline")
+    tag_parser.add_argument("--test-id", type=str, required=True, help="Test ID to tag")
+    tag_parser.add_argument("--tag", type=str, required=True, help="Tag name")
+    tag_parser.add_argument("--remove", action="store_true", help="Remove the tag instead")
+    
+    # Compare command
+    compare_parser = subparsers.add_parser("compare", help="Compare tests with a baseline, exits 1 unless they pass")
+    compare_parser.add_argument("--candidate", type=str, nargs="+", required=True, help="Candidate test ID(s)")
+    baseline_group = compare_parser.add_mutually_exclusive_group(required=True)
+    baseline_group.add_argument("--baseline", type=str, nargs="+", help="Baseline test ID(s)")
+    baseline_group.add_argument("--baseline-tag", type=str, help="Use the tests with this tag as baseline")
+    compare_parser.add_argument("--latency-threshold", type=float, default=0.1, help="Relative latency increase that fails (default: 0.1)")
+    compare_parser.add_argument("--throughput-threshold", type=float, default=0.05, help="Relative throughput decrease that fails (default: 0.05)")
+    compare_parser.add_argument("--error-threshold", type=float, default=0.01, help="Absolute error rate increase that fails (default: 0.01)")
+    compare_parser.add_argument("--alpha", type=float, default=0.05, help="Significance level (default: 0.05)")
+    compare_parser.add_argument("--min-requests", type=int, default=100, help="Requests an endpoint needs to be judged (default: 100)")
+    
     args = parser.parse_args()
     
     if not args.command:
@@ -279,13 +488,31 @@ Examples:
             host=args.host,
             class_name=args.class_name,
             workers=args.workers,
+            priority=args.priority,
         )
     elif args.command == "get":
-        get()
+        get(args.test_id)
+    elif args.command == "watch":
+        watch(args.test_id)
+    elif args.command == "logs":
+        logs(args.test_id, args.process, args.tail, args.follow)
     elif args.command == "stop":
-        stop()
+        stop(args.test_id)
     elif args.command == "results":
         results(args.test_id)
+    elif args.command == "tag":
+        tag(args.test_id, args.tag, args.remove)
+    elif args.command == "compare":
+        compare(
+            candidates=args.candidate,
+            baselines=args.baseline or [],
+            baseline_tag=args.baseline_tag,
+            latency_threshold=args.latency_threshold,
+            throughput_threshold=args.throughput_threshold,
+            error_threshold=args.error_threshold,
+            alpha=args.alpha,
+            min_requests=args.min_requests,
+        )
 
 
 if __name__ == "__main__":
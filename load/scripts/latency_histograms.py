@@ -0,0 +1,211 @@
+"""
+High-resolution latency histograms.
+
+Locust rounds response times into coarse buckets before it computes
+percentiles, and the percentiles in the --csv output are approximations on
+top of that. These HDR-style histograms keep every endpoint's response times
+with a fixed number of significant digits instead (--latency-precision,
+default 3: within 0.1% of the recorded value), in sparse log-linear buckets
+that can be added together exactly.
+
+Workers ship their buckets to the master with every stats report and start
+over, the master merges them, so a distributed test has the same precision
+as a single process. At exit the master (or single process) writes
+<csv prefix>_latency.json next to the CSV files: per endpoint and aggregated
+count, min, max, mean, percentiles up to p99.99 and the buckets themselves,
+so histograms of several tests can still be merged later.
+"""
+
+import bisect
+import itertools
+import json
+import math
+from typing import Any, Dict, Iterator, List, Tuple
+
+from locust import events
+from locust.env import Environment
+from locust.runners import WorkerRunner
+
+DEFAULT_PRECISION = 3
+PERCENTILES = (50.0, 90.0, 95.0, 99.0, 99.9, 99.99)
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of integer microsecond values.
+
+    Values below sub_bucket_count are counted exactly. Above that, each power
+    of two is split into sub_bucket_count / 2 buckets, so a bucket is never
+    wider than 10^-precision of the values it holds.
+    """
+
+    def __init__(self, precision: int = DEFAULT_PRECISION):
+        if not 1 <= precision <= 5:
+            raise ValueError(f"Latency precision must be 1 to 5 significant digits, got {precision}")
+        self.precision = precision
+        self.sub_bucket_bits = math.ceil(math.log2(2 * 10 ** precision))
+        self.sub_bucket_count = 1 << self.sub_bucket_bits
+        self.sub_bucket_half = self.sub_bucket_count // 2
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0  # Sum of recorded values, for an exact mean
+        self.min: int | None = None
+        self.max: int | None = None
+
+    def index(self, value: int) -> int:
+        if value < self.sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        return self.sub_bucket_count + (shift - 1) * self.sub_bucket_half + (value >> shift) - self.sub_bucket_half
+
+    def value_range(self, index: int) -> Tuple[int, int]:
+        """Lowest and highest value counted in a bucket."""
+        if index < self.sub_bucket_count:
+            return index, index
+        shift, sub_bucket = divmod(index - self.sub_bucket_count, self.sub_bucket_half)
+        shift += 1
+        lowest = (sub_bucket + self.sub_bucket_half) << shift
+        return lowest, lowest + (1 << shift) - 1
+
+    def record(self, value: int, count: int = 1) -> None:
+        value = max(0, value)
+        index = self.index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+        self.total += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """Add another histogram's counts. Buckets line up, so nothing is approximated."""
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge histograms of precision {other.precision} and {self.precision}")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def value_at_percentile(self, percentile: float) -> int | None:
+        """Highest value of the bucket holding the percentile, never above the recorded maximum."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(percentile / 100 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self.value_range(index)[1], self.max)  # type: ignore[type-var]
+        return self.max
+
+    def cumulative_counts(self, bounds: List[int]) -> List[int]:
+        """Counts of values at or below each of the sorted bounds (Prometheus "le" buckets), by bucket high value."""
+        counts = [0] * (len(bounds) + 1)
+        for index, count in self.counts.items():
+            counts[bisect.bisect_left(bounds, self.value_range(index)[1])] += count
+        return list(itertools.accumulate(counts[:-1]))
+
+    def encode(self) -> Dict[str, Any]:
+        """Compact form for worker reports and the results file: bucket indexes delta-encoded with counts."""
+        buckets: List[int] = []
+        previous = 0
+        for index in sorted(self.counts):
+            buckets += [index - previous, self.counts[index]]
+            previous = index
+        return {"precision": self.precision, "total": self.total, "min": self.min, "max": self.max, "buckets": buckets}
+
+    @classmethod
+    def decode(cls, data: Dict[str, Any]) -> "LatencyHistogram":
+        histogram = cls(data["precision"])
+        index = 0
+        buckets = data["buckets"]
+        for delta, count in zip(buckets[::2], buckets[1::2]):
+            index += delta
+            histogram.counts[index] = count
+            histogram.count += count
+        histogram.total, histogram.min, histogram.max = data["total"], data["min"], data["max"]
+        return histogram
+
+    def summary(self) -> Dict[str, Any]:
+        """Count and latencies in milliseconds."""
+        def ms(value: float | None) -> float | None:
+            return round(value / 1000, 3) if value is not None else None
+        return {
+            "count": self.count,
+            "min_ms": ms(self.min),
+            "max_ms": ms(self.max),
+            "mean_ms": ms(self.total / self.count) if self.count else None,
+            "percentiles_ms": {f"{p:g}": ms(self.value_at_percentile(p)) for p in PERCENTILES},
+        }
+
+# Histograms of this process by (method, name)
+histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+env: Environment | None = None
+
+def precision() -> int:
+    """Precision from the options, workers get them from the master with every spawn message."""
+    options = env.parsed_options if env else None
+    return getattr(options, "latency_precision", DEFAULT_PRECISION) if options else DEFAULT_PRECISION
+
+def histogram_for(method: str, name: str, digits: int) -> LatencyHistogram:
+    histogram = histograms.get((method, name))
+    if histogram is None or histogram.precision != digits:
+        histogram = histograms[(method, name)] = LatencyHistogram(digits)
+    return histogram
+
+def aggregated() -> LatencyHistogram:
+    total = LatencyHistogram(precision())
+    for histogram in histograms.values():
+        if histogram.precision == total.precision:
+            total.merge(histogram)
+    return total
+
+def entries() -> Iterator[Dict[str, Any]]:
+    for (method, name), histogram in sorted(histograms.items()):
+        yield {"type": method, "name": name, **histogram.summary(), "histogram": histogram.encode()}
+    total = aggregated()
+    yield {"type": "", "name": "Aggregated", **total.summary(), "histogram": total.encode()}
+
+@events.init_command_line_parser.add_listener
+def _(parser: Any) -> None:
+    parser.add_argument("--latency-precision", type=int, env_var="LOCUST_LATENCY_PRECISION", default=DEFAULT_PRECISION,
+                        help="Significant digits kept by the latency histograms (1 to 5)")
+
+@events.init.add_listener
+def _on_init(environment: Environment, **_: Any) -> None:
+    global env
+    env = environment
+
+@events.request.add_listener
+def _on_request(request_type: str, name: str, response_time: float, **_: Any) -> None:
+    if response_time is not None:
+        histogram_for(request_type, name, precision()).record(round(response_time * 1000))
+
+@events.report_to_master.add_listener
+def _on_report_to_master(client_id: str, data: Dict[str, Any]) -> None:
+    # Like Locust's own stats, workers send what they recorded since the last report
+    data["latency_histograms"] = [
+        [method, name, histogram.encode()] for (method, name), histogram in histograms.items() if histogram.count
+    ]
+    histograms.clear()
+
+@events.worker_report.add_listener
+def _on_worker_report(client_id: str, data: Dict[str, Any]) -> None:
+    for method, name, encoded in data.get("latency_histograms", []):
+        report = LatencyHistogram.decode(encoded)
+        histogram_for(method, name, report.precision).merge(report)
+
+@events.reset_stats.add_listener
+def _on_reset_stats() -> None:
+    histograms.clear()
+
+@events.quit.add_listener
+def _on_quit(**_: Any) -> None:
+    # Fired after the master received the workers' final reports
+    options = env.parsed_options if env else None
+    if options is None or not options.csv_prefix or isinstance(env.runner, WorkerRunner):  # type: ignore[union-attr]
+        return
+    with open(f"{options.csv_prefix}_latency.json", "w") as f:
+        json.dump({"precision": precision(), "unit": "us", "entries": list(entries())}, f)
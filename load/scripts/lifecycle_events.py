@@ -0,0 +1,46 @@
+"""
+Lifecycle events for the load generator.
+
+The load generator runs Locust as a subprocess and follows its output.
+Instead of sleeping and hoping the master is up and the workers connected,
+it waits for these events: one line per event on stdout, EVENT_PREFIX
+followed by a JSON object.
+
+    master_ready      master is bound and accepting workers
+    worker_connected  a worker connected to the master (can repeat for the same worker)
+    test_start        load generation started (master or single process)
+
+Running Locust by hand prints the same lines, they are harmless there.
+"""
+
+import sys
+import json
+from typing import Any
+
+from locust import events
+from locust.env import Environment
+from locust.runners import MasterRunner, WorkerRunner
+
+# Must match EVENT_PREFIX in load/generator/lifecycle.py
+EVENT_PREFIX = "OBSERVASTACK_EVENT "
+
+def emit(event: str, **fields: Any) -> None:
+    sys.stdout.write(EVENT_PREFIX + json.dumps({"event": event, **fields}) + "\n")
+    sys.stdout.flush()
+
+@events.init.add_listener
+def _on_init(environment: Environment, **_: Any) -> None:
+    runner = environment.runner
+    if not isinstance(runner, MasterRunner):
+        return
+    # The master binds its port when the runner is created, before init fires
+    emit("master_ready", port=runner.master_bind_port)
+
+    @environment.events.worker_connect.add_listener
+    def _on_worker_connect(client_id: str, **_: Any) -> None:
+        emit("worker_connected", worker=client_id)
+
+@events.test_start.add_listener
+def _on_test_start(environment: Environment, **_: Any) -> None:
+    if not isinstance(environment.runner, WorkerRunner):
+        emit("test_start")
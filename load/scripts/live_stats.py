@@ -0,0 +1,97 @@
+"""
+Live stats for the load generator.
+
+On the master (or a single-process run) a greenlet reports a stats snapshot
+every --live-stats-interval seconds as a "stats" lifecycle event, which the
+load generator streams to clients while the test runs.
+
+Snapshots carry cumulative request and failure counts per endpoint, so the
+generator can compute deltas for each consumer, plus current RPS and response
+time percentiles over Locust's sliding window (10 s). Endpoints also carry
+cumulative latency bucket counts taken from the high-resolution histograms
+(latency_histograms.py), which the generator exports to Prometheus, and the
+load of the test's own Locust processes (saturation.py). Workers report to
+the master as usual and emit nothing.
+"""
+
+from typing import Any, Dict
+
+import gevent
+from locust import events
+from locust.env import Environment
+from locust.runners import MasterRunner, WorkerRunner
+from locust.stats import StatsEntry
+
+import latency_histograms
+import saturation
+from lifecycle_events import emit
+
+PERCENTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
+
+# Upper bounds of the exported latency buckets, the SUT's http_request_duration_ms buckets so both sides line up
+LATENCY_BUCKETS_MS = [x * 10 for x in range(1, 10)] + [x * 100 for x in range(1, 11)] + [1000 + x * 250 for x in range(1, 41)]
+LATENCY_BUCKETS_US = [bound * 1000 for bound in LATENCY_BUCKETS_MS]
+
+@events.init_command_line_parser.add_listener
+def _(parser: Any) -> None:
+    parser.add_argument("--live-stats-interval", type=float, env_var="LOCUST_LIVE_STATS_INTERVAL", default=1.0,
+                        help="Seconds between live stats events for the load generator (0 disables them)")
+
+def describe(entry: StatsEntry) -> Dict[str, Any]:
+    """Counts, rates and latency of one stats entry."""
+    summary: Dict[str, Any] = {
+        "requests": entry.num_requests,
+        "failures": entry.num_failures,
+        "rps": round(entry.current_rps, 2),
+        "fail_rps": round(entry.current_fail_per_sec, 2),
+        "avg_ms": round(entry.avg_response_time, 2),
+    }
+    for label, percent in PERCENTILES.items():
+        # Sliding window percentile, cumulative until the window has filled
+        current = entry.get_current_response_time_percentile(percent) if entry.use_response_times_cache else None
+        summary[label] = current if current is not None else entry.get_response_time_percentile(percent)
+    return summary
+
+def latency_buckets(method: str, name: str) -> Dict[str, Any]:
+    """Cumulative bucket counts and sum of an endpoint's latency histogram, merged from all workers on the master."""
+    histogram = latency_histograms.histograms.get((method, name))
+    if histogram is None or not histogram.count:
+        return {}
+    return {
+        "latency_buckets": histogram.cumulative_counts(LATENCY_BUCKETS_US),
+        "latency_count": histogram.count,
+        "latency_sum_ms": round(histogram.total / 1000, 3),
+    }
+
+def snapshot(environment: Environment) -> Dict[str, Any]:
+    runner = environment.runner
+    assert runner is not None
+    stats = environment.stats
+    result: Dict[str, Any] = {
+        "state": runner.state,
+        "users": runner.user_count,
+        "total": describe(stats.total),
+        "endpoints": [
+            {"name": name, "method": method, **describe(entry), **latency_buckets(method, name)}
+            for (name, method), entry in stats.entries.items()
+        ],
+        "latency_bounds_ms": LATENCY_BUCKETS_MS,
+        "generator": saturation.snapshot(environment),
+    }
+    if isinstance(runner, MasterRunner):
+        result["workers"] = len(runner.clients.ready + runner.clients.spawning + runner.clients.running)
+    return result
+
+def report(environment: Environment, interval: float) -> None:
+    while True:
+        gevent.sleep(interval)
+        emit("stats", **snapshot(environment))
+
+@events.test_start.add_listener
+def _on_test_start(environment: Environment, **_: Any) -> None:
+    options = environment.parsed_options
+    interval = getattr(options, "live_stats_interval", 1.0) if options else 1.0
+    if isinstance(environment.runner, WorkerRunner) or interval <= 0:
+        return
+    greenlet = gevent.spawn(report, environment, interval)
+    environment.events.test_stop.add_listener(lambda **_: greenlet.kill(block=False))
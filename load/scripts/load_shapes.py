@@ -0,0 +1,218 @@
+"""
+Multi-stage load profiles.
+
+A separate locustfile holding ProfileShape, the LoadTestShape that runs the
+stages of a --load-profile file. Locust uses a shape for every test of a
+locustfile that defines one, so the load generator only adds this file
+(-f loadtest.py,load_shapes.py) when a test has a profile. Workers do not
+need it, the master drives the user count.
+
+    {
+      "spawn_rate": 10,
+      "stages": [
+        {"type": "step", "users": 50, "duration": "2m", "name": "baseline"},
+        {"type": "ramp", "users": 200, "duration": "5m"},
+        {"type": "spike", "users": 1000, "duration": "30s"},
+        {"type": "sine", "min_users": 100, "max_users": 300, "period": "2m", "duration": "10m"},
+        {"type": "soak", "users": 150, "duration": "2h"}
+      ]
+    }
+
+    step, soak  go to users at spawn_rate (stage or profile default) and hold
+    ramp        linear ramp from the previous stage's users to users over the duration
+    spike       jump to users within a second (unless spawn_rate is given) and hold
+    sine        oscillate between min_users and max_users with the given period
+
+Durations are seconds or Locust timespans ("90s", "5m", "1h30m"). The test
+ends after the last stage.
+
+Every stage transition is printed as a lifecycle "stage" event, and the
+stages are written to <csv_prefix>_stages.json at the end with their
+boundaries and per-stage statistics (requests, failures, RPS, latency
+percentiles, overall and per endpoint). Statistics are the difference of
+Locust's cumulative stats at the stage boundaries. In distributed mode
+workers report every few seconds, so requests near a boundary may count
+toward the next stage. The raw sample log (sample_log.py) has exact
+timestamps for finer cuts.
+"""
+
+import json
+import math
+import time
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+from locust import LoadTestShape, events
+from locust.env import Environment
+from locust.runners import WorkerRunner
+from locust.stats import StatsEntry, calculate_response_time_percentile
+from locust.util.timespan import parse_timespan
+
+from lifecycle_events import emit
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+def seconds(value: Any) -> float:
+    return float(value) if isinstance(value, (int, float)) else float(parse_timespan(str(value)))
+
+class Stage:
+    """One stage of a profile and the user count it asks for over its duration."""
+
+    def __init__(self, spec: Dict[str, Any], index: int, start_users: int, default_rate: float):
+        self.index = index
+        self.type = spec.get("type", "step")
+        self.name = spec.get("name") or f"{index + 1}-{self.type}"
+        self.duration = seconds(spec["duration"])
+        self.start_users = start_users
+        if self.type in ("step", "soak", "spike", "ramp"):
+            self.users = int(spec["users"])
+        elif self.type == "sine":
+            self.min_users, self.max_users = int(spec["min_users"]), int(spec["max_users"])
+            self.period = seconds(spec["period"])
+            self.users = self.users_at(self.duration)
+        else:
+            raise ValueError(f"Unknown stage type {self.type}")
+        if self.duration <= 0:
+            raise ValueError(f"Stage {self.name} needs a positive duration")
+        if self.type == "spike":
+            self.spawn_rate = float(spec.get("spawn_rate") or max(abs(self.users - start_users), 1))
+        elif self.type == "ramp":
+            self.spawn_rate = max(abs(self.users - start_users) / self.duration, 0.1)
+        elif self.type == "sine":
+            # Steepest slope of the wave, so the user count can follow it
+            self.spawn_rate = max((self.max_users - self.min_users) * math.pi / self.period, 1.0)
+        else:
+            self.spawn_rate = float(spec.get("spawn_rate") or default_rate)
+
+    def users_at(self, elapsed: float) -> int:
+        if self.type != "sine":
+            return self.users
+        middle, amplitude = (self.max_users + self.min_users) / 2, (self.max_users - self.min_users) / 2
+        return round(middle + amplitude * math.sin(2 * math.pi * elapsed / self.period))
+
+def load_profile(path: str) -> List[Stage]:
+    with open(path) as f:
+        profile = json.load(f)
+    stages: List[Stage] = []
+    for index, spec in enumerate(profile.get("stages") or []):
+        stages.append(Stage(spec, index, stages[-1].users if stages else 0, float(profile.get("spawn_rate", 1))))
+    if not stages:
+        raise ValueError(f"Load profile {path} has no stages")
+    return stages
+
+env: Environment | None = None
+
+@events.init_command_line_parser.add_listener
+def _(parser: Any) -> None:
+    parser.add_argument("--load-profile", type=str, env_var="LOCUST_LOAD_PROFILE", default="",
+                        help="Load profile (JSON file with stages) run by ProfileShape")
+
+@events.init.add_listener
+def _on_init(environment: Environment, **_: Any) -> None:
+    global env
+    env = environment
+    options = environment.parsed_options
+    if options is not None and not isinstance(environment.runner, WorkerRunner):
+        if not options.load_profile:
+            raise ValueError("ProfileShape needs a load profile (--load-profile)")
+        load_profile(options.load_profile)  # Fail before the test starts
+
+def snapshot(entry: StatsEntry) -> Tuple[int, int, float, Counter[int]]:
+    return entry.num_requests, entry.num_failures, entry.total_response_time, Counter(entry.response_times)
+
+def stage_stats(entry: StatsEntry, before: Tuple[int, int, float, Counter[int]] | None, duration: float) -> Dict[str, Any]:
+    """Statistics of the requests an entry recorded since the snapshot taken before the stage."""
+    requests, failures, total_time, response_times = snapshot(entry)
+    if before is not None:
+        requests, failures, total_time = requests - before[0], failures - before[1], total_time - before[2]
+        response_times = response_times - before[3]
+    stats: Dict[str, Any] = {
+        "requests": requests,
+        "failures": failures,
+        "rps": round(requests / duration, 2) if duration > 0 else None,
+        "avg_ms": round(total_time / requests, 2) if requests else None,
+    }
+    for percentile in PERCENTILES:
+        stats[f"p{percentile * 100:g}_ms"] = (
+            calculate_response_time_percentile(response_times, requests, percentile) if requests else None
+        )
+    return stats
+
+class ProfileShape(LoadTestShape):
+    """Runs the stages of --load-profile and records per-stage statistics."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.stages: List[Stage] | None = None
+        self.current: Stage | None = None
+        self.stage_started = 0.0
+        self.snapshots: Dict[Tuple[str, str], Tuple[int, int, float, Counter[int]]] = {}
+        self.results: List[Dict[str, Any]] = []
+        self.ended_at: float | None = None
+
+    def tick(self) -> Tuple[int, float] | None:
+        if self.stages is None:
+            self.stages = load_profile(self.runner.environment.parsed_options.load_profile)  # type: ignore[union-attr]
+        run_time = self.get_run_time()
+        stage_start = 0.0
+        for stage in self.stages:
+            if run_time < stage_start + stage.duration:
+                if stage is not self.current:
+                    self.begin_stage(stage)
+                return stage.users_at(run_time - stage_start), stage.spawn_rate
+            stage_start += stage.duration
+        # Past the last stage, its statistics are taken at quit once the last worker reports are in
+        if self.ended_at is None:
+            self.ended_at = time.time()
+        return None
+
+    def begin_stage(self, stage: Stage) -> None:
+        now = time.time()
+        if self.current is not None:
+            self.end_stage(now)
+        self.current, self.stage_started = stage, now
+        stats = self.runner.stats  # type: ignore[union-attr]
+        self.snapshots = {key: snapshot(entry) for key, entry in stats.entries.items()}
+        self.snapshots[("", "Aggregated")] = snapshot(stats.total)
+        emit("stage", index=stage.index, name=stage.name, type=stage.type, users=stage.users)
+        logger.info(f"Load profile stage {stage.name} ({stage.type}, {stage.users} users, {stage.duration:g}s)")
+
+    def end_stage(self, ended: float) -> None:
+        stage = self.current
+        assert stage is not None
+        stats = self.runner.stats  # type: ignore[union-attr]
+        duration = ended - self.stage_started
+        self.results.append({
+            "index": stage.index,
+            "name": stage.name,
+            "type": stage.type,
+            "start_users": stage.start_users,
+            "users": stage.users,
+            "started_at": round(self.stage_started, 3),
+            "ended_at": round(ended, 3),
+            "duration_s": round(duration, 3),
+            "total": stage_stats(stats.total, self.snapshots.get(("", "Aggregated")), duration),
+            "endpoints": [
+                {"method": method, "name": name, **stage_stats(entry, self.snapshots.get((name, method)), duration)}
+                for (name, method), entry in sorted(stats.entries.items())
+                if entry.num_requests > self.snapshots.get((name, method), (0,))[0]
+            ],
+        })
+        self.current = None
+
+    def write_results(self, csv_prefix: str | None) -> None:
+        if self.current is not None:
+            self.end_stage(self.ended_at or time.time())
+        if csv_prefix and self.results:
+            with open(f"{csv_prefix}_stages.json", "w") as f:
+                json.dump({"stages": self.results}, f, indent=2)
+
+@events.quit.add_listener
+def _on_quit(**_: Any) -> None:
+    # After the master waited for the workers' final reports
+    shape = env.shape_class if env else None
+    if isinstance(shape, ProfileShape) and env.parsed_options is not None:  # type: ignore[union-attr]
+        shape.write_results(env.parsed_options.csv_prefix)  # type: ignore[union-attr]
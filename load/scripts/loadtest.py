@@ -1,13 +1,29 @@
-from locust import FastHttpUser, task, between
+from locust import events, task, between
 import urllib3
 import os
 
+import lifecycle_events  # noqa: F401 (registers the lifecycle event listeners)
+import live_stats  # noqa: F401 (reports live stats to the load generator)
+import latency_histograms  # noqa: F401 (records high-resolution latency histograms)
+import saturation  # noqa: F401 (measures the load of the Locust processes themselves)
+import control  # noqa: F401 (lets the load generator change users and rates of a running test)
+import sample_log  # noqa: F401 (records raw per-request samples when --sample-log is set)
+from open_loop import OpenLoopUser
+from workload import WorkloadUser  # noqa: F401 (runs the test's declarative workload spec)
+from replay import ReplayUser  # noqa: F401 (replays captured traffic)
+
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # Allow host to be configured via environment variable
 DEFAULT_HOST = os.getenv("LOCUST_HOST", "http://localhost")
 
-class BasicUser(FastHttpUser):
+@events.init_command_line_parser.add_listener
+def _(parser):
+    """Custom arguments, forwarded by the master to workers when the test starts."""
+    parser.add_argument("--test-run-id", type=str, env_var="LOCUST_TEST_RUN_ID", default=None,
+                        help="ID of the test run, sent to the SUT in the X-Test-Run-Id header")
+
+class BasicUser(OpenLoopUser):
     """User class for equal weighted testing of each endpoint simulating a wide range of different request patterns."""
     wait_time = between(0.9, 1.1)
     host = DEFAULT_HOST
@@ -87,7 +103,7 @@ class BasicUser(FastHttpUser):
                 response.failure(f"Got status code {response.status_code}")
 
 
-class LowIOUser(FastHttpUser):
+class LowIOUser(OpenLoopUser):
     """User class for low I/O operations testing of status/basic/delay endpoints."""
     wait_time = between(0.9, 1.1)
     host = DEFAULT_HOST
@@ -139,7 +155,7 @@ class LowIOUser(FastHttpUser):
             else:
                 response.failure(f"Expected 404, got {response.status_code}")
 
-class HighIOUser(FastHttpUser):
+class HighIOUser(OpenLoopUser):
     """User class for high I/O operations testing of status/code/delay endpoints."""
     wait_time = between(0.9, 1.1)
     host = DEFAULT_HOST
@@ -0,0 +1,200 @@
+"""
+Open-loop load model with coordinated-omission correction.
+
+Closed-loop users send their next request only after the previous response
+and a wait, so a slow SUT lowers the offered load and hides its own latency
+(coordinated omission). With --arrival-rate set, OpenLoopUser subclasses
+switch to an open loop instead: every user follows its own arrival schedule
+and starts each task in a separate greenlet at its scheduled time, whether
+or not earlier requests have returned. The test's users only split the
+target rate between them (each runs at arrival_rate / users), so a higher
+user count means more independent schedules, not more load. When the rate or
+user count changes while the test runs (see control.py), every user starts
+a new schedule at its next arrival.
+
+Inter-arrival times are fixed (evenly spaced, random phase per user),
+poisson (exponential gaps) or trace (gaps replayed from --arrival-trace, one
+gap in seconds per line, rescaled to --arrival-rate if given).
+
+The first request of every task is reported with its latency measured from
+the intended send time, not from when it was actually sent. When the
+generator falls behind, because greenlets queue for CPU or all
+--max-in-flight slots are busy, the wait counts as latency instead of
+disappearing from the results.
+"""
+
+import time
+import random
+import logging
+from itertools import cycle
+from typing import Any, Dict, Iterator
+
+import gevent
+from gevent.pool import Pool
+from greenlet import greenlet as Greenlet
+from locust import events
+from locust.env import Environment
+from locust.exception import StopTest, StopUser
+from locust.runners import WorkerRunner
+from locust.user.task import DefaultTaskSet
+from locust.user.users import LOCUST_STATE_RUNNING, LOCUST_STATE_STOPPING
+
+from client_tracing import TracedHttpUser
+
+logger = logging.getLogger(__name__)
+
+DISTRIBUTIONS = ("fixed", "poisson", "trace")
+LAG_WARNING_MS = 100  # Send delay that means the generator could not keep up with the schedule
+
+# Intended start times of arrivals whose first request has not been reported yet, by greenlet
+intended_starts: Dict[Greenlet, float] = {}
+in_flight: Pool | None = None
+max_send_delay_ms = 0.0
+
+@events.init_command_line_parser.add_listener
+def _(parser: Any) -> None:
+    parser.add_argument("--arrival-rate", type=float, env_var="LOCUST_ARRIVAL_RATE", default=0.0,
+                        help="Open loop: target requests per second for the whole test (0 keeps users closed-loop)")
+    parser.add_argument("--arrival-distribution", type=str, env_var="LOCUST_ARRIVAL_DISTRIBUTION", default="poisson",
+                        choices=DISTRIBUTIONS, help="Open loop: inter-arrival times")
+    parser.add_argument("--arrival-trace", type=str, env_var="LOCUST_ARRIVAL_TRACE", default="",
+                        help="Open loop: file with one inter-arrival time in seconds per line (trace distribution)")
+    parser.add_argument("--max-in-flight", type=int, env_var="LOCUST_MAX_IN_FLIGHT", default=1000,
+                        help="Open loop: concurrent requests per Locust process before arrivals wait")
+    # Set by the master from --users, workers need the test's total to take their share of the rate
+    parser.add_argument("--arrival-users", type=int, default=0, include_in_web_ui=False, help="")
+
+@events.init.add_listener
+def _on_init(environment: Environment, **_: Any) -> None:
+    options = environment.parsed_options
+    if options is not None and not isinstance(environment.runner, WorkerRunner):
+        options.arrival_users = options.num_users or 0
+
+@events.test_start.add_listener
+def _on_test_start(**_: Any) -> None:
+    global max_send_delay_ms
+    max_send_delay_ms = 0.0
+
+@events.test_stop.add_listener
+def _on_test_stop(**_: Any) -> None:
+    # Arrivals run outside the users' greenlets, stop them with the users
+    if in_flight is not None:
+        in_flight.kill(block=False)
+    if max_send_delay_ms >= LAG_WARNING_MS:
+        logger.warning(f"Open-loop arrivals were sent up to {max_send_delay_ms:.0f} ms late, the generator could "
+                       f"not keep up with the schedule (latencies include the delay)")
+
+def trace_gaps(path: str) -> list[float]:
+    with open(path) as f:
+        gaps = [float(line) for line in f if line.strip() and not line.lstrip().startswith("#")]
+    if not gaps or min(gaps) < 0 or sum(gaps) == 0:
+        raise ValueError(f"Arrival trace {path} needs non-negative inter-arrival times")
+    return gaps
+
+def poisson_gaps(rate: float) -> Iterator[float]:
+    while True:
+        yield random.expovariate(rate)
+
+def arrival_gaps(options: Any, users: int) -> Iterator[float]:
+    """Gaps between one user's arrivals, the users' schedules add up to the target rate."""
+    rate = options.arrival_rate / users if options.arrival_rate > 0 else 0.0
+    if options.arrival_distribution == "trace":
+        gaps = trace_gaps(options.arrival_trace)
+        # Scale the trace to the target rate, or keep its own rate, split over the users
+        mean_gap = sum(gaps) / len(gaps)
+        scale = users / (mean_gap * options.arrival_rate) if options.arrival_rate > 0 else users
+        start = random.randrange(len(gaps))  # Users replay the trace from different points
+        return (gap * scale for gap in cycle(gaps[start:] + gaps[:start]))
+    if options.arrival_distribution == "fixed":
+        return cycle([1 / rate])
+    return poisson_gaps(rate)
+
+class CorrectedRequestEvent:
+    """Stands in for the session's request event, reporting an arrival's first request from its intended start."""
+
+    def __init__(self, event: Any):
+        self.event = event
+
+    def fire(self, **kwargs: Any) -> None:
+        global max_send_delay_ms
+        intended = intended_starts.pop(gevent.getcurrent(), None)
+        if intended is not None and kwargs.get("start_time") is not None:
+            send_delay_ms = max(0.0, (kwargs["start_time"] - intended) * 1000)
+            max_send_delay_ms = max(max_send_delay_ms, send_delay_ms)
+            kwargs["response_time"] = (kwargs.get("response_time") or 0) + send_delay_ms
+            kwargs["start_time"] = intended
+            kwargs["context"] = {**(kwargs.get("context") or {}), "send_delay_ms": round(send_delay_ms, 3)}
+        self.event.fire(**kwargs)
+
+class OpenLoopTaskSet(DefaultTaskSet):
+    """Starts the user's tasks at scheduled arrival times without waiting for them to finish."""
+
+    def __init__(self, parent: Any) -> None:
+        super().__init__(parent)
+        self.schedule = self.current_schedule()
+        self.gaps = arrival_gaps(self.user.environment.parsed_options, self.schedule[1])
+        # Random phase, users spawned together must not send together
+        self.next_arrival = time.time() + next(self.gaps) * random.random()
+
+    def current_schedule(self) -> tuple[float, int]:
+        """Target rate and user count the schedule is split by."""
+        options = self.user.environment.parsed_options
+        runner = self.user.environment.runner
+        return options.arrival_rate, options.arrival_users or getattr(runner, "target_user_count", 0) or 1
+
+    def execute_task(self, task: Any) -> None:
+        if self.current_schedule() != self.schedule:
+            self.schedule = self.current_schedule()
+            self.gaps = arrival_gaps(self.user.environment.parsed_options, self.schedule[1])
+        intended = self.next_arrival
+        self.next_arrival += next(self.gaps)
+        delay = intended - time.time()
+        if delay > 0:
+            self._sleep(delay)
+        if self.user._state == LOCUST_STATE_STOPPING:
+            raise StopUser()
+        assert in_flight is not None
+        # Blocks while every slot is busy, the schedule keeps its intended times
+        in_flight.spawn(self.run_arrival, task, intended)
+
+    def run_arrival(self, task: Any, intended: float) -> None:
+        intended_starts[gevent.getcurrent()] = intended
+        try:
+            super().execute_task(task)
+        except Exception as e:
+            self.user.environment.events.user_error.fire(user_instance=self.user, exception=e, tb=e.__traceback__)
+        finally:
+            intended_starts.pop(gevent.getcurrent(), None)
+
+    def wait(self) -> None:
+        # Pacing comes from the arrival schedule
+        if self.user._state == LOCUST_STATE_STOPPING:
+            raise StopUser()
+
+class OpenLoopUser(TracedHttpUser):
+    """TracedHttpUser that runs closed-loop by default and open-loop when --arrival-rate is set."""
+    abstract = True
+
+    def __init__(self, environment: Any) -> None:
+        global in_flight
+        super().__init__(environment)
+        options = environment.parsed_options
+        self.open_loop = bool(options) and (
+            options.arrival_rate > 0 or (options.arrival_distribution == "trace" and bool(options.arrival_trace))
+        )
+        if self.open_loop:
+            if in_flight is None:
+                in_flight = Pool(options.max_in_flight)
+            self.client.request_event = CorrectedRequestEvent(self.client.request_event)
+
+    def run(self) -> None:
+        if not self.open_loop:
+            return super().run()
+        # Same as User.run, with the open-loop task set
+        self._state = LOCUST_STATE_RUNNING
+        self._taskset_instance = OpenLoopTaskSet(self)
+        try:
+            self.on_start()
+            self._taskset_instance.run()
+        except (gevent.GreenletExit, StopUser, StopTest):
+            self.on_stop()
@@ -0,0 +1,162 @@
+"""
+Replay of captured traffic.
+
+ReplayUser sends the requests of a capture file (--replay, written by
+capture.py) in their recorded order and timing instead of a synthetic mix.
+A capture is JSON lines, optionally gzipped, one request per line:
+
+    {"t": 0.0, "method": "GET", "path": "/api/delay/100", "name": "/api/delay/{n}", "status": 200}
+
+t is the request's offset in seconds from the start of the capture, name
+groups the request in the stats (default path) and status is the recorded
+status code.
+
+Timing: recorded offsets divided by --replay-speed (2 replays twice as fast),
+or with --replay-rate evenly spaced at that many requests per second for the
+whole test. The capture restarts from the beginning when it runs out, unless
+--replay-once is set.
+
+Distribution: in distributed mode each worker replays every Nth request of
+the capture (N = expected workers), so the workers together send the whole
+stream at the original rate. Within a process, users take the next request
+in order and wait for its scheduled time, so --users caps the requests in
+flight per process. Requests that could not be sent on time because every
+user was busy are reported with latency from their scheduled time (see
+open_loop.py), a burst the generator cannot keep up with shows up in the
+tail instead of being smoothed away.
+"""
+
+import gzip
+import json
+import time
+import logging
+from typing import Any, Dict, List, Tuple
+
+import gevent
+from locust import constant, events, task
+from locust.env import Environment
+from locust.exception import StopUser
+from locust.runners import WorkerRunner
+
+import open_loop
+from client_tracing import TracedHttpUser
+from open_loop import CorrectedRequestEvent
+
+logger = logging.getLogger(__name__)
+
+def read_capture(path: str) -> List[Dict[str, Any]]:
+    """A capture's requests ordered by offset."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as f:  # type: ignore[operator]
+        entries = [json.loads(line) for line in f if line.strip()]
+    if not entries:
+        raise ValueError(f"Capture {path} has no requests")
+    entries.sort(key=lambda entry: entry["t"])
+    return entries
+
+class Replay:
+    """The share of a capture replayed by one process, with the schedule shared by its users."""
+
+    def __init__(self, options: Any, process_index: int, processes: int):
+        entries = read_capture(options.replay)
+        first = entries[0]["t"]
+        # Mean gap after the last request, so a looped capture does not send its ends back to back
+        span = entries[-1]["t"] - first
+        self.cycle_s = span + span / max(len(entries) - 1, 1) if span > 0 else 1.0
+        self.entries: List[Tuple[float, Dict[str, Any]]] = [
+            (entry["t"] - first, entry) for entry in entries[process_index::processes]
+        ]
+        if not self.entries:
+            raise ValueError(f"Capture {options.replay} has fewer requests than Locust processes")
+        self.speed = options.replay_speed
+        self.interval_s = processes / options.replay_rate if options.replay_rate > 0 else 0.0
+        self.once = options.replay_once
+        self.started = 0.0
+        self.sent = 0
+
+    def next(self) -> Tuple[float, Dict[str, Any]] | None:
+        """The next request and the time it is scheduled for, None once a single pass is done."""
+        if not self.started:
+            self.started = time.time()
+        loop, position = divmod(self.sent, len(self.entries))
+        if loop and self.once:
+            return None
+        self.sent += 1
+        offset, entry = self.entries[position]
+        if self.interval_s:
+            return self.started + (self.sent - 1) * self.interval_s, entry
+        return self.started + (loop * self.cycle_s + offset) / self.speed, entry
+
+replay: Replay | None = None
+
+@events.init_command_line_parser.add_listener
+def _(parser: Any) -> None:
+    parser.add_argument("--replay", type=str, env_var="LOCUST_REPLAY", default="",
+                        help="Capture file (JSON lines, optionally gzipped) replayed by ReplayUser")
+    parser.add_argument("--replay-speed", type=float, env_var="LOCUST_REPLAY_SPEED", default=1.0,
+                        help="Replay: speed-up of the recorded timing (2 replays twice as fast)")
+    parser.add_argument("--replay-rate", type=float, env_var="LOCUST_REPLAY_RATE", default=0.0,
+                        help="Replay: fixed requests per second for the whole test instead of the recorded timing")
+    parser.add_argument("--replay-once", action="store_true", env_var="LOCUST_REPLAY_ONCE", default=False,
+                        help="Replay: stop after one pass instead of looping the capture")
+
+@events.init.add_listener
+def _on_init(environment: Environment, **_: Any) -> None:
+    # Fail before any user starts, workers only get the option with the first spawn
+    options = environment.parsed_options
+    if options is not None and options.replay and not isinstance(environment.runner, WorkerRunner):
+        read_capture(options.replay)
+        if options.replay_speed <= 0:
+            raise ValueError("--replay-speed must be positive")
+
+@events.test_start.add_listener
+def _on_test_start(**_: Any) -> None:
+    global replay
+    replay = None
+
+def process_replay(environment: Environment) -> Replay:
+    """This process's replay, created by the first user that starts."""
+    global replay
+    if replay is None:
+        runner = environment.runner
+        if isinstance(runner, WorkerRunner):
+            index, processes = runner.worker_index, max(environment.parsed_options.expect_workers, 1)
+        else:
+            index, processes = 0, 1
+        replay = Replay(environment.parsed_options, index % processes, processes)
+        logger.info(f"Replaying {len(replay.entries)} requests of {environment.parsed_options.replay} "
+                    f"(process {index % processes + 1} of {processes})")
+    return replay
+
+class ReplayUser(TracedHttpUser):
+    """User sending the next request of the --replay capture at its scheduled time."""
+    wait_time = constant(0)
+    connection_timeout = 10.0
+    network_timeout = 10.0
+
+    def __init__(self, environment: Any) -> None:
+        super().__init__(environment)
+        if not getattr(environment.parsed_options, "replay", None):
+            raise ValueError("ReplayUser needs a capture (--replay)")
+        self.client.request_event = CorrectedRequestEvent(self.client.request_event)
+
+    @task
+    def replay_next(self) -> None:
+        scheduled = process_replay(self.environment).next()
+        if scheduled is None:
+            raise StopUser()
+        intended, entry = scheduled
+        delay = intended - time.time()
+        if delay > 0:
+            gevent.sleep(delay)
+        open_loop.intended_starts[gevent.getcurrent()] = intended
+        recorded_status = entry.get("status")
+        try:
+            with self.client.request(entry.get("method", "GET"), entry["path"], name=entry.get("name"),
+                                     catch_response=True) as response:
+                if response.status_code < 400 or response.status_code == recorded_status:
+                    response.success()
+                else:
+                    response.failure(f"Got status code {response.status_code}, recorded {recorded_status}")
+        finally:
+            open_loop.intended_starts.pop(gevent.getcurrent(), None)
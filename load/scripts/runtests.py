@@ -8,7 +8,6 @@ A cross-platform Python script to run Locust load tests with various configurati
 import sys
 import subprocess
 import argparse
-import time
 import json
 from pathlib import Path
 import webbrowser
@@ -192,9 +191,8 @@ class LoadTestRunner:
             print(f"{Colors.BLUE}Starting master process...{Colors.END}")
             master = subprocess.Popen(master_cmd)
             processes.append(master)
-            time.sleep(2)  # Give master time to start
             
-            # Start worker processes
+            # Start worker processes right away, they retry until the master is bound
             for i in range(workers):
                 worker_cmd = [
                     self.python_exe, "-m", "locust",
@@ -207,7 +205,6 @@ class LoadTestRunner:
                                          stdout=subprocess.DEVNULL,
                                          stderr=subprocess.DEVNULL)
                 processes.append(worker)
-                time.sleep(0.5)
             
             print(f"{Colors.GREEN}All workers started. Test running...{Colors.END}")
             
@@ -266,9 +263,8 @@ class LoadTestRunner:
             print(f"{Colors.BLUE}Starting master process with web UI...{Colors.END}")
             master = subprocess.Popen(master_cmd)
             processes.append(master)
-            time.sleep(2)  # Give master time to start
             
-            # Start worker processes
+            # Start worker processes right away, they retry until the master is bound
             for i in range(num_workers):
                 worker_cmd = [
                     self.python_exe, "-m", "locust",
@@ -281,7 +277,6 @@ class LoadTestRunner:
                                         stdout=subprocess.DEVNULL,
                                         stderr=subprocess.DEVNULL)
                 processes.append(worker)
-                time.sleep(0.5)
             
             print(f"{Colors.GREEN}All workers started. Web UI ready at http://localhost:8089{Colors.END}")
             
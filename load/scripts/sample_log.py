@@ -0,0 +1,162 @@
+"""
+Raw per-request sample log.
+
+With --sample-log DIR every process generating load (each worker, or the
+single process) records one sample per request: start timestamp, endpoint,
+latency, status code, response bytes and whether it failed. Samples go to
+typed in-memory columns (array.array appends, no per-request objects) and are
+written in batches as raw little-endian column files:
+
+    DIR/<process>/timestamp.f8   start time, unix seconds (float64)
+    DIR/<process>/latency.f4     response time, ms (float32)
+    DIR/<process>/status.u2      HTTP status, 0 when no response
+    DIR/<process>/bytes.u4       response length
+    DIR/<process>/endpoint.u2    index into endpoints.json
+    DIR/<process>/failed.u1      1 if Locust counted a failure
+    DIR/<process>/endpoints.json [[method, name], ...]
+
+Each file is a flat array, so the load generator reads them back with
+numpy.fromfile or memory-maps them (see load/generator/sample_analysis.py).
+The directory option reaches workers through the master, like every custom
+option, so pooled workers record too.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import gevent
+from locust import events
+from locust.env import Environment
+from locust.runners import MasterRunner, WorkerRunner
+
+FLUSH_SAMPLES = 16384   # Samples buffered before a batch is written
+FLUSH_INTERVAL_S = 1.0  # Longest time samples stay in memory
+
+# Column name, array typecode and file suffix (numpy dtype of the raw file)
+COLUMNS = (
+    ("timestamp", "d", "f8"),
+    ("latency", "f", "f4"),
+    ("status", "H", "u2"),
+    ("bytes", "I", "u4"),
+    ("endpoint", "H", "u2"),
+    ("failed", "B", "u1"),
+)
+
+class SampleLog:
+    """Buffered column writer for one process."""
+
+    def __init__(self, directory: Path):
+        directory.mkdir(parents=True, exist_ok=True)
+        self.directory = directory
+        self.columns = {name: array(typecode) for name, typecode, _ in COLUMNS}
+        self.files = {name: open(directory / f"{name}.{suffix}", "ab") for name, _, suffix in COLUMNS}
+        self.endpoints: Dict[Tuple[str, str], int] = {}
+        self.endpoints_written = 0
+
+    def record(self, timestamp: float, method: str, name: str, latency: float,
+               status: int, length: int, failed: bool) -> None:
+        endpoint = self.endpoints.get((method, name))
+        if endpoint is None:
+            endpoint = self.endpoints[(method, name)] = len(self.endpoints)
+        columns = self.columns
+        columns["timestamp"].append(timestamp)
+        columns["latency"].append(latency)
+        columns["status"].append(status)
+        columns["bytes"].append(min(length, 0xFFFFFFFF))
+        columns["endpoint"].append(endpoint)
+        columns["failed"].append(failed)
+        if len(columns["timestamp"]) >= FLUSH_SAMPLES:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.columns["timestamp"]:
+            return
+        if len(self.endpoints) != self.endpoints_written:
+            # Written first, so readers never see samples that refer to an unknown endpoint
+            names: List[Tuple[str, str]] = sorted(self.endpoints, key=self.endpoints.__getitem__)
+            tmp_file = self.directory / "endpoints.json.tmp"
+            tmp_file.write_text(json.dumps(names))
+            os.replace(tmp_file, self.directory / "endpoints.json")
+            self.endpoints_written = len(names)
+        for name, column in self.columns.items():
+            if sys.byteorder != "little":
+                column.byteswap()
+            column.tofile(self.files[name])
+            self.files[name].flush()
+            del column[:]
+
+    def close(self) -> None:
+        self.flush()
+        for f in self.files.values():
+            f.close()
+
+writer: SampleLog | None = None
+env: Environment | None = None
+disabled = False  # No directory given, decided on the first request
+
+def process_name() -> str:
+    runner = env.runner if env else None
+    if isinstance(runner, WorkerRunner):
+        return runner.client_id
+    return f"{socket.gethostname()}_{os.getpid()}"
+
+def open_log() -> SampleLog | None:
+    """The process's sample log, opened on the first sample once the option is known."""
+    global writer, disabled
+    if writer is None and not disabled:
+        directory = getattr(env.parsed_options, "sample_log", None) if env and env.parsed_options else None
+        if not directory or isinstance(env.runner, MasterRunner):  # type: ignore[union-attr]
+            disabled = True
+            return None
+        writer = SampleLog(Path(directory) / process_name())
+        gevent.spawn(flush_periodically)
+    return writer
+
+def flush_periodically() -> None:
+    while writer is not None:
+        gevent.sleep(FLUSH_INTERVAL_S)
+        if writer is not None:
+            writer.flush()
+
+@events.init_command_line_parser.add_listener
+def _(parser: Any) -> None:
+    parser.add_argument("--sample-log", type=str, env_var="LOCUST_SAMPLE_LOG", default="",
+                        help="Directory for the raw per-request sample log (disabled if empty)")
+
+@events.init.add_listener
+def _on_init(environment: Environment, **_: Any) -> None:
+    global env
+    env = environment
+
+@events.request.add_listener
+def _on_request(request_type: str, name: str, response_time: float, response_length: int,
+                response: Any = None, exception: Any = None, start_time: float | None = None, **_: Any) -> None:
+    log = writer or open_log()
+    if log is None:
+        return
+    latency = response_time or 0.0
+    log.record(
+        start_time if start_time is not None else time.time() - latency / 1000,
+        request_type, name, latency,
+        getattr(response, "status_code", 0) or 0,
+        response_length or 0,
+        exception is not None
+    )
+
+@events.test_stop.add_listener
+def _on_test_stop(**_: Any) -> None:
+    if writer is not None:
+        writer.flush()
+
+@events.quit.add_listener
+def _on_quit(**_: Any) -> None:
+    global writer
+    if writer is not None:
+        writer.close()
+        writer = None
@@ -0,0 +1,151 @@
+"""
+Load generator saturation.
+
+A Locust process that runs out of CPU does not fail, it gets slow: greenlets
+wait longer for their turn on the gevent hub, and that wait ends up in the
+response times it records, as if the SUT had been slower. Every Locust
+process of a test therefore watches itself while the test runs:
+
+- cpu_percent: CPU used since the last measurement, in percent of one core
+  (greenlets all run on one, so 100% is the ceiling that matters);
+- lag_ms and lag_max_ms: scheduling lag, how much later than asked a greenlet
+  sleeping LAG_TICK_S at a time wakes up. An idle hub wakes it within a
+  millisecond, a busy one only after every greenlet ahead of it yielded.
+
+Workers send their measurements to the master with every stats report. The
+master adds its own and live_stats.py puts them in its snapshots as
+"generator": one entry per process, and whether any of them is saturated,
+above --saturation-cpu percent CPU or --saturation-lag-ms mean lag. The load
+generator flags the results of runs that were saturated and can add workers.
+"""
+
+import time
+from typing import Any, Dict, List
+
+import gevent
+import psutil
+from locust import events
+from locust.env import Environment
+from locust.runners import MasterRunner, WorkerRunner
+
+LAG_TICK_S = 0.05
+MIN_WINDOW_S = 1.0  # CPU percent over shorter windows is mostly clock tick rounding
+DEFAULT_CPU_PERCENT = 90.0
+DEFAULT_LAG_MS = 10.0
+
+class LoadMonitor:
+    """CPU and scheduling lag of this process, accumulated between measurements."""
+
+    def __init__(self):
+        self.process = psutil.Process()
+        self.process.cpu_percent()  # The first call only sets the reference point
+        self.ticks = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self.measured_at = time.monotonic()
+        self.last: Dict[str, Any] | None = None
+        self.greenlet = gevent.spawn(self.tick)
+
+    def tick(self) -> None:
+        while True:
+            start = time.perf_counter()
+            gevent.sleep(LAG_TICK_S)
+            lag = max(0.0, time.perf_counter() - start - LAG_TICK_S)
+            self.ticks += 1
+            self.lag_total += lag
+            self.lag_max = max(self.lag_max, lag)
+
+    def measure(self) -> Dict[str, Any] | None:
+        """Load since the previous measurement, which is repeated if that was less than MIN_WINDOW_S ago."""
+        now = time.monotonic()
+        if now - self.measured_at < MIN_WINDOW_S:
+            return self.last
+        self.measured_at = now
+        self.last = {
+            "cpu_percent": round(self.process.cpu_percent(), 1),
+            "lag_ms": round(self.lag_total / self.ticks * 1000, 2) if self.ticks else None,
+            "lag_max_ms": round(self.lag_max * 1000, 2) if self.ticks else None,
+        }
+        self.ticks, self.lag_total, self.lag_max = 0, 0.0, 0.0
+        return self.last
+
+    def stop(self) -> None:
+        self.greenlet.kill(block=False)
+
+monitor: LoadMonitor | None = None
+# Latest measurement of each worker by client ID, on the master
+worker_loads: Dict[str, Dict[str, Any]] = {}
+env: Environment | None = None
+
+def limits() -> Dict[str, float]:
+    options = env.parsed_options if env else None
+    return {
+        "cpu_percent": getattr(options, "saturation_cpu", DEFAULT_CPU_PERCENT) if options else DEFAULT_CPU_PERCENT,
+        "lag_ms": getattr(options, "saturation_lag_ms", DEFAULT_LAG_MS) if options else DEFAULT_LAG_MS,
+    }
+
+def is_saturated(load: Dict[str, Any], limit: Dict[str, float]) -> bool:
+    return load["cpu_percent"] >= limit["cpu_percent"] or (load["lag_ms"] or 0) >= limit["lag_ms"]
+
+def snapshot(environment: Environment) -> Dict[str, Any]:
+    """This process's load and, on the master, that of its connected workers."""
+    runner = environment.runner
+    if monitor is None or runner is None:
+        return {}
+    limit = limits()
+    processes: List[Dict[str, Any]] = []
+    own = monitor.measure()
+    if own is not None:
+        processes.append({"process": "master" if isinstance(runner, MasterRunner) else "single", **own})
+    if isinstance(runner, MasterRunner):
+        connected = {worker.id for worker in runner.clients.ready + runner.clients.spawning + runner.clients.running}
+        for client_id, load in sorted(worker_loads.items(), key=lambda item: item[1]["index"]):
+            if client_id in connected:
+                # Numbered in the order workers connected, not by the load generator's process names
+                processes.append({"process": f"worker-{load['index'] + 1}", **load["load"]})
+    for process in processes:
+        process["saturated"] = is_saturated(process, limit)
+    return {
+        "saturated": any(process["saturated"] for process in processes),
+        "limits": limit,
+        "processes": processes,
+    }
+
+@events.init_command_line_parser.add_listener
+def _(parser: Any) -> None:
+    parser.add_argument("--saturation-cpu", type=float, env_var="LOCUST_SATURATION_CPU", default=DEFAULT_CPU_PERCENT,
+                        help="CPU percent of one core above which a Locust process counts as saturated")
+    parser.add_argument("--saturation-lag-ms", type=float, env_var="LOCUST_SATURATION_LAG_MS", default=DEFAULT_LAG_MS,
+                        help="Mean greenlet scheduling lag above which a Locust process counts as saturated")
+
+@events.init.add_listener
+def _on_init(environment: Environment, **_: Any) -> None:
+    global env
+    env = environment
+
+@events.test_start.add_listener
+def _on_test_start(environment: Environment, **_: Any) -> None:
+    global monitor
+    if monitor is None:
+        monitor = LoadMonitor()
+    worker_loads.clear()
+
+@events.test_stop.add_listener
+def _on_test_stop(environment: Environment, **_: Any) -> None:
+    global monitor
+    if monitor is not None:
+        monitor.stop()
+        monitor = None
+
+@events.report_to_master.add_listener
+def _on_report_to_master(client_id: str, data: Dict[str, Any]) -> None:
+    runner = env.runner if env else None
+    if monitor is not None and isinstance(runner, WorkerRunner):
+        load = monitor.measure()
+        if load is not None:
+            data["generator_load"] = {"index": runner.worker_index, "load": load}
+
+@events.worker_report.add_listener
+def _on_worker_report(client_id: str, data: Dict[str, Any]) -> None:
+    if "generator_load" in data:
+        worker_loads[client_id] = data["generator_load"]
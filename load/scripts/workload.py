@@ -0,0 +1,173 @@
+"""
+Declarative workload mixes.
+
+WorkloadUser runs the request mix of a workload spec instead of hard-coded
+tasks. The spec is a JSON file given with --workload (the load generator
+writes it from the test's "workload" config, see load/generator/workload_spec.py):
+
+    {
+      "think_time": {"distribution": "uniform", "min": 0.9, "max": 1.1},
+      "endpoints": [
+        {"path": "/api/status", "weight": 5},
+        {"path": "/api/delay/{ms}", "weight": 3,
+         "params": {"ms": {"distribution": "randint", "min": 100, "max": 2000}}},
+        {"path": "/api/fib/{n}", "weight": 1,
+         "params": {"n": {"distribution": "choice", "values": [1000, 100000], "weights": [9, 1]}}},
+        {"path": "/api/code/404", "weight": 0.5, "expect_status": [404]}
+      ]
+    }
+
+Every task picks one endpoint with probability proportional to its weight,
+fills the path placeholders and "query" parameters from their distributions
+and checks the status against "expect_status" (default 200). Requests are
+named after the path template, so stats stay grouped per endpoint whatever
+the parameter values. The spec is compiled once per process when the first
+user starts. The option reaches workers through the master like every
+custom option.
+
+Distributions: constant (value, or a bare number or string), uniform and
+randint (min, max), exponential (mean), normal (mean, stddev), lognormal
+(median, sigma) and choice (values, optional weights). normal and lognormal
+take optional min and max bounds. Think time is ignored in open-loop mode,
+where the arrival schedule sets the pace (see open_loop.py).
+"""
+
+import json
+import math
+import random
+import logging
+from string import Formatter
+from urllib.parse import urlencode
+from typing import Any, Callable, Dict, List
+
+from locust import events, task
+from locust.env import Environment
+from locust.runners import WorkerRunner
+
+from open_loop import OpenLoopUser
+
+logger = logging.getLogger(__name__)
+
+Sampler = Callable[[], Any]
+
+def bounded(sample: Sampler, spec: Dict[str, Any]) -> Sampler:
+    low, high = spec.get("min", -math.inf), spec.get("max", math.inf)
+    return lambda: min(max(sample(), low), high)
+
+def sampler(spec: Any) -> Sampler:
+    """A function drawing values from a distribution spec."""
+    if not isinstance(spec, dict):
+        return lambda: spec
+    distribution = spec.get("distribution", "constant")
+    try:
+        if distribution == "constant":
+            value = spec["value"]
+            return lambda: value
+        if distribution == "uniform":
+            low, high = float(spec["min"]), float(spec["max"])
+            return lambda: random.uniform(low, high)
+        if distribution == "randint":
+            low, high = int(spec["min"]), int(spec["max"])
+            return lambda: random.randint(low, high)
+        if distribution == "exponential":
+            rate = 1 / float(spec["mean"])
+            return lambda: random.expovariate(rate)
+        if distribution == "normal":
+            mean, stddev = float(spec["mean"]), float(spec["stddev"])
+            return bounded(lambda: random.gauss(mean, stddev), spec)
+        if distribution == "lognormal":
+            mu, sigma = math.log(float(spec["median"])), float(spec["sigma"])
+            return bounded(lambda: random.lognormvariate(mu, sigma), spec)
+        if distribution == "choice":
+            values, weights = list(spec["values"]), spec.get("weights")
+            return lambda: random.choices(values, weights)[0]
+    except (KeyError, TypeError, ValueError, ZeroDivisionError) as e:
+        raise ValueError(f"Invalid {distribution} distribution {spec}: {e!r}")
+    raise ValueError(f"Unknown distribution {distribution}")
+
+class Endpoint:
+    """One entry of the mix with its parameter samplers."""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.method = spec.get("method", "GET").upper()
+        self.path = spec["path"]
+        self.name = spec.get("name") or self.path
+        self.weight = float(spec.get("weight", 1))
+        self.params = {key: sampler(value) for key, value in (spec.get("params") or {}).items()}
+        self.query = {key: sampler(value) for key, value in (spec.get("query") or {}).items()}
+        self.body = spec.get("json")
+        self.expect_status = set(spec.get("expect_status") or [200])
+        missing = {field for _, field, _, _ in Formatter().parse(self.path) if field} - set(self.params)
+        if missing:
+            raise ValueError(f"No params for {', '.join(sorted(missing))} in {self.path}")
+        if self.weight < 0:
+            raise ValueError(f"Negative weight for {self.path}")
+
+    def url(self) -> str:
+        url = self.path.format(**{key: sample() for key, sample in self.params.items()})
+        if self.query:
+            url += "?" + urlencode({key: sample() for key, sample in self.query.items()})
+        return url
+
+class Workload:
+    """A compiled workload spec: the endpoints, their cumulative weights and the think time."""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.endpoints = [Endpoint(endpoint) for endpoint in spec.get("endpoints") or []]
+        if not self.endpoints:
+            raise ValueError("A workload needs at least one endpoint")
+        self.cum_weights: List[float] = []
+        for endpoint in self.endpoints:
+            self.cum_weights.append((self.cum_weights[-1] if self.cum_weights else 0) + endpoint.weight)
+        if self.cum_weights[-1] <= 0:
+            raise ValueError("A workload needs an endpoint with a positive weight")
+        self.think_time = sampler(spec.get("think_time", 1.0))
+
+    def pick(self) -> Endpoint:
+        return random.choices(self.endpoints, cum_weights=self.cum_weights)[0]
+
+workloads: Dict[str, Workload] = {}
+
+def load_workload(path: str) -> Workload:
+    if path not in workloads:
+        with open(path) as f:
+            workloads[path] = Workload(json.load(f))
+        logger.info(f"Compiled workload {path} with {len(workloads[path].endpoints)} endpoints")
+    return workloads[path]
+
+@events.init_command_line_parser.add_listener
+def _(parser: Any) -> None:
+    parser.add_argument("--workload", type=str, env_var="LOCUST_WORKLOAD", default="",
+                        help="Workload spec (JSON file) run by WorkloadUser")
+
+@events.init.add_listener
+def _on_init(environment: Environment, **_: Any) -> None:
+    # Fail before any user starts, workers only get the option with the first spawn
+    options = environment.parsed_options
+    if options is not None and options.workload and not isinstance(environment.runner, WorkerRunner):
+        load_workload(options.workload)
+
+class WorkloadUser(OpenLoopUser):
+    """User running the request mix of the --workload spec."""
+    connection_timeout = 10.0
+    network_timeout = 10.0
+
+    def __init__(self, environment: Any) -> None:
+        super().__init__(environment)
+        path = getattr(environment.parsed_options, "workload", None)
+        if not path:
+            raise ValueError("WorkloadUser needs a workload spec (--workload)")
+        self.workload = load_workload(path)
+
+    def wait_time(self) -> float:
+        return max(0.0, float(self.workload.think_time()))
+
+    @task
+    def request_endpoint(self) -> None:
+        endpoint = self.workload.pick()
+        with self.client.request(endpoint.method, endpoint.url(), name=endpoint.name, json=endpoint.body,
+                                 catch_response=True) as response:
+            if response.status_code in endpoint.expect_status:
+                response.success()
+            else:
+                response.failure(f"Expected {sorted(endpoint.expect_status)}, got {response.status_code}")
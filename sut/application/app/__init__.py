@@ -3,6 +3,8 @@ from fastapi import FastAPI
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 from app.routes import router
 from app.middleware import metrics_middleware
+from app.access_log import start_access_log, stop_access_log
+from app.readiness import warm_up, get_ready
 from config.observability import get_metrics
 
 # Set up base logging
@@ -23,6 +25,15 @@ def create_app() -> FastAPI:
     # Add Middleware
     app.middleware("http")(metrics_middleware)
 
+    # Background access log writer, started per worker process
+    app.on_event("startup")(start_access_log)
+    app.on_event("shutdown")(stop_access_log)
+
+    # Warm up before uvicorn starts accepting connections on this worker
+    @app.on_event("startup")
+    async def warm_up_worker() -> None:
+        await warm_up(app)
+
     # Instrument FastAPI with OpenTelemetry
     FastAPIInstrumentor.instrument_app(app) # type: ignore[reportUnknownMemberType]
 
@@ -32,4 +43,7 @@ def create_app() -> FastAPI:
     # Add the /metrics endpoint manually (outside of the main router)
     app.add_api_route("/metrics", get_metrics, name="/metrics")
 
+    # Add the /ready endpoint, 503 until this worker is warmed up
+    app.add_api_route("/ready", get_ready, name="/ready")
+
     return app
\ No newline at end of file
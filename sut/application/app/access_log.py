@@ -0,0 +1,134 @@
+"""
+Asynchronous structured access log.
+
+The middleware hands each sampled request to a QueueHandler that only appends
+the record to a bounded in-memory queue. A QueueListener thread drains the
+queue in batches, formats records as JSON lines and writes each batch to
+stdout with a single write, where Promtail ships it to Loki.
+
+When the queue is full, records are dropped and counted rather than blocking
+the request. Errors (5xx) and slow requests are always logged; everything else
+is sampled with ACCESS_LOG_SAMPLE_RATE.
+"""
+
+import sys
+import json
+import queue
+import random
+import logging
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, TextIO
+
+from config.observability import ACCESS_LOG_RECORDS
+from config.settings import CONFIG
+
+logger = logging.getLogger(__name__)
+
+access_logger = logging.getLogger("observastack.access")
+access_logger.setLevel(logging.INFO)
+access_logger.propagate = False
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: records are dropped and counted when the queue is full."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens on the listener thread, keep the request path to a queue append
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            ACCESS_LOG_RECORDS.labels(outcome="queued").inc()
+        except queue.Full:
+            ACCESS_LOG_RECORDS.labels(outcome="dropped").inc()
+
+class JsonFormatter(logging.Formatter):
+    """Formats access records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "log_type": "access",
+        }
+        entry.update(getattr(record, "access", {}))
+        return json.dumps(entry, separators=(",", ":"))
+
+class BatchStreamHandler(logging.StreamHandler):  # type: ignore[type-arg]
+    """StreamHandler that writes a batch of records with one write and one flush."""
+
+    def emit_batch(self, records: List[logging.LogRecord]) -> None:
+        try:
+            lines = "".join(self.format(record) + self.terminator for record in records)
+            with self.lock:  # type: ignore[union-attr]
+                self.stream.write(lines)
+                self.flush()
+        except Exception:
+            self.handleError(records[-1])
+
+class BatchingQueueListener(QueueListener):
+    """QueueListener that drains up to batch_size queued records per write."""
+
+    def __init__(self, log_queue: "queue.Queue[Any]", handler: BatchStreamHandler, batch_size: int):
+        super().__init__(log_queue, handler)
+        self.batch_handler = handler
+        self.batch_size = batch_size
+
+    def _monitor(self) -> None:
+        stopping = False
+        while not stopping:
+            # Block for the first record, then take whatever else is already queued
+            batch: List[logging.LogRecord] = []
+            record = self.dequeue(True)
+            while True:
+                if record is self._sentinel:
+                    stopping = True
+                    break
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    record = self.dequeue(False)
+                except queue.Empty:
+                    break
+            if batch:
+                self.batch_handler.emit_batch(batch)
+
+listener: BatchingQueueListener | None = None
+
+def start_access_log(stream: TextIO = sys.stdout) -> None:
+    """Start the background writer. Runs in each worker after fork, threads do not survive fork."""
+    global listener
+    if not CONFIG["ACCESS_LOG_ENABLED"] or listener is not None:
+        return
+
+    log_queue: "queue.Queue[Any]" = queue.Queue(maxsize=CONFIG["ACCESS_LOG_QUEUE_SIZE"])
+    handler = BatchStreamHandler(stream)
+    handler.setFormatter(JsonFormatter())
+    access_logger.addHandler(DroppingQueueHandler(log_queue))
+
+    listener = BatchingQueueListener(log_queue, handler, CONFIG["ACCESS_LOG_BATCH_SIZE"])
+    listener.start()
+    logger.info(f"Access log started (sample rate {CONFIG['ACCESS_LOG_SAMPLE_RATE']}, "
+                f"slow threshold {CONFIG['ACCESS_LOG_SLOW_MS']} ms)")
+
+def stop_access_log() -> None:
+    """Stop the background writer, flushing records that are still queued."""
+    global listener
+    if listener is None:
+        return
+    listener.stop()
+    listener = None
+    for handler in list(access_logger.handlers):
+        access_logger.removeHandler(handler)
+
+def log_request(fields: Dict[str, Any]) -> None:
+    """Queue an access record, always for errors and slow requests, otherwise sampled."""
+    if listener is None:
+        return
+    if (fields["status"] < 500
+            and fields["duration_ms"] < CONFIG["ACCESS_LOG_SLOW_MS"]
+            and random.random() >= CONFIG["ACCESS_LOG_SAMPLE_RATE"]):
+        ACCESS_LOG_RECORDS.labels(outcome="sampled_out").inc()
+        return
+    access_logger.info("access", extra={"access": fields})
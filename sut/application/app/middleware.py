@@ -1,33 +1,88 @@
 import time
+import asyncio
 import logging
 from typing import Callable, Awaitable
 from fastapi import Request
 from fastapi.responses import Response
-from config.observability import REQUEST_DURATION, tracer
+from app.access_log import log_request
+from app.readiness import WARMUP_SCOPE_KEY
+from config.observability import REQUEST_DURATION, REQUEST_QUEUE_TIME, REQUESTS_IN_FLIGHT, REQUESTS_DROPPED, tracer
 
 # Set up logging for this file
 logger = logging.getLogger(__name__)
 
+# Header set by the sut-gateway when it forwards a request, e.g. "t=1700000000.123"
+REQUEST_START_HEADER = "x-request-start"
+
+# Header sent by the Locust users with the ID of the load test run
+TEST_RUN_ID_HEADER = "x-test-run-id"
+
+def parse_request_start(value: str) -> float | None:
+    """
+    Parses an X-Request-Start header into seconds since the epoch.
+
+    Accepts the "t=" prefix used by nginx/Heroku and values in seconds,
+    milliseconds or microseconds (detected by magnitude).
+    """
+    try:
+        timestamp = float(value.strip().removeprefix("t="))
+    except ValueError:
+        return None
+    if timestamp > 1e14:    # microseconds
+        return timestamp / 1e6
+    if timestamp > 1e11:    # milliseconds
+        return timestamp / 1e3
+    return timestamp
+
 async def metrics_middleware(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
     """
     Middleware for Prometheus metrics and OpenTelemetry tracing.
     
     1. Traces the request with OpenTelemetry.
     2. Records the request duration in Prometheus.
+    3. Tracks in-flight requests and counts requests cancelled by a worker shutdown.
+    4. Records the gateway-to-worker queue time when X-Request-Start is present.
+    5. Queues a structured access log record (sampled, see app/access_log.py).
     """
+    arrival_time = time.time()
     start_time = time.perf_counter()
     method = request.method
     status_code = 500
     endpoint = "Unknown" # Default
+    queue_time_ms = None
+    # In-process warm-up requests are traced but kept out of metrics and access logs
+    warmup = bool(request.scope.get(WARMUP_SCOPE_KEY))
+    REQUESTS_IN_FLIGHT.inc()
 
     # Start OpenTelemetry Tracing
     with tracer.start_as_current_span(f"http.server.request") as span:
         span.set_attribute("http.method", method)
         span.set_attribute("http.url", str(request.url))
+        if warmup:
+            span.set_attribute("warmup", True)
+
+        # Set by the load generator to tie server spans to a test run
+        test_run_id = request.headers.get(TEST_RUN_ID_HEADER)
+        if test_run_id:
+            span.set_attribute("test.run_id", test_run_id)
+
+        request_start = request.headers.get(REQUEST_START_HEADER)
+        if request_start:
+            gateway_time = parse_request_start(request_start)
+            if gateway_time is not None:
+                # Clamp small negative values caused by clock skew between containers
+                queue_time_ms = max(0.0, (arrival_time - gateway_time) * 1000)
+                REQUEST_QUEUE_TIME.observe(queue_time_ms)
+                span.set_attribute("http.request.queue_time_ms", queue_time_ms)
 
         try:
             response = await call_next(request)
             status_code = response.status_code
+        except asyncio.CancelledError:
+            # Uvicorn cancels requests still running when graceful_timeout expires
+            REQUESTS_DROPPED.labels(reason="cancelled").inc()
+            logger.warning(f"Request at endpoint {request.url.path} cancelled during worker shutdown")
+            raise
         except Exception as e:
             status_code = getattr(e, 'status_code', 500)
             logger.error(f"Exception in processing request at endpoint {request.url.path}: {e}")
@@ -42,12 +97,29 @@ async def metrics_middleware(request: Request, call_next: Callable[[Request], Aw
             span.set_attribute("http.route", endpoint)
             span.set_attribute("http.status_code", status_code)
             
-            # Record Metrics
-            duration_ms = (time.perf_counter() - start_time) * 1000
-            REQUEST_DURATION.labels(
-                endpoint=endpoint,
-                method=method,
-                status_code=str(status_code)
-            ).observe(duration_ms)
+            REQUESTS_IN_FLIGHT.dec()
+
+            if not warmup:
+                # Record Metrics
+                duration_ms = (time.perf_counter() - start_time) * 1000
+                REQUEST_DURATION.labels(
+                    endpoint=endpoint,
+                    method=method,
+                    status_code=str(status_code)
+                ).observe(duration_ms)
+
+                span_context = span.get_span_context()
+                log_request({
+                    "method": method,
+                    "path": request.url.path,
+                    "query": request.url.query or None,
+                    "route": endpoint,
+                    "status": status_code,
+                    "duration_ms": round(duration_ms, 3),
+                    "queue_time_ms": round(queue_time_ms, 3) if queue_time_ms is not None else None,
+                    "client": request.headers.get("x-real-ip") or (request.client.host if request.client else None),
+                    "trace_id": format(span_context.trace_id, "032x") if span_context.is_valid else None,
+                    "test_run_id": test_run_id,
+                })
 
     return response
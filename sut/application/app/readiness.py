@@ -0,0 +1,154 @@
+"""
+Worker warm-up and readiness.
+
+Each worker runs its warm-up in the lifespan startup event. Uvicorn only starts
+accepting connections after startup completes, so a cold worker never takes
+traffic: connections wait in the shared listen backlog and are picked up by
+workers that are already warm.
+
+The warm-up sends WARMUP_ITERATIONS requests to every GET route straight
+through the ASGI app (middleware, tracing and routing included), then waits for
+the OTLP exporter and Pyroscope endpoints to accept connections. /ready stays
+503 until both have happened, and the load generator waits on it.
+/ready?telemetry=false only waits for the warm-up. The container healthcheck
+polls that, and the gateway starts once the API server is healthy, so a SUT
+running without the observability stack still comes up.
+"""
+
+import re
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List
+from urllib.parse import urlparse
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+from app.routes import router
+from config.observability import OTLP_ENDPOINT, PYROSCOPE_SERVER_ADDRESS
+from config.settings import CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Scope key marking warm-up requests, the middleware skips metrics and access logs for them
+WARMUP_SCOPE_KEY = "observastack.warmup"
+
+# Cheap values for path parameters so warm-up exercises each handler without loading the worker
+WARMUP_PATH_PARAMS: Dict[str, str] = {"delay": "1", "code": "200", "n": "1000"}
+
+TELEMETRY_PROBE_TIMEOUT_S = 1.0
+TELEMETRY_RETRY_INTERVAL_S = 5.0
+
+# Per-worker readiness state
+state: Dict[str, Any] = {
+    "warmed_up": False,
+    "telemetry_connected": False,
+    "warmup_ms": None,
+}
+
+# Reference to the background telemetry retry so it is not garbage collected
+telemetry_task: "asyncio.Task[None] | None" = None
+
+def is_ready(require_telemetry: bool = True) -> bool:
+    """A worker is ready once warmed up and, if required, connected to telemetry."""
+    telemetry_ok = state["telemetry_connected"] or not (require_telemetry and CONFIG["READINESS_REQUIRE_TELEMETRY"])
+    return bool(state["warmed_up"] and telemetry_ok)
+
+def get_warmup_paths() -> List[str]:
+    """Builds one concrete path per GET route of the API router."""
+    paths: List[str] = []
+    for route in router.routes:
+        if isinstance(route, APIRoute) and "GET" in route.methods:
+            paths.append(re.sub(r"\{(\w+)\}", lambda m: WARMUP_PATH_PARAMS.get(m.group(1), "1"), route.path))
+    return paths
+
+async def send_warmup_request(app: FastAPI, path: str) -> int:
+    """Sends a GET request through the ASGI app in-process and returns the status code."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"warmup")],
+        "client": ("127.0.0.1", 0),
+        "server": ("127.0.0.1", 80),
+        WARMUP_SCOPE_KEY: True,
+    }
+    status = 0
+
+    async def receive() -> Dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Dict[str, Any]) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+async def probe_endpoint(url: str) -> bool:
+    """Checks that a telemetry endpoint accepts TCP connections."""
+    parsed = urlparse(url)
+    if not parsed.hostname:
+        return False
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(parsed.hostname, port), TELEMETRY_PROBE_TIMEOUT_S)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    return True
+
+async def check_telemetry() -> bool:
+    """Checks the OTLP exporter and Pyroscope endpoints, updating the readiness state."""
+    results = await asyncio.gather(probe_endpoint(OTLP_ENDPOINT), probe_endpoint(PYROSCOPE_SERVER_ADDRESS))
+    state["telemetry_connected"] = all(results)
+    return state["telemetry_connected"]
+
+async def keep_checking_telemetry() -> None:
+    """Background retry so a worker becomes ready once telemetry comes up after startup."""
+    while not await check_telemetry():
+        await asyncio.sleep(TELEMETRY_RETRY_INTERVAL_S)
+    logger.info("Telemetry endpoints connected, worker is ready")
+
+async def warm_up(app: FastAPI) -> None:
+    """Runs the warm-up and waits for telemetry, bounded by WARMUP_TIMEOUT_S."""
+    global telemetry_task
+    start = time.perf_counter()
+    deadline = time.monotonic() + CONFIG["WARMUP_TIMEOUT_S"]
+
+    if CONFIG["WARMUP_ENABLED"]:
+        paths = get_warmup_paths()
+        try:
+            for _ in range(CONFIG["WARMUP_ITERATIONS"]):
+                await asyncio.wait_for(
+                    asyncio.gather(*(send_warmup_request(app, path) for path in paths)),
+                    max(deadline - time.monotonic(), 0.001)
+                )
+        except asyncio.TimeoutError:
+            logger.warning(f"Warm-up did not finish within {CONFIG['WARMUP_TIMEOUT_S']}s, serving anyway")
+    state["warmed_up"] = True
+    state["warmup_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    # Wait for telemetry up to the same deadline, then keep retrying in the background
+    while not await check_telemetry():
+        if time.monotonic() >= deadline:
+            logger.warning("Telemetry endpoints not reachable, worker stays not-ready until they are")
+            telemetry_task = asyncio.get_running_loop().create_task(keep_checking_telemetry())
+            break
+        await asyncio.sleep(0.5)
+
+    logger.info(f"Worker warm-up finished in {state['warmup_ms']} ms (ready: {is_ready()})")
+
+async def get_ready(telemetry: bool = True) -> JSONResponse:
+    """Readiness endpoint: 200 once this worker is warmed up and telemetry is connected (unless telemetry=false), 503 before."""
+    body = {"ready": is_ready(require_telemetry=telemetry), **state}
+    return JSONResponse(content=body, status_code=200 if body["ready"] else 503)
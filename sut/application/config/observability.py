@@ -1,6 +1,6 @@
 import os
 from fastapi import Response
-from prometheus_client import CONTENT_TYPE_LATEST, generate_latest, CollectorRegistry, multiprocess, Histogram
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest, CollectorRegistry, multiprocess, Counter, Gauge, Histogram
 from opentelemetry import trace
 from opentelemetry.trace import Tracer
 from opentelemetry.sdk.trace import TracerProvider
@@ -10,12 +10,50 @@ from opentelemetry.sdk.resources import Resource
 from opentelemetry.sdk.trace.sampling import TraceIdRatioBased
 import pyroscope
 
+# Latency buckets in milliseconds shared by the request histograms
+LATENCY_BUCKETS_MS = [0] + [x * 10 for x in range(1, 10)] + [x * 100 for x in range(1, 11)] + [1000 + x * 250 for x in range(1, 41)] + [float('inf')]
+
 # Histogram for request duration with endpoint, method, and status_code labels
 REQUEST_DURATION = Histogram(
     'http_request_duration_ms',
     'HTTP request duration in milliseconds',
     ['endpoint', 'method', 'status_code'],
-    buckets=[0] + [x * 10 for x in range(1, 10)] + [x * 100 for x in range(1, 11)] + [1000 + x * 250 for x in range(1, 41)] + [float('inf')]
+    buckets=LATENCY_BUCKETS_MS
+)
+
+# Histogram for time between the gateway forwarding a request (X-Request-Start)
+# and a worker starting to process it: network, gunicorn backlog and event loop queueing
+REQUEST_QUEUE_TIME = Histogram(
+    'http_request_queue_time_ms',
+    'Time spent queued between the gateway and the worker in milliseconds',
+    buckets=LATENCY_BUCKETS_MS
+)
+
+# Requests currently being handled, summed across live workers.
+# The gunicorn master reads the per-worker value on exit to count killed requests.
+REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight',
+    'HTTP requests currently being processed',
+    multiprocess_mode='livesum'
+)
+
+# Requests that never completed because their worker shut down underneath them
+# reason="cancelled": worker exceeded graceful_timeout and cancelled the request
+# reason="killed": worker exited (e.g. SIGKILL) with requests still in flight
+REQUESTS_DROPPED = Counter(
+    'http_requests_dropped_total',
+    'HTTP requests dropped before a response was sent',
+    ['reason']
+)
+
+# Access log pipeline outcomes
+# outcome="queued": record handed to the background writer
+# outcome="sampled_out": request skipped by ACCESS_LOG_SAMPLE_RATE
+# outcome="dropped": queue full, record discarded instead of blocking the request
+ACCESS_LOG_RECORDS = Counter(
+    'access_log_records_total',
+    'Access log records by pipeline outcome',
+    ['outcome']
 )
 
 async def get_metrics() -> Response:
@@ -32,12 +70,16 @@ def get_multiprocess_registry() -> CollectorRegistry:
     multiprocess.MultiProcessCollector(registry)
     return registry
 
+# --- Telemetry Endpoints (also probed by the readiness check) ---
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://tempo:4317")
+PYROSCOPE_SERVER_ADDRESS = os.getenv("PYROSCOPE_SERVER_ADDRESS", "http://pyroscope:4040")
+
 # --- OpenTelemetry Configuration ---
 def configure_opentelemetry() -> Tracer:
     """Configures and returns the global tracer for OpenTelemetry."""
     # Configure OTLP exporter to send to Tempo
     otlp_exporter = OTLPSpanExporter(
-        endpoint=os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://tempo:4317"),
+        endpoint=OTLP_ENDPOINT,
         insecure=True 
     )
 
@@ -64,7 +106,7 @@ def configure_pyroscope():
     """Configures the Pyroscope continuous profiling client."""
     pyroscope.configure(
         application_name="observastack-backend",
-        server_address=os.getenv("PYROSCOPE_SERVER_ADDRESS", "http://pyroscope:4040"),
+        server_address=PYROSCOPE_SERVER_ADDRESS,
         tags={
             "env": os.getenv("APP_ENV", "production"),
         },
@@ -73,4 +115,4 @@ def configure_pyroscope():
 # Run Pyroscope configuration on module load
 configure_pyroscope()
 
-__all__ = ["REQUEST_DURATION", "tracer", "get_multiprocess_registry", "get_metrics"] 
\ No newline at end of file
+__all__ = ["REQUEST_DURATION", "REQUEST_QUEUE_TIME", "REQUESTS_IN_FLIGHT", "REQUESTS_DROPPED", "ACCESS_LOG_RECORDS", "OTLP_ENDPOINT", "PYROSCOPE_SERVER_ADDRESS", "tracer", "get_multiprocess_registry", "get_metrics"] 
\ No newline at end of file
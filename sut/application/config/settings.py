@@ -8,6 +8,15 @@ class AppConfig(t.TypedDict):
     """The type definition for the application's configuration."""
     WORKER_COUNT: int
     FEATURE_ENABLED: bool
+    ACCESS_LOG_ENABLED: bool
+    ACCESS_LOG_SAMPLE_RATE: float
+    ACCESS_LOG_SLOW_MS: float
+    ACCESS_LOG_QUEUE_SIZE: int
+    ACCESS_LOG_BATCH_SIZE: int
+    WARMUP_ENABLED: bool
+    WARMUP_ITERATIONS: int
+    WARMUP_TIMEOUT_S: float
+    READINESS_REQUIRE_TELEMETRY: bool
     
 def load_config() -> AppConfig:
     """
@@ -18,12 +27,28 @@ def load_config() -> AppConfig:
         config = AppConfig(
             WORKER_COUNT=int(os.environ.get("WORKER_COUNT", "4")),
             FEATURE_ENABLED=os.environ.get("FEATURE_FLAG", "false").lower() == "true",
+            ACCESS_LOG_ENABLED=os.environ.get("ACCESS_LOG_ENABLED", "true").lower() == "true",
+            ACCESS_LOG_SAMPLE_RATE=float(os.environ.get("ACCESS_LOG_SAMPLE_RATE", "0.01")),
+            ACCESS_LOG_SLOW_MS=float(os.environ.get("ACCESS_LOG_SLOW_MS", "1000")),
+            ACCESS_LOG_QUEUE_SIZE=int(os.environ.get("ACCESS_LOG_QUEUE_SIZE", "10000")),
+            ACCESS_LOG_BATCH_SIZE=int(os.environ.get("ACCESS_LOG_BATCH_SIZE", "500")),
+            WARMUP_ENABLED=os.environ.get("WARMUP_ENABLED", "true").lower() == "true",
+            WARMUP_ITERATIONS=int(os.environ.get("WARMUP_ITERATIONS", "20")),
+            WARMUP_TIMEOUT_S=float(os.environ.get("WARMUP_TIMEOUT_S", "30")),
+            READINESS_REQUIRE_TELEMETRY=os.environ.get("READINESS_REQUIRE_TELEMETRY", "true").lower() == "true",
         )
     except KeyError as e:
         raise EnvironmentError(f"Missing required environment variable: {e}")
     except ValueError as e:
         raise ValueError(f"Invalid environment variable value: {e}")
 
+    if not 0.0 <= config["ACCESS_LOG_SAMPLE_RATE"] <= 1.0:
+        raise ValueError("ACCESS_LOG_SAMPLE_RATE must be between 0.0 and 1.0")
+    if config["ACCESS_LOG_QUEUE_SIZE"] < 1 or config["ACCESS_LOG_BATCH_SIZE"] < 1:
+        raise ValueError("ACCESS_LOG_QUEUE_SIZE and ACCESS_LOG_BATCH_SIZE must be positive")
+    if config["WARMUP_ITERATIONS"] < 0 or config["WARMUP_TIMEOUT_S"] <= 0:
+        raise ValueError("WARMUP_ITERATIONS must be non-negative and WARMUP_TIMEOUT_S positive")
+
     # IMPORTANT: Filter sensitive data before returning the dictionary!
     # ... any filtering logic here ...
     
@@ -2,26 +2,66 @@
 Gunicorn configuration for ObservaStack FastAPI API Server.
 """
 import os
+import json
 from typing import Any
-from prometheus_client import multiprocess
+from prometheus_client import Counter, multiprocess
+from prometheus_client.mmap_dict import MmapedDict
+from uvicorn.workers import UvicornWorker
 
 PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc")
 if not os.path.exists(PROMETHEUS_MULTIPROC_DIR):
     os.makedirs(PROMETHEUS_MULTIPROC_DIR)
 
+# Master-side metrics. Not registered (workers register their own collectors after fork),
+# the values are written to the multiprocess directory and merged by /metrics.
+REQUESTS_DROPPED = Counter(
+    'http_requests_dropped_total',
+    'HTTP requests dropped before a response was sent',
+    ['reason'],
+    registry=None
+)
+WORKER_RELOADS = Counter(
+    'gunicorn_reloads_total',
+    'Rolling worker reloads (SIGHUP) handled by the gunicorn master',
+    registry=None
+)
+
+def _in_flight_requests(pid: int) -> int:
+    """Read the in-flight request gauge a worker left behind in the multiprocess directory."""
+    path = os.path.join(PROMETHEUS_MULTIPROC_DIR, f"gauge_livesum_{pid}.db")
+    try:
+        values = MmapedDict.read_all_values_from_file(path)
+    except FileNotFoundError:
+        return 0
+    return int(sum(value for key, value, _, _ in values if json.loads(key)[0] == "http_requests_in_flight"))
+
 def child_exit(_: Any, worker: Any) -> None:
-    """Clean up metrics when worker process exits"""
+    """Count requests the worker never finished, then clean up its metrics"""
+    dropped = _in_flight_requests(worker.pid)
+    if dropped > 0:
+        REQUESTS_DROPPED.labels(reason="killed").inc(dropped)
     multiprocess.mark_process_dead(worker.pid)  # type: ignore[arg-type]
 
+def on_reload(_: Any) -> None:
+    """Record a rolling reload so its impact can be lined up with request metrics"""
+    WORKER_RELOADS.inc()
+
 # Gunicorn configuration
 bind = "0.0.0.0:80"
 
 # Log configuration
-# accesslog = "-" # Log to stdout
+# accesslog = "-" # Log to stdout (synchronous, use the async access log in app/access_log.py instead)
 errorlog = "-"  # Log to stderr
 
+# Shutdown configuration (needed by the worker class below)
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT") or "10")  # Graceful shutdown timeout
+
+class GracefulUvicornWorker(UvicornWorker):
+    """Uvicorn worker that drains in-flight requests for up to graceful_timeout, then cancels them."""
+    CONFIG_KWARGS = {**UvicornWorker.CONFIG_KWARGS, "timeout_graceful_shutdown": graceful_timeout}
+
 # Worker configuration
-worker_class = "uvicorn.workers.UvicornWorker"
+worker_class = GracefulUvicornWorker
 workers = int(os.getenv("GUNICORN_WORKERS") or "5")  # Rule of thumb 
                                                      # (2 x CPU cores) + 1 for I/O bound work 
                                                      # (1 x CPU cores) + 1 for CPU-bound work
@@ -29,6 +69,5 @@ worker_connections = 1000    # Max concurrent connections per worker
 backlog = 2000               # Listen queue size for pending connections
 keepalive = 75               # Keep connections alive for 75s (exceeds nginx's 60s to prevent premature closure)
 timeout = 120                # Worker timeout 
-graceful_timeout = 10        # Graceful shutdown timeout
 max_requests = 0             # Restart workers after this many requests to prevent memory leaks (0 = never)
 # max_requests_jitter = 1000   # Add randomness to prevent all workers restarting simultaneously
\ No newline at end of file
@@ -1,7 +1,22 @@
+import os
+import time
+import signal
+import asyncio
 import logging
-from fastapi import FastAPI
+from typing import Any, Dict, List, Set
+
+import httpx
+import psutil
+from fastapi import FastAPI, HTTPException
+from prometheus_client.parser import text_string_to_metric_families
+from pydantic import BaseModel
 
 logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# The controller shares the SUT's PID namespace (see docs/control-agent-comms.md)
+# and reaches the API server directly over the SUT network.
+SUT_API_SERVER_URL = os.getenv("SUT_API_SERVER_URL", "http://sut-api-server")
 
 app = FastAPI(
     title="ControlAgent API",
@@ -12,11 +27,140 @@ app = FastAPI(
     openapi_url="/openapi.json"
 )
 
+http_client = httpx.AsyncClient(timeout=5.0)
+
+# Only one reload may be in flight, a second HUP would interrupt the first rollout
+reload_lock = asyncio.Lock()
+
+# Request model
+class ReloadConfig(BaseModel):
+    timeout: float = 30.0        # Deadline for old workers to drain and new workers to come up (s)
+    poll_interval: float = 0.1   # How often to check the worker set (s)
+
+# Helper functions
+def find_gunicorn_master() -> psutil.Process:
+    """Find the gunicorn master process in the shared PID namespace."""
+    # The controller runs gunicorn too: skip this process and its own master
+    own = psutil.Process()
+    own_pids = {own.pid} | {parent.pid for parent in own.parents()}
+    for proc in psutil.process_iter(['pid', 'cmdline']):
+        if proc.pid in own_pids:
+            continue
+        try:
+            cmdline = ' '.join(proc.info.get('cmdline') or [])
+            if 'gunicorn' not in cmdline:
+                continue
+            parent = proc.parent()
+            # Workers are children of the master, the master is not a child of gunicorn
+            if parent is None or 'gunicorn' not in ' '.join(parent.cmdline()):
+                return proc
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    raise HTTPException(status_code=503, detail="Gunicorn master process not found")
+
+def get_worker_pids(master: psutil.Process) -> Set[int]:
+    """Return the PIDs of the master's current worker processes."""
+    try:
+        return {child.pid for child in master.children() if child.status() != psutil.STATUS_ZOMBIE}
+    except psutil.NoSuchProcess:
+        return set()
+
+async def get_dropped_requests() -> float | None:
+    """Read the total dropped request count from the API server's /metrics endpoint."""
+    try:
+        response = await http_client.get(f"{SUT_API_SERVER_URL}/metrics")
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        logger.warning(f"Could not read SUT metrics: {e}")
+        return None
+
+    total = 0.0
+    for family in text_string_to_metric_families(response.text):
+        if family.name == "http_requests_dropped":
+            total += sum(s.value for s in family.samples if s.name == "http_requests_dropped_total")
+    return total
+
+async def wait_until_serving(deadline: float, poll_interval: float) -> bool:
+    """Wait for the API server's new workers to report ready (warmed up and connected to telemetry)."""
+    while time.monotonic() < deadline:
+        try:
+            response = await http_client.get(f"{SUT_API_SERVER_URL}/ready")
+            if response.status_code == 200:
+                return True
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(poll_interval)
+    return False
+
 @app.get(
-    "/status", 
+    "/status",
     name="/status",
     summary="Status Check",
     description="Basic health check endpoint that returns server status."
 )
 async def get_status():
     return {"message": "The server is up and running."}
+
+@app.post(
+    "/reload",
+    name="/reload",
+    summary="Rolling Worker Reload",
+    description="Send SIGHUP to the gunicorn master, wait for old workers to drain and new ones to serve, "
+                "and report how many requests were dropped during the reload."
+)
+async def post_reload(config: ReloadConfig = ReloadConfig()) -> Dict[str, Any]:
+    """
+    Perform a rolling reload of the SUT's gunicorn workers.
+
+    SIGHUP makes the master re-read its config, fork a fresh set of workers and
+    SIGTERM the old ones, which stop accepting connections and finish in-flight
+    requests for up to graceful_timeout. USR2 re-exec is not used: the master is
+    the container's PID 1, so retiring the old master would stop the container.
+    """
+    if reload_lock.locked():
+        raise HTTPException(status_code=409, detail="A reload is already in progress")
+
+    async with reload_lock:
+        master = find_gunicorn_master()
+        old_workers = get_worker_pids(master)
+        dropped_before = await get_dropped_requests()
+
+        logger.info(f"Reloading gunicorn master PID {master.pid} with workers {sorted(old_workers)}")
+        start = time.monotonic()
+        deadline = start + config.timeout
+        os.kill(master.pid, signal.SIGHUP)
+
+        # Wait for every old worker to exit and a full set of new workers to replace them
+        drained = False
+        new_workers: Set[int] = set()
+        while time.monotonic() < deadline:
+            current = get_worker_pids(master)
+            new_workers = current - old_workers
+            if not (current & old_workers) and len(new_workers) >= len(old_workers):
+                drained = True
+                break
+            await asyncio.sleep(config.poll_interval)
+        drain_seconds = time.monotonic() - start
+
+        serving = await wait_until_serving(deadline, config.poll_interval)
+        dropped_after = await get_dropped_requests()
+
+        dropped = None
+        if dropped_before is not None and dropped_after is not None:
+            dropped = int(dropped_after - dropped_before)
+
+        result: Dict[str, Any] = {
+            "master_pid": master.pid,
+            "old_workers": sorted(old_workers),
+            "new_workers": sorted(new_workers),
+            "drained": drained,
+            "serving": serving,
+            "drain_seconds": round(drain_seconds, 3),
+            "total_seconds": round(time.monotonic() - start, 3),
+            "dropped_requests": dropped,
+        }
+        remaining: List[int] = sorted(get_worker_pids(master) & old_workers)
+        if remaining:
+            result["remaining_old_workers"] = remaining
+        logger.info(f"Reload finished: {result}")
+        return result